@@ -9,8 +9,83 @@ from ib.ext.Contract import Contract
 from ib.ext.ExecutionFilter import ExecutionFilter
 from ib.ext.Order import Order
 
+from registry import RequestRegistry, BufferRegistry
+from marketData import SubscriptionManager
+from orderBook import DepthBookManager
+from barAggregator import BarAggregator, RT_VOLUME
+from contractCache import ContractCache
+from account import AccountState
+from latency import LatencyRecorder
+
+# Keys for end callbacks that carry no reqId
+POSITION_END = 'positionEnd'
+ACCOUNT_DOWNLOAD_END = 'accountDownloadEnd'
+NEXT_VALID_ID = 'nextValidId'
+# Key of order acknowledgements; registered as (ORDER_ACK, orderId)
+ORDER_ACK = 'orderAck'
+
+# Error codes that end the request they are reported for
+# 101 - max number of tickers reached
+# 162 - historical market data service error (incl. pacing violations)
+# 200 - no security definition found
+# 321, 322 - error validating/processing the request
+# 354 - market data not subscribed
+REQUEST_ERROR_CODES = (101, 162, 200, 321, 322, 354)
+
+# Error codes rejecting the order they are reported for
+# 103 - duplicate order id
+# 110 - price does not conform to the minimum price variation
+# 135 - order to cancel not found
+# 161 - order not in a cancellable state
+# 200 - no security definition found
+# 201 - order rejected
+# 202 - order cancelled
+# 203 - security not available or allowed for this account
+ORDER_ERROR_CODES = (103, 110, 135, 161, 200, 201, 202, 203)
+
+# First tickerId/reqId of data requests. Order ids count up from the
+# nextValidId of TWS, so data requests are numbered well above them and an
+# error reported for an id can be told apart as a data or order error.
+REQUEST_ID_START = 1 << 30
+
+class DataConnectionWrapper(object):
+    """
+    Callback object of a data connection of a connection pool. Forwards
+    every callback to the IBWrapper shared by the pool, except nextValidId:
+    order ids are only taken from the execution connection.
+    """
+    def __init__(self, callback):
+        self._callback = callback
+
+    def __getattr__(self, name):
+        return getattr(self._callback, name)
+
+    def nextValidId(self, orderId):
+        pass
+
 class IBWrapper(EWrapper):
     def initiate_variables(self):
+        # Round trip times of requests and broker methods
+        setattr(self, 'latency_Recorder', LatencyRecorder())
+        # Request completion
+        setattr(self, 'request_Registry',
+                RequestRegistry(recorder = self.latency_Recorder))
+        # Per-request callback buffers keyed by tickerId/reqId
+        setattr(self, 'callback_Buffers', BufferRegistry())
+        # Streaming market data subscriptions keyed by tickerId
+        setattr(self, 'market_Subscriptions', SubscriptionManager())
+        # Columnar capture of unrouted callbacks; None keeps the lists
+        setattr(self, 'tick_Capture', None)
+        # Order books of market depth subscriptions keyed by tickerId
+        setattr(self, 'market_Depth', DepthBookManager())
+        # Bars built from realtime bars and RTVolume keyed by tickerId
+        setattr(self, 'bar_Aggregator', BarAggregator())
+        # Qualified contracts described by IB keyed by conId
+        setattr(self, 'contract_Cache', ContractCache())
+        # Journal of executions and commissions; None until a path is set
+        setattr(self, 'execution_Journal', None)
+        # Account values and portfolio keyed by account
+        setattr(self, 'account_State', AccountState())
         # Account and Portfolio
         setattr(self, "accountDownloadEnd_flag", False)
         setattr(self, "update_AccountTime", None)
@@ -59,21 +134,26 @@ class IBWrapper(EWrapper):
 
     # Account and Portfolio ###################################################
     def updateAccountValue(self, key, value, currency, accountName):
+        self.latency_Recorder.recordMessage(ACCOUNT_DOWNLOAD_END,
+                                            'updateAccountValue')
+        self.account_State.updateValue(accountName, key, value, currency)
         update_AccountValue = self.update_AccountValue
         update_AccountValue.append((key, value, currency, accountName))
 
     def updatePortfolio(self, contract, position, marketPrice, marketValue,
                         averageCost, unrealizedPnL, realizedPnL, accountName):
+        self.latency_Recorder.recordMessage(ACCOUNT_DOWNLOAD_END,
+                                            'updatePortfolio')
+        self.contract_Cache.add(contract)
+        row = (contract.m_conId, contract.m_currency, contract.m_expiry,
+               contract.m_includeExpired, contract.m_localSymbol,
+               contract.m_multiplier, contract.m_primaryExch, contract.m_right,
+               contract.m_secType, contract.m_strike, contract.m_symbol,
+               contract.m_tradingClass, position, marketPrice, marketValue,
+               averageCost, unrealizedPnL, realizedPnL, accountName)
+        self.account_State.updatePortfolio(accountName, contract.m_conId, row)
         update_Portfolio = self.update_Portfolio
-        update_Portfolio.append((contract.m_conId, contract.m_currency,
-                                contract.m_expiry, contract.m_includeExpired,
-                                contract.m_localSymbol, contract.m_multiplier,
-                                contract.m_primaryExch, contract.m_right,
-                                contract.m_secType, contract.m_strike,
-                                contract.m_symbol, contract.m_tradingClass,
-                                position, marketPrice, marketValue,
-                                averageCost, unrealizedPnL, realizedPnL,
-                                accountName))
+        update_Portfolio.append(row)
 
     def updateAccountTime(self, timeStamp):
         self.update_AccountTime = timeStamp
@@ -81,17 +161,24 @@ class IBWrapper(EWrapper):
     def accountDownloadEnd(self, accountName=None):
         self.accountDownloadEnd_accountName = accountName
         self.accountDownloadEnd_flag = True
+        self.account_State.markDownloaded(accountName)
+        self.request_Registry.resolve(ACCOUNT_DOWNLOAD_END, accountName)
 
     def accountSummary(self, reqId=None, account=None, tag=None, value=None,
                        currency=None):
+        self.latency_Recorder.recordMessage(reqId, 'accountSummary')
+        self.account_State.updateValue(account, tag, value, currency)
         account_Summary = self.account_Summary
         account_Summary.append((reqId, account, tag, value, currency))
 
     def accountSummaryEnd(self, reqId):
         self.accountSummaryEnd_reqId = reqId
         self.account_SummaryEnd_flag = True
+        self.request_Registry.resolve(reqId)
 
     def position(self, account, contract, pos, avgCost):
+        self.latency_Recorder.recordMessage(POSITION_END, 'position')
+        self.contract_Cache.add(contract)
         update_Position = self.update_Position
         update_Position.append((account, contract.m_conId, contract, contract.m_currency,
                                 contract.m_exchange, contract.m_expiry,
@@ -103,6 +190,7 @@ class IBWrapper(EWrapper):
 
     def positionEnd(self):
         setattr(self, 'positionEnd_flag', True)
+        self.request_Registry.resolve(POSITION_END)
 
 
 
@@ -110,19 +198,26 @@ class IBWrapper(EWrapper):
     # Orders ###################################################################
     def orderStatus(self, orderId, status, filled, remaining, avgFillPrice,
                     permId, parentId, lastFillPrice, clientId, whyHeld):
+        self.latency_Recorder.recordMessage((ORDER_ACK, orderId),
+                                            'orderStatus')
         order_Status = self.order_Status
         order_Status.append((orderId, status, filled, remaining, avgFillPrice,
                             permId, parentId, lastFillPrice, clientId, whyHeld))
+        self.request_Registry.resolve((ORDER_ACK, orderId), status)
 
     def openOrder(self, orderId, contract, order, orderState):
+        self.latency_Recorder.recordMessage((ORDER_ACK, orderId), 'openOrder')
         open_Order = self.open_Order
         open_Order.append((orderId, contract, order, orderState))
+        self.request_Registry.resolve((ORDER_ACK, orderId),
+                                      orderState.m_status)
 
     def openOrderEnd(self):
         setattr(self, 'open_OrderEnd_flag', True)
 
     def nextValidId(self, orderId):
         self.next_ValidId = orderId
+        self.request_Registry.resolve(NEXT_VALID_ID, orderId)
 
     def deltaNeutralValidation(self, reqId, underComp):
         pass
@@ -134,10 +229,28 @@ class IBWrapper(EWrapper):
 
     # Market Data ##############################################################
     def tickPrice(self, tickerId, field, price, canAutoExecute):
+        self.latency_Recorder.recordMessage(tickerId, 'tickPrice')
+        if self.market_Subscriptions.route(tickerId, field, price):
+            return
+        tick = (tickerId, field, price, canAutoExecute)
+        if self.callback_Buffers.route('tick_Price', tickerId, tick):
+            return
+        if self.tick_Capture is not None:
+            self.tick_Capture.append('tick_Price', tick)
+            return
         tick_Price = self.tick_Price
-        tick_Price.append((tickerId, field, price, canAutoExecute))
+        tick_Price.append(tick)
 
     def tickSize(self, tickerId, field, size):
+        self.latency_Recorder.recordMessage(tickerId, 'tickSize')
+        if self.market_Subscriptions.route(tickerId, field, size):
+            return
+        # sizes of snapshots are not kept
+        if self.callback_Buffers.claims('tick_Price', tickerId):
+            return
+        if self.tick_Capture is not None:
+            self.tick_Capture.append('tick_Size', (tickerId, field, size))
+            return
         tick_Size = self.tick_Size
         tick_Size.append((tickerId, field, size))
 
@@ -150,10 +263,17 @@ class IBWrapper(EWrapper):
                                        theta, undPrice))
 
     def tickGeneric(self, tickerId, tickType, value):
+        if self.callback_Buffers.claims('tick_Price', tickerId):
+            return
         tick_Generic = self.tick_Generic
         tick_Generic.append((tickerId, tickType, value))
 
     def tickString(self, tickerId, field, value):
+        if field == RT_VOLUME and \
+                self.bar_Aggregator.addRTVolume(tickerId, value):
+            return
+        if self.callback_Buffers.claims('tick_Price', tickerId):
+            return
         tick_String = self.tick_String
         tick_String.append((tickerId, field, value))
 
@@ -168,6 +288,7 @@ class IBWrapper(EWrapper):
     def tickSnapshotEnd(self, reqId):
         self.tickSnapshotEnd_reqId = reqId
         setattr(self, 'tickSnapshotEnd_flag', True)
+        self.request_Registry.resolve(reqId)
 
     def marketDataType(self, reqId, marketDataType):
         setattr(self, 'market_DataType', marketDataType)
@@ -189,6 +310,15 @@ class IBWrapper(EWrapper):
     def error(self, id=None, errorCode=None, errorString=None):
         #print id
         print([id, errorCode, errorString])
+        self.latency_Recorder.recordMessage(id, 'error')
+        if id is None or id < 0:
+            return
+        if id >= REQUEST_ID_START:
+            if errorCode in REQUEST_ERROR_CODES:
+                self.request_Registry.fail(id, (errorCode, errorString))
+        elif errorCode in ORDER_ERROR_CODES:
+            self.request_Registry.fail((ORDER_ACK, id),
+                                       (errorCode, errorString))
 
     def error_0(self, strval=None):
         print("error_0")
@@ -216,16 +346,22 @@ class IBWrapper(EWrapper):
 
     # Executions ###############################################################
     def execDetails(self, reqId, contract, execution):
+        self.latency_Recorder.recordMessage(reqId, 'execDetails')
         self.exec_Details_reqId = reqId
         self.exec_Details_contract = contract
         self.exec_Details_execution = execution
+        if self.execution_Journal is not None:
+            self.execution_Journal.recordExecution(contract, execution)
 
     def execDetailsEnd(self, reqId):
         self.exec_DetailsEnd_reqId = reqId
         setattr(self, "exec_DetailsEnd_flag", True)
+        self.request_Registry.resolve(reqId)
 
     def commissionReport(self, commissionReport):
         self.commission_Report = commissionReport
+        if self.execution_Journal is not None:
+            self.execution_Journal.recordCommission(commissionReport)
 
 
 
@@ -237,13 +373,19 @@ class IBWrapper(EWrapper):
 
     # Contract #################################################################
     def contractDetails(self, reqId, contractDetails):
+        self.latency_Recorder.recordMessage(reqId, 'contractDetails')
         self.contract_Details_reqId = reqId
 #        self.contract_Details = contractDetails
+        self.contract_Cache.add(contractDetails.m_summary)
+        if self.callback_Buffers.route('contract_Details', reqId,
+                                       contractDetails):
+            return
         self.contract_Details.append( contractDetails )
 
     def contractDetailsEnd(self, reqId):
         self.contract_DetailsEnd_reqId = reqId
         self.contract_Details_flag = True
+        self.request_Registry.resolve(reqId)
 
     def bondContractDetails(self, reqId, contractDetails):
         self.bond_ContractDetails_reqId = reqId
@@ -259,6 +401,9 @@ class IBWrapper(EWrapper):
 
     # Market Depth #############################################################
     def updateMktDepth(self, tickerId, position, operation, side, price, size):
+        if self.market_Depth.route(tickerId, position, operation, side,
+                                   price, size):
+            return
         update_MktDepth = self.update_MktDepth
         update_MktDepth.append((tickerId, position, operation, side, price, size))
         #df = pd.DataFrame(self.update_MktDepth, columns = ["tickerId", "position",
@@ -267,6 +412,9 @@ class IBWrapper(EWrapper):
 
     def updateMktDepthL2(self, tickerId, position, marketMaker, operation,
                          side, price, size):
+        if self.market_Depth.route(tickerId, position, operation, side,
+                                   price, size):
+            return
         # I don't get any of this so I can't test it. Following are just place holders.
         print("blah blah. You have L2 data!!!")
         update_MktDepthL2 = self.update_MktDepthL2
@@ -317,9 +465,18 @@ class IBWrapper(EWrapper):
     # Historical Data  #########################################################
     def historicalData(self, reqId, date, open, high, low, close, volume,
                        count, WAP, hasGaps):
-        historical_Data = self.historical_Data
-        historical_Data.append((reqId, date, open, high, low, close, volume,
-                       count, WAP, hasGaps))
+        self.latency_Recorder.recordMessage(reqId, 'historicalData')
+        bar = (reqId, date, open, high, low, close, volume, count, WAP,
+               hasGaps)
+        if self.callback_Buffers.route('historical_Data', reqId, bar):
+            pass
+        elif self.tick_Capture is not None:
+            self.tick_Capture.append('historical_Data', bar)
+        else:
+            historical_Data = self.historical_Data
+            historical_Data.append(bar)
+        if str(date).startswith('finished'):
+            self.request_Registry.resolve(reqId)
         #df = pd.DataFrame(self.historical_Data, columns = ["reqId", "date", "open",
         #                                                   "high", "low", "close",
         #                                                   "volume", "count", "WAP",
@@ -358,9 +515,14 @@ class IBWrapper(EWrapper):
     # Real Time Bars ###########################################################
     def realtimeBar(self, reqId, time, open, high, low, close, volume,
                     wap, count):
+        if self.bar_Aggregator.addBar(reqId, time, open, high, low, close,
+                                      volume, wap):
+            return
+        bar = (reqId, time, open, high, low, close, volume, wap, count)
+        if self.callback_Buffers.route('real_timeBar', reqId, bar):
+            return
         real_timeBar = self.real_timeBar
-        real_timeBar.append((reqId, time, open, high, low, close, volume,
-                             wap, count))
+        real_timeBar.append(bar)
         #df = pd.DataFrame(self.real_timeBar, columns = ["reqId", "time", "open", "high",
         #                                                "low", "close", "volume", "wap",
         #                                                "count"])
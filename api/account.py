@@ -0,0 +1,267 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/account.py
+Created on 2026-10-18T20:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+#imports from stdlib
+import threading
+import time
+
+# third party imports
+import pandas as pd
+
+ACCOUNT_VALUE_COLUMNS = ['Account', 'Tag', 'Value', 'Currency', 'Time']
+
+# tags streamed by a standing <reqAccountSummary>
+ACCOUNT_SUMMARY_TAGS = ','.join(['AccountType', 'NetLiquidation',
+                                 'TotalCashValue', 'SettledCash',
+                                 'AccruedCash', 'BuyingPower',
+                                 'EquityWithLoanValue',
+                                 'PreviousEquityWithLoanValue',
+                                 'GrossPositionValue', 'RegTEquity',
+                                 'RegTMargin', 'SMA', 'InitMarginReq',
+                                 'MaintMarginReq', 'AvailableFunds',
+                                 'ExcessLiquidity', 'Cushion',
+                                 'FullInitMarginReq', 'FullMaintMarginReq',
+                                 'FullAvailableFunds', 'FullExcessLiquidity',
+                                 'LookAheadNextChange',
+                                 'LookAheadInitMarginReq',
+                                 'LookAheadMaintMarginReq',
+                                 'LookAheadAvailableFunds',
+                                 'LookAheadExcessLiquidity',
+                                 'HighestSeverity', 'DayTradesRemaining',
+                                 'Leverage'])
+
+
+def _number(value):
+    """
+    SUMMARY:
+        Returns <<value>> as a float if it is numeric, unchanged otherwise.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class AccountState(object):
+    """
+    CLASS SUMMARY:
+        Long lived cache of the account values and portfolio of the accounts
+        of a connection, fed by <updateAccountValue>, <accountSummary> and
+        <updatePortfolio>. Values are kept by (account, tag, currency) with
+        the time they were received, so reads can ask for values no older
+        than a given number of seconds. IB only streams a value when it
+        changes, so the values of a streaming account are current whatever
+        their age.
+
+    CLASS PROPERTIES:
+        streaming_accounts - accounts with streaming account updates
+
+    CLASS SPECIAL METHODS:
+        __len__ -
+
+    CLASS PRIVATE METHODS:
+        _isFresh -
+
+    CLASS PUBLIC METHODS:
+        setStreaming -
+        updateValue -
+        updatePortfolio -
+        markDownloaded -
+        value -
+        values -
+        portfolio -
+    """
+    def __init__(self):
+        """
+        SUMMARY:
+            AccountState initializer. Initializes object properties.
+
+        PARAMETERS:
+            None
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates an empty <AccountState> object.
+        """
+        super(AccountState, self).__init__()
+        # tag: {(account, currency): (value, time)}
+        self._values = {}
+        # account: {conId: (row, time)}
+        self._portfolios = {}
+        # account: time of the last <accountDownloadEnd>
+        self._download_times = {}
+        self._streaming_accounts = set()
+        self._lock = threading.Lock()
+
+    """
+    CLASS PROPERTIES
+    """
+    def streaming_accounts():
+        doc = "The accounts with streaming account updates."
+        def fget(self):
+            with self._lock:
+                return set(self._streaming_accounts)
+        return locals()
+    streaming_accounts = property(**streaming_accounts())
+
+    """
+    CLASS SPECIAL METHODS
+    """
+    def __len__(self):
+        with self._lock:
+            return sum(len(values) for values in self._values.values())
+
+    """
+    CLASS PRIVATE METHODS
+    """
+    def _isFresh(self, time_received, max_staleness, now, account = None):
+        """
+        SUMMARY:
+            Returns True if a value received at <<time_received>> is at most
+            <<max_staleness>> seconds old; any age if None or if account
+            updates of <<account>> are streaming. Must be called holding the
+            lock.
+        """
+        return max_staleness is None or \
+               account in self._streaming_accounts or \
+               now - time_received <= max_staleness
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def setStreaming(self, account, streaming = True):
+        """
+        SUMMARY:
+            Records whether account updates of <<account>> are streaming, in
+            which case its values and portfolio are always current.
+        """
+        with self._lock:
+            if streaming:
+                self._streaming_accounts.add(account)
+            else:
+                self._streaming_accounts.discard(account)
+
+    def updateValue(self, account, tag, value, currency = ''):
+        """
+        SUMMARY:
+            Stores the value of <<tag>> of <<account>> in <<currency>>,
+            stamped with the current time.
+        """
+        with self._lock:
+            self._values.setdefault(tag, {})[(account, currency or '')] = \
+                (_number(value), time.time())
+
+    def updatePortfolio(self, account, con_id, row):
+        """
+        SUMMARY:
+            Stores the portfolio <<row>> of contract <<con_id>> of
+            <<account>>, stamped with the current time.
+        """
+        with self._lock:
+            self._portfolios.setdefault(account, {})[con_id] = (row,
+                                                                time.time())
+
+    def markDownloaded(self, account):
+        """
+        SUMMARY:
+            Records that the portfolio of <<account>> was downloaded in full
+            by <accountDownloadEnd>.
+        """
+        with self._lock:
+            self._download_times[account] = time.time()
+
+    def value(self, tag, currency = None, account = None,
+              max_staleness = None):
+        """
+        SUMMARY:
+            Returns the latest value of <<tag>>.
+
+        PARAMETERS:
+            tag - string account tag, e.g. 'NetLiquidation'
+            currency - string currency; None matches any currency
+            account - string account; None matches any account
+            max_staleness - float number of seconds the value may be old;
+                            None accepts any age. Ignored for streaming
+                            accounts
+
+        RETURNS:
+            value - float, or string for non numeric tags; None if no value
+                    recent enough was received
+        """
+        now = time.time()
+        latest = None
+        with self._lock:
+            for (value_account, value_currency), (value, time_received) in \
+                    self._values.get(tag, {}).items():
+                if (account is not None and value_account != account) or \
+                   (currency is not None and value_currency != currency):
+                    continue
+                if not self._isFresh(time_received, max_staleness, now,
+                                     account = value_account):
+                    continue
+                if latest is None or time_received > latest[1]:
+                    latest = (value, time_received)
+        if latest is None:
+            return None
+        return latest[0]
+
+    def values(self, tags = None, account = None, max_staleness = None):
+        """
+        SUMMARY:
+            Returns the cached account values.
+
+        PARAMETERS:
+            tags - list of string tags to select; None selects all tags
+            account - string account to select; None selects all accounts
+            max_staleness - float number of seconds values may be old; None
+                            accepts any age. Ignored for streaming accounts
+
+        RETURNS:
+            data - pandas DataFrame of <<ACCOUNT_VALUE_COLUMNS>> with the
+                   epoch Time each value was received
+        """
+        now = time.time()
+        with self._lock:
+            if tags is None:
+                tags = list(self._values.keys())
+            rows = [(value_account, tag, value, currency, time_received)
+                    for tag in tags
+                    for (value_account, currency), (value, time_received)
+                    in self._values.get(tag, {}).items()
+                    if (account is None or value_account == account) and
+                       self._isFresh(time_received, max_staleness, now,
+                                     account = value_account)]
+        return pd.DataFrame(rows, columns = ACCOUNT_VALUE_COLUMNS)
+
+    def portfolio(self, account, max_staleness = None):
+        """
+        SUMMARY:
+            Returns the cached portfolio rows of <<account>>.
+
+        PARAMETERS:
+            account - string account
+            max_staleness - float number of seconds since the portfolio was
+                            last downloaded in full; ignored while account
+                            updates of <<account>> are streaming
+
+        RETURNS:
+            rows - list of portfolio row tuples of <updatePortfolio>; None
+                   if the portfolio was never downloaded or is too old
+        """
+        with self._lock:
+            download_time = self._download_times.get(account)
+            if download_time is None:
+                return None
+            if not self._isFresh(download_time, max_staleness, time.time(),
+                                 account = account):
+                return None
+            return [row for (row, time_received) in
+                    self._portfolios.get(account, {}).values()]
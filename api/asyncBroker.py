@@ -0,0 +1,353 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/asyncBroker.py
+Created on 2026-10-18T23:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+# third party imports
+try:
+    import trollius as asyncio
+except ImportError:
+    asyncio = None
+
+from ib.ext.Contract import Contract
+
+# internal/custom imports
+from IBWrapper import ORDER_ACK
+
+
+class AsyncBroker(object):
+    """
+    CLASS SUMMARY:
+        Event loop facade over an <IBBrokerTotal>. Each method sends its
+        request on the executor of the event loop, since the message rate
+        governor may block the sender, and returns an event loop future
+        completed from the IB callback ending the request, so a strategy can
+        gather many requests concurrently instead of blocking a thread on
+        each.
+        Futures are awaited with 'yield From(future)' in trollius
+        coroutines, or combined with asyncio.gather.
+
+    CLASS PROPERTIES:
+        broker - the <IBBrokerTotal> requests are sent through
+        loop - the event loop the futures belong to
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        _submit -
+        _bridge -
+        _complete -
+        _expire -
+        _resolved -
+        _orderStatus -
+
+    CLASS PUBLIC METHODS:
+        getLiveMarketData -
+        getDataAtTime -
+        getPositions -
+        getPortfolio -
+        placeOrder -
+        cancelOrder -
+    """
+    def __init__(self, broker, loop = None):
+        """
+        SUMMARY:
+            AsyncBroker initializer. Initializes object properties.
+
+        PARAMETERS:
+            broker - connected <IBBrokerTotal>
+            loop - event loop the futures belong to; defaults to the event
+                   loop of the calling thread
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates an <AsyncBroker> object. Raises ImportError if trollius
+            is not installed.
+        """
+        super(AsyncBroker, self).__init__()
+        if asyncio is None:
+            raise ImportError("AsyncBroker requires trollius.")
+        self._broker = broker
+        self._loop = asyncio.get_event_loop() if loop is None else loop
+
+    """
+    CLASS PROPERTIES
+    """
+    def broker():
+        doc = "The <IBBrokerTotal> requests are sent through."
+        def fget(self):
+            return self._broker
+        return locals()
+    broker = property(**broker())
+
+    def loop():
+        doc = "The event loop the futures belong to."
+        def fget(self):
+            return self._loop
+        return locals()
+    loop = property(**loop())
+
+    """
+    CLASS PRIVATE METHODS
+    """
+    def _submit(self, send, collect, time_out = None, description = ''):
+        """
+        SUMMARY:
+            Runs <<send>> on the executor of the event loop and returns an
+            event loop future completed as in <_bridge> with the request it
+            sent. Must be called on the event loop thread.
+
+        PARAMETERS:
+            send - function sending a request and returning its
+                   <RequestFuture>
+            collect, time_out, description - see <_bridge>; <<time_out>>
+                                             counts from the request being
+                                             sent
+
+        RETURNS:
+            future - event loop future
+        """
+        future = asyncio.Future(loop = self.loop)
+
+        def chain(bridged):
+            if future.done():
+                return
+            if bridged.exception() is not None:
+                future.set_exception(bridged.exception())
+            else:
+                future.set_result(bridged.result())
+
+        def sent(sending):
+            if future.done():
+                return
+            if sending.exception() is not None:
+                future.set_exception(sending.exception())
+                return
+            self._bridge(sending.result(), collect, time_out = time_out,
+                         description = description).add_done_callback(chain)
+        self.loop.run_in_executor(None, send).add_done_callback(sent)
+        return future
+
+    def _bridge(self, request, collect, time_out = None, description = ''):
+        """
+        SUMMARY:
+            Returns an event loop future completed with collect(request) once
+            the <RequestFuture> <<request>> is resolved. Must be called on the
+            event loop thread.
+
+        PARAMETERS:
+            request - <RequestFuture> resolved from an IB callback thread
+            collect - function of <<request>> returning the result
+            time_out - float number of seconds after which the request is
+                       released and collected with the data received so far;
+                       None waits for the request
+            description - string naming the request for the time out message
+
+        RETURNS:
+            future - event loop future
+        """
+        future = asyncio.Future(loop = self.loop)
+        if time_out is None:
+            timer = None
+        else:
+            timer = self.loop.call_later(time_out, self._expire, future,
+                                         request, collect, description)
+        request.addDoneCallback(
+            lambda request: self.loop.call_soon_threadsafe(
+                                self._complete, future, request, collect,
+                                timer))
+        return future
+
+    def _complete(self, future, request, collect, timer = None):
+        """
+        SUMMARY:
+            Completes <<future>> with collect(<<request>>) unless it is
+            already done. Runs on the event loop thread.
+        """
+        if future.done():
+            return
+        if timer is not None:
+            timer.cancel()
+        try:
+            result = collect(request)
+        except Exception as error:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _expire(self, future, request, collect, description):
+        """
+        SUMMARY:
+            Releases <<request>> after its time out and completes <<future>>
+            with the data received so far.
+        """
+        if future.done() or request.done():
+            return
+        self.broker.callback.request_Registry.release(request.key)
+        print("Request timed out:", description, "\nReturning partial data.")
+        self._complete(future, request, collect)
+
+    def _resolved(self, result):
+        """
+        SUMMARY:
+            Returns an event loop future already completed with <<result>>.
+        """
+        future = asyncio.Future(loop = self.loop)
+        future.set_result(result)
+        return future
+
+    def _orderStatus(self, request):
+        """
+        SUMMARY:
+            Returns the order status <<request>> was resolved with.
+        """
+        if not request.done():
+            return 'Timed Out'
+        if request.error is not None:
+            print("Order", request.key[1], "rejected:", request.error)
+            return 'Error'
+        return request.result
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def getLiveMarketData(self, contract = Contract(), time_out = 5):
+        """
+        SUMMARY:
+            Awaitable <getLiveMarketData> completed by <tickSnapshotEnd>.
+
+        RETURNS:
+            future - completed with the pandas DataFrame of the snapshot
+                     ticks; empty if none were received
+        """
+        def collect(quote):
+            if not quote.done():
+                self.broker._expireQuote(quote)
+            return self.broker._snapshotFrame(quote.result, contract)
+        return self._submit(lambda: self.broker._submitQuote(contract),
+                            collect, time_out = time_out,
+                            description = 'reqMktData ' +
+                                          str(contract.m_symbol))
+
+    def getDataAtTime(self, data_time, type_data = 'BID_ASK',
+                      contract = Contract(), type_time = '',
+                      in_trading_hours = False, duration = '60 S',
+                      bar_size = '1 min', time_out = 15, max_wait = None):
+        """
+        SUMMARY:
+            Awaitable <getDataAtTime>. The request is queued on the
+            <<historical_scheduler>> like blocking requests, so the pacing
+            rules hold across both.
+
+        PARAMETERS:
+            max_wait - float number of seconds to wait overall; None waits
+                       as long as the <<historical_scheduler>> needs to
+                       dispatch its queue plus <<time_out>>
+            Remaining parameters as in <getDataAtTime>.
+
+        RETURNS:
+            future - completed with the bar, a pandas Series, or None if no
+                     data was received in time
+        """
+        if max_wait is None:
+            max_wait = self.broker.historical_scheduler.drainTime(1) + \
+                       time_out
+
+        def send():
+            return self.broker._submitDataAtTime(
+                            data_time, type_data = type_data,
+                            contract = contract, type_time = type_time,
+                            in_trading_hours = in_trading_hours,
+                            duration = duration, bar_size = bar_size,
+                            time_out = time_out)
+
+        def collect(request):
+            if not request.done():
+                return None
+            if request.error is not None:
+                raise request.error
+            return request.result
+        return self._submit(send, collect, time_out = max_wait,
+                            description = 'reqHistoricalData ' +
+                                          str(contract.m_symbol))
+
+    def getPositions(self, time_out = 5):
+        """
+        SUMMARY:
+            Awaitable <getPositions> completed by <positionEnd>.
+
+        RETURNS:
+            future - completed with the pandas DataFrame of the positions
+                     indexed by Contract_Id
+        """
+        return self._submit(self.broker._requestPositions,
+                            lambda request: self.broker._collectPositions(),
+                            time_out = time_out, description = 'reqPositions')
+
+    def getPortfolio(self, time_out = 5, max_staleness = None):
+        """
+        SUMMARY:
+            Awaitable <getPortfolio> completed by <accountDownloadEnd>, or at
+            once from the <<account_state>> as in <getPortfolio>.
+
+        RETURNS:
+            future - completed with the pandas DataFrame of the portfolio
+        """
+        portfolio = self.broker._cachedPortfolio(max_staleness = max_staleness)
+        if portfolio is not None:
+            return self._resolved(portfolio)
+        return self._submit(self.broker._requestPortfolio,
+                            lambda request: self.broker._collectPortfolio(),
+                            time_out = time_out,
+                            description = 'reqAccountUpdates')
+
+    def placeOrder(self, order_id, contract, order, time_out = 5):
+        """
+        SUMMARY:
+            Places <<order>> and returns a future completed by its first
+            <orderStatus> or <openOrder>.
+
+        PARAMETERS:
+            order_id - integer id from <nextOrderId>
+            contract - Contract() object
+            order - Order() object
+            time_out - float number of seconds to wait for the
+                       acknowledgement
+
+        RETURNS:
+            future - completed with the status of the order; 'Error' if it
+                     was rejected and 'Timed Out' if it was not acknowledged
+        """
+        def send():
+            request = self.broker.callback.request_Registry.register(
+                                                    (ORDER_ACK, order_id))
+            self.broker.placeOrder(order_id, contract, order)
+            return request
+        return self._submit(send, self._orderStatus, time_out = time_out,
+                            description = 'placeOrder ' + str(order_id))
+
+    def cancelOrder(self, order_id, time_out = 5):
+        """
+        SUMMARY:
+            Cancels order <<order_id>> and returns a future completed by its
+            next <orderStatus>.
+
+        RETURNS:
+            future - completed with the status of the order, e.g.
+                     'Cancelled'; 'Error' if the cancel was rejected and
+                     'Timed Out' if no status arrived
+        """
+        def send():
+            request = self.broker.callback.request_Registry.register(
+                                                    (ORDER_ACK, order_id))
+            self.broker.cancelOrder(order_id)
+            return request
+        return self._submit(send, self._orderStatus, time_out = time_out,
+                            description = 'cancelOrder ' + str(order_id))
@@ -0,0 +1,362 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/barAggregator.py
+Created on 2026-10-18T16:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+#imports from stdlib
+import collections
+import threading
+import time
+import traceback
+
+# third party imports
+import numpy as np
+import pandas as pd
+
+# internal/custom imports
+from registry import contractKey
+
+# seconds per bar of each bar size built
+BAR_SECONDS = collections.OrderedDict([('1 min', 60), ('5 mins', 300),
+                                       ('15 mins', 900), ('1 hour', 3600)])
+
+BAR_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume', 'VWAP']
+
+# tickString field of RTVolume, generic tick 233
+RT_VOLUME = 48
+
+# positions in the bar state list
+_START, _OPEN, _HIGH, _LOW, _CLOSE, _VOLUME, _NOTIONAL = range(7)
+
+
+class BarAggregator(object):
+    """
+    CLASS SUMMARY:
+        Builds OHLCV and VWAP bars of several bar sizes per ticker from
+        realtime bars and RTVolume trade prints. Every input updates the
+        open bar of each size in constant time; a bar is closed, stored and
+        handed to the close callbacks when the first input of a later bar
+        arrives or <closeBars> passes its end.
+
+    CLASS PROPERTIES:
+        bar_sizes - the bar sizes built
+        history_length - number of closed bars kept per ticker and bar size
+
+    CLASS SPECIAL METHODS:
+        __contains__ -
+
+    CLASS PRIVATE METHODS:
+        _update -
+        _close -
+        _fire -
+
+    CLASS PUBLIC METHODS:
+        subscribe -
+        unsubscribe -
+        tickerId -
+        addCallback -
+        removeCallback -
+        addBar -
+        addTrade -
+        addRTVolume -
+        closeBars -
+        currentBar -
+        bars -
+    """
+    def __init__(self, bar_sizes = list(BAR_SECONDS.keys()),
+                 history_length = 1000):
+        """
+        SUMMARY:
+            BarAggregator initializer. Initializes object properties.
+
+        PARAMETERS:
+            bar_sizes - list of bar sizes, keys of <<BAR_SECONDS>>
+            history_length - integer number of closed bars kept per ticker
+                             and bar size
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates a <BarAggregator> object without subscriptions.
+        """
+        super(BarAggregator, self).__init__()
+        self._bar_sizes = list(bar_sizes)
+        self._history_length = history_length
+        self._open_bars = {}
+        self._closed_bars = {}
+        self._ticker_ids = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    """
+    CLASS PROPERTIES
+    """
+    def bar_sizes():
+        doc = "The bar sizes built."
+        def fget(self):
+            return list(self._bar_sizes)
+        return locals()
+    bar_sizes = property(**bar_sizes())
+
+    def history_length():
+        doc = "The number of closed bars kept per ticker and bar size."
+        def fget(self):
+            return self._history_length
+        return locals()
+    history_length = property(**history_length())
+
+    """
+    CLASS SPECIAL METHODS
+    """
+    def __contains__(self, contract):
+        return self.tickerId(contract) is not None
+
+    """
+    CLASS PRIVATE METHODS
+    """
+    def _update(self, ticker_id, bar_time, open, high, low, close, volume,
+                notional):
+        """
+        SUMMARY:
+            Folds one input into the open bar of every bar size of
+            <<ticker_id>>, closing bars that ended before <<bar_time>>.
+
+        RETURNS:
+            closed - list of (bar_size, bar) tuples closed by the input
+        """
+        closed = []
+        with self._lock:
+            open_bars = self._open_bars[ticker_id]
+            for bar_size in self._bar_sizes:
+                seconds = BAR_SECONDS[bar_size]
+                start = bar_time - bar_time % seconds
+                bar = open_bars.get(bar_size)
+                if bar is not None and bar[_START] != start:
+                    closed.append((bar_size, self._close(ticker_id, bar_size)))
+                    bar = None
+                if bar is None:
+                    open_bars[bar_size] = [start, open, high, low, close,
+                                           volume, notional]
+                    continue
+                if high > bar[_HIGH]:
+                    bar[_HIGH] = high
+                if low < bar[_LOW]:
+                    bar[_LOW] = low
+                bar[_CLOSE] = close
+                bar[_VOLUME] += volume
+                bar[_NOTIONAL] += notional
+        return closed
+
+    def _close(self, ticker_id, bar_size):
+        """
+        SUMMARY:
+            Moves the open <<bar_size>> bar of <<ticker_id>> to its closed
+            bars. Must be called holding the lock.
+
+        RETURNS:
+            bar - tuple in the order of <<BAR_COLUMNS>>
+        """
+        start, open, high, low, close, volume, notional = \
+            self._open_bars[ticker_id].pop(bar_size)
+        vwap = notional / volume if volume > 0 else close
+        bar = (start, open, high, low, close, volume, vwap)
+        self._closed_bars[ticker_id][bar_size].append(bar)
+        return bar
+
+    def _fire(self, ticker_id, closed):
+        """
+        SUMMARY:
+            Hands each bar of <<closed>> to the close callbacks.
+        """
+        for bar_size, bar in closed:
+            for callback in list(self._callbacks):
+                try:
+                    callback(ticker_id, bar_size,
+                             dict(zip(BAR_COLUMNS, bar)))
+                except Exception:
+                    print("Bar callback failed:\n", traceback.format_exc())
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def subscribe(self, contract, ticker_id):
+        """
+        SUMMARY:
+            Starts building bars for the inputs of <<ticker_id>>.
+
+        PARAMETERS:
+            contract - Contract() object
+            ticker_id - integer tickerId/reqId of the realtime bar or market
+                        data request feeding the bars
+
+        RETURNS:
+            None
+        """
+        with self._lock:
+            self._ticker_ids[contractKey(contract)] = ticker_id
+            self._open_bars[ticker_id] = {}
+            self._closed_bars[ticker_id] = dict(
+                (bar_size, collections.deque(maxlen = self.history_length))
+                for bar_size in self._bar_sizes)
+
+    def unsubscribe(self, contract):
+        """
+        SUMMARY:
+            Stops building bars for <<contract>> and drops its bars.
+
+        RETURNS:
+            ticker_id - integer tickerId of the subscription; None if
+                        <<contract>> was not subscribed
+        """
+        with self._lock:
+            ticker_id = self._ticker_ids.pop(contractKey(contract),
+                                             None)
+            self._open_bars.pop(ticker_id, None)
+            self._closed_bars.pop(ticker_id, None)
+            return ticker_id
+
+    def tickerId(self, contract):
+        """
+        SUMMARY:
+            Returns the tickerId bars of <<contract>> are built from; None if
+            it is not subscribed.
+        """
+        with self._lock:
+            return self._ticker_ids.get(contractKey(contract))
+
+    def addCallback(self, callback):
+        """
+        SUMMARY:
+            Registers <<callback>> to be called as
+            callback(ticker_id, bar_size, bar) with a dictionary of
+            <<BAR_COLUMNS>> whenever a bar closes. Callbacks run on the
+            thread of the input closing the bar.
+        """
+        self._callbacks.append(callback)
+
+    def removeCallback(self, callback):
+        """
+        SUMMARY:
+            Removes <<callback>> registered with <addCallback>.
+        """
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
+    def addBar(self, ticker_id, bar_time, open, high, low, close, volume,
+               wap):
+        """
+        SUMMARY:
+            Adds a <realtimeBar> of <<ticker_id>>.
+
+        PARAMETERS:
+            bar_time - integer epoch seconds of the start of the bar
+            open, high, low, close, volume, wap - the bar values
+
+        RETURNS:
+            boolean - True if <<ticker_id>> is subscribed
+        """
+        if ticker_id not in self._open_bars:
+            return False
+        closed = self._update(ticker_id, int(bar_time), open, high, low,
+                              close, volume, volume * wap)
+        self._fire(ticker_id, closed)
+        return True
+
+    def addTrade(self, ticker_id, trade_time, price, size):
+        """
+        SUMMARY:
+            Adds a trade print of <<ticker_id>>.
+
+        PARAMETERS:
+            trade_time - epoch seconds of the trade
+            price - float trade price
+            size - trade size
+
+        RETURNS:
+            boolean - True if <<ticker_id>> is subscribed
+        """
+        if ticker_id not in self._open_bars:
+            return False
+        closed = self._update(ticker_id, int(trade_time), price, price,
+                              price, price, size, price * size)
+        self._fire(ticker_id, closed)
+        return True
+
+    def addRTVolume(self, ticker_id, value):
+        """
+        SUMMARY:
+            Adds an RTVolume tickString of <<ticker_id>>, formatted
+            'price;size;time;totalVolume;vwap;single' with time in epoch
+            milliseconds. Prints without a price carry no trade.
+
+        RETURNS:
+            boolean - True if <<ticker_id>> is subscribed
+        """
+        if ticker_id not in self._open_bars:
+            return False
+        fields = str(value).split(';')
+        if len(fields) < 3 or not fields[0] or not fields[1]:
+            return True
+        return self.addTrade(ticker_id, int(fields[2]) // 1000,
+                             float(fields[0]), int(fields[1]))
+
+    def closeBars(self, now = None):
+        """
+        SUMMARY:
+            Closes every open bar that ended before <<now>>, so bars of
+            quiet tickers close without waiting for their next input.
+
+        PARAMETERS:
+            now - epoch seconds; defaults to the current time
+
+        RETURNS:
+            None
+        """
+        if now is None:
+            now = time.time()
+        closed = {}
+        with self._lock:
+            for ticker_id, open_bars in self._open_bars.items():
+                for bar_size, bar in list(open_bars.items()):
+                    if bar[_START] + BAR_SECONDS[bar_size] <= now:
+                        closed.setdefault(ticker_id, []).append(
+                            (bar_size, self._close(ticker_id, bar_size)))
+        for ticker_id in closed:
+            self._fire(ticker_id, closed[ticker_id])
+
+    def currentBar(self, ticker_id, bar_size):
+        """
+        SUMMARY:
+            Returns the open <<bar_size>> bar of <<ticker_id>> as a
+            dictionary of <<BAR_COLUMNS>>; None if there is none.
+        """
+        with self._lock:
+            bar = self._open_bars.get(ticker_id, {}).get(bar_size)
+            if bar is None:
+                return None
+            start, open, high, low, close, volume, notional = bar
+        vwap = notional / volume if volume > 0 else close
+        return dict(zip(BAR_COLUMNS, (start, open, high, low, close, volume,
+                                      vwap)))
+
+    def bars(self, ticker_id, bar_size):
+        """
+        SUMMARY:
+            Returns the closed <<bar_size>> bars of <<ticker_id>>.
+
+        RETURNS:
+            data - pandas DataFrame of <<BAR_COLUMNS>> indexed by the bar
+                   start time; empty if there are none
+        """
+        with self._lock:
+            bars = list(self._closed_bars.get(ticker_id, {}).get(bar_size,
+                                                                  []))
+        data = pd.DataFrame(bars, columns = BAR_COLUMNS)
+        data['time'] = pd.to_datetime(data['time'].astype(np.int64),
+                                      unit = 's')
+        return data.set_index('time')
@@ -0,0 +1,423 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/barCache.py
+Created on 2026-10-18T12:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+#imports from stdlib
+import os
+import collections
+import threading
+import datetime as dt
+
+# third party imports
+import numpy as np
+import pandas as pd
+
+# internal/custom imports
+import directory as dr
+from registry import contractKey
+
+BAR_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'count', 'WAP',
+               'hasGaps']
+
+# seconds per unit of the IB durations whose span is known exactly
+DURATION_UNIT_SECONDS = {'S': 1, 'D': 86400}
+
+# seconds per unit of the IB bar sizes of a fixed length
+BAR_UNIT_SECONDS = {'sec': 1, 'min': 60, 'hour': 3600, 'day': 86400}
+
+
+def requestSpan(end_date_time, duration, bar_size):
+    """
+    SUMMARY:
+        Returns the time range of the bars a historical data request is
+        complete for: the bars lying entirely within its window, so a bar
+        cut by either end of the window is not taken as received.
+
+    PARAMETERS:
+        end_date_time - string end of the request, '%Y%m%d %H:%M:%S'
+        duration - string IB duration, e.g. '60 S', '2 D'
+        bar_size - string IB bar size, e.g. '1 min'
+
+    RETURNS:
+        (start, end) - datetime.datetime objects; None if the duration or
+                       bar size is in weeks, months or years, whose span is
+                       not exact, or no whole bar fits the window
+    """
+    count, unit = duration.split()
+    bar_count, bar_unit = bar_size.split()
+    bar_unit = bar_unit.rstrip('s')
+    if unit not in DURATION_UNIT_SECONDS or bar_unit not in BAR_UNIT_SECONDS:
+        return None
+    end = dt.datetime.strptime(end_date_time, '%Y%m%d %H:%M:%S')
+    start = end - dt.timedelta(seconds = int(count) *
+                                         DURATION_UNIT_SECONDS[unit])
+    bar_seconds = int(bar_count) * BAR_UNIT_SECONDS[bar_unit]
+
+    def barOffset(time):
+        midnight = dt.datetime.combine(time.date(), dt.time())
+        return int((time - midnight).total_seconds()) % bar_seconds
+    if barOffset(start):
+        start += dt.timedelta(seconds = bar_seconds - barOffset(start))
+    end -= dt.timedelta(seconds = barOffset(end))
+    if start >= end:
+        return None
+    return start, end
+
+
+def mergeSpans(spans):
+    """
+    SUMMARY:
+        Returns <<spans>> sorted, with overlapping and adjacent spans
+        merged.
+
+    PARAMETERS:
+        spans - list of (start, end) tuples
+
+    RETURNS:
+        spans - list of (start, end) tuples
+    """
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class BarCache(object):
+    """
+    CLASS SUMMARY:
+        Persistent on-disk cache of historical bars. Bars are stored per
+        (contract, whatToShow, bar size, useRTH, session date) key in one
+        compressed columnar NumPy (.npz) file, together with the time spans
+        of the session the stored requests covered. Only the spans of closed
+        sessions no request has covered yet need to be requested from
+        Interactive Brokers (IB).
+
+    CLASS PROPERTIES:
+        path_cache - directory the cache files are stored in
+        max_memory_sessions - number of sessions kept in memory
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        _fileKey -
+        _filePath -
+        _readFile -
+        _writeFile -
+        _session -
+
+    CLASS PUBLIC METHODS:
+        load -
+        store -
+        missingSpans -
+        barAtTime -
+    """
+    def __init__(self, path_cache = '', max_memory_sessions = 256):
+        """
+        SUMMARY:
+            BarCache initializer. Initializes object properties.
+
+        PARAMETERS:
+            path_cache - string path of the cache directory; created if it
+                         does not exist
+            max_memory_sessions - integer number of most recently used
+                                  sessions kept in memory
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates a <BarCache> object.
+        """
+        super(BarCache, self).__init__()
+        self._path_cache = path_cache
+        if not os.path.isdir(path_cache):
+            dr.createDir(path_cache)
+        self._max_memory_sessions = max_memory_sessions
+        # key: (bars DataFrame, list of covered (start, end) Timestamps)
+        self._sessions = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    """
+    CLASS PROPERTIES
+    """
+    def path_cache():
+        doc = "The directory the cache files are stored in."
+        def fget(self):
+            return self._path_cache
+        return locals()
+    path_cache = property(**path_cache())
+
+    def max_memory_sessions():
+        doc = "The number of most recently used sessions kept in memory."
+        def fget(self):
+            return self._max_memory_sessions
+        def fset(self, value):
+            self._max_memory_sessions = value
+        return locals()
+    max_memory_sessions = property(**max_memory_sessions())
+
+    """
+    CLASS PRIVATE METHODS
+    """
+    def _fileKey(self, contract):
+        """
+        SUMMARY:
+            Returns the conId of <<contract>> if it is known, otherwise the
+            set fields of its <contractKey> without the exchange.
+        """
+        if contract.m_conId:
+            return str(contract.m_conId)
+        return '-'.join([str(field) for field in
+                         contractKey(contract, exchange = False) if field])
+
+    def _filePath(self, key):
+        """
+        SUMMARY:
+            Returns the path of the cache file of <<key>>.
+        """
+        contract_key, type_data, bar_size, trading_hours, session_date = key
+        file_name = '_'.join((contract_key, type_data,
+                              bar_size.replace(' ', ''), str(trading_hours),
+                              session_date.strftime('%Y%m%d')))
+        return os.path.join(self.path_cache,
+                            file_name.replace(os.sep, '-') + '.npz')
+
+    def _readFile(self, key):
+        """
+        SUMMARY:
+            Reads the bars and covered spans of <<key>> from disk; None if
+            not cached. Files written without their covered spans cover
+            nothing.
+        """
+        path = self._filePath(key)
+        if not os.path.isfile(path):
+            return None
+        with np.load(path) as columns:
+            data = pd.DataFrame(dict((column, columns[column])
+                                     for column in BAR_COLUMNS),
+                                columns = BAR_COLUMNS,
+                                index = pd.DatetimeIndex(columns['date']))
+            covered = []
+            if 'covered' in columns.files:
+                covered = [(pd.Timestamp(start), pd.Timestamp(end))
+                           for start, end in columns['covered']]
+        data.index.name = 'date'
+        return data, covered
+
+    def _writeFile(self, key, data, covered):
+        """
+        SUMMARY:
+            Writes the bars and covered spans of <<key>> to disk, replacing
+            the previous file.
+        """
+        path = self._filePath(key)
+        path_tmp = path + '.tmp'
+        columns = dict((column, data[column].values if len(data) else
+                                np.array([], dtype = float))
+                       for column in BAR_COLUMNS)
+        columns['date'] = data.index.values.astype('datetime64[ns]')
+        columns['covered'] = np.array([(start.value, end.value)
+                                       for start, end in covered],
+                                      dtype = 'int64').reshape(-1, 2) \
+                               .astype('datetime64[ns]')
+        with open(path_tmp, 'wb') as f:
+            np.savez_compressed(f, **columns)
+        if os.path.isfile(path):
+            os.remove(path)
+        os.rename(path_tmp, path)
+
+    def _session(self, key):
+        """
+        SUMMARY:
+            Returns the (bars, covered spans) of <<key>> from memory or disk;
+            None if not cached. Must be called holding the lock.
+        """
+        if key in self._sessions:
+            session = self._sessions.pop(key)
+        else:
+            session = self._readFile(key)
+            if session is None:
+                return None
+        self._sessions[key] = session
+        while len(self._sessions) > self.max_memory_sessions:
+            self._sessions.popitem(last = False)
+        return session
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def load(self, contract, type_data, bar_size, trading_hours,
+             session_date):
+        """
+        SUMMARY:
+            Returns the cached bars of one session.
+
+        PARAMETERS:
+            contract - Contract() object
+            type_data - string IB whatToShow
+            bar_size - string IB bar size
+            trading_hours - 1 for regular trading hours only, 0 otherwise
+            session_date - datetime.date object
+
+        RETURNS:
+            data - pandas DataFrame of the bars cached for the session,
+                   indexed by date; None if the session is not cached. Use
+                   <missingSpans> for the parts of the session not covered
+
+        RESULTS:
+            None
+        """
+        key = (self._fileKey(contract), type_data, bar_size,
+               trading_hours, session_date)
+        with self._lock:
+            session = self._session(key)
+        if session is None:
+            return None
+        return session[0]
+
+    def store(self, contract, type_data, bar_size, trading_hours, data,
+              span = None, today = None):
+        """
+        SUMMARY:
+            Merges <<data>> into the cache and records <<span>> as covered.
+            Only sessions before <<today>> are stored since the current
+            session can still change.
+
+        PARAMETERS:
+            contract, type_data, bar_size, trading_hours - see <load>
+            data - pandas DataFrame of bars indexed by date, as received for
+                   one request
+            span - (start, end) datetime.datetime tuple of the time range
+                   the request covered, see <requestSpan>; None records no
+                   span, so the bars are only served by <barAtTime>
+            today - datetime.date object; defaults to today
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Writes one cache file per stored session, including sessions of
+            <<span>> without bars.
+        """
+        if today is None:
+            today = dt.date.today()
+        if data is None:
+            data = pd.DataFrame(columns = BAR_COLUMNS)
+        contract_key = self._fileKey(contract)
+        index = pd.DatetimeIndex(data.index)
+        session_dates = index.normalize()
+        dates = set(session_date.date()
+                    for session_date in session_dates.unique())
+        if span is not None:
+            start, end = pd.Timestamp(span[0]), pd.Timestamp(span[1])
+            session_date = start.date()
+            while session_date < (end - pd.Timedelta(1)).date():
+                dates.add(session_date)
+                session_date += dt.timedelta(days = 1)
+            dates.add(session_date)
+
+        for session_date in sorted(dates):
+            if session_date >= today:
+                continue
+            key = (contract_key, type_data, bar_size, trading_hours,
+                   session_date)
+            session = data[session_dates == pd.Timestamp(session_date)]
+            session = session.set_index(pd.DatetimeIndex(session.index))
+            session = session.reindex(columns = BAR_COLUMNS)
+            covered = []
+            if span is not None:
+                session_start = pd.Timestamp(session_date)
+                session_end = session_start + pd.Timedelta(days = 1)
+                if max(start, session_start) < min(end, session_end):
+                    covered = [(max(start, session_start),
+                                min(end, session_end))]
+            with self._lock:
+                cached = self._session(key)
+                if cached is not None and session.empty:
+                    session = cached[0]
+                elif cached is not None:
+                    session = pd.concat([cached[0], session])
+                    session = session[~session.index.duplicated(keep = 'last')]
+                    covered = mergeSpans(cached[1] + covered)
+                session = session.sort_index()
+                session.index.name = 'date'
+                self._writeFile(key, session, covered)
+                self._sessions.pop(key, None)
+                self._sessions[key] = (session, covered)
+                while len(self._sessions) > self.max_memory_sessions:
+                    self._sessions.popitem(last = False)
+
+    def missingSpans(self, contract, type_data, bar_size, trading_hours,
+                     start, end):
+        """
+        SUMMARY:
+            Returns the parts of <<start>> to <<end>> not covered by a stored
+            request, so only those need to be requested.
+
+        PARAMETERS:
+            contract, type_data, bar_size, trading_hours - see <load>
+            start - datetime.datetime object
+            end - datetime.datetime object
+
+        RETURNS:
+            spans - list of (start, end) datetime.datetime tuples in order
+        """
+        contract_key = self._fileKey(contract)
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        missing = []
+        session_date = start.date()
+        while session_date <= end.date():
+            session_start = max(pd.Timestamp(session_date), start)
+            session_end = min(pd.Timestamp(session_date) +
+                              pd.Timedelta(days = 1), end)
+            key = (contract_key, type_data, bar_size, trading_hours,
+                   session_date)
+            with self._lock:
+                session = self._session(key)
+            covered = session[1] if session is not None else []
+            for covered_start, covered_end in covered:
+                if covered_start > session_start:
+                    missing.append((session_start,
+                                    min(covered_start, session_end)))
+                session_start = max(session_start, covered_end)
+                if session_start >= session_end:
+                    break
+            if session_start < session_end:
+                missing.append((session_start, session_end))
+            session_date += dt.timedelta(days = 1)
+        return [(span_start.to_pydatetime(), span_end.to_pydatetime())
+                for span_start, span_end in mergeSpans(missing)]
+
+    def barAtTime(self, contract, type_data, bar_size, trading_hours,
+                  bar_time):
+        """
+        SUMMARY:
+            Returns the cached bar starting at <<bar_time>>.
+
+        PARAMETERS:
+            contract, type_data, bar_size, trading_hours - see <load>
+            bar_time - datetime.datetime object of the start of the bar
+
+        RETURNS:
+            bar - pandas Series; None if the bar is not cached
+
+        RESULTS:
+            None
+        """
+        data = self.load(contract, type_data, bar_size, trading_hours,
+                         bar_time.date())
+        if data is None:
+            return None
+        try:
+            return data.loc[pd.Timestamp(bar_time)]
+        except KeyError:
+            return None
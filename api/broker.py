@@ -12,6 +12,8 @@ from __future__ import print_function
 import sys
 import traceback
 import time
+import threading
+import copy
 import datetime as dt
 import dateutil as du
 import glob
@@ -25,7 +27,9 @@ import numpy as np
 from tqdm import tqdm
 
 # Interactive Brokers related packages; IbPy package
-from IBWrapper import IBWrapper
+from IBWrapper import IBWrapper, DataConnectionWrapper, POSITION_END, \
+                      ACCOUNT_DOWNLOAD_END, NEXT_VALID_ID, ORDER_ACK, \
+                      REQUEST_ID_START
 from ib.ext.EClientSocket import EClientSocket
 from ib.ext.ScannerSubscription import ScannerSubscription
 
@@ -37,6 +41,47 @@ from ib.ext.ExecutionFilter import ExecutionFilter
 import directory as dr
 import data as dat
 import position as pos
+import pacing as pc
+from registry import TickerRegistry, RequestFuture, SingleFlight, \
+                     contractKey
+import barCache as bc
+import futuresChain as fc
+import continuousFutures as cf
+import capture as cap
+from orderIds import OrderIdAllocator
+from executionJournal import ExecutionJournal, journalPath
+from account import ACCOUNT_SUMMARY_TAGS
+from latency import timed
+
+# names of the IB tick types of <tickPrice> and <tickSize>
+TICK_TYPES = {0 : "BID SIZE",
+              1 : "BID PRICE",
+              2 : "ASK PRICE",
+              3 : "ASK SIZE",
+              4 : "LAST PRICE",
+              5 : "LAST SIZE",
+              6 : "HIGH",
+              7 : "LOW",
+              8 : "VOLUME",
+              9 : "CLOSE PRICE",
+              10 : "BID OPTION COMPUTATION",
+              11 : "ASK OPTION COMPUTATION",
+              12 : "LAST OPTION COMPUTATION",
+              13 : "MODEL OPTION COMPUTATION",
+              14 : "OPEN_TICK",
+              15 : "LOW 13 WEEK",
+              16 : "HIGH 13 WEEK",
+              17 : "LOW 26 WEEK",
+              18 : "HIGH 26 WEEK",
+              19 : "LOW 52 WEEK",
+              20 : "HIGH 52 WEEK",
+              21 : "AVG VOLUME",
+              22 : "OPEN INTEREST",
+              23 : "OPTION HISTORICAL VOL",
+              24 : "OPTION IMPLIED VOL",
+              27 : "OPTION CALL OPEN INTEREST",
+              28 : "OPTION PUT OPEN INTEREST",
+              29 : "OPTION CALL VOLUME"}
 
 
 class BrokerConnection(object):
@@ -101,6 +146,7 @@ class IBBrokerConnection(BrokerConnection):
         interface:
             EClientSocket object that takes in the implemented IBWrapper class in which
             API calls are stored.
+        interfaces - list of every interface of the connection
 
     CLASS SPECIAL METHODS:
         None
@@ -109,7 +155,7 @@ class IBBrokerConnection(BrokerConnection):
         None
     
     CLASS PUBLIC METHODS:
-        None
+        dataInterface -
     """
     def __init__(self, callback = IBWrapper()):
         """
@@ -145,6 +191,13 @@ class IBBrokerConnection(BrokerConnection):
         return locals()
     interface = property(**interface())
 
+    def interfaces():
+        doc = "The list of every interface of the connection."
+        def fget(self):
+            return [self.interface]
+        return locals()
+    interfaces = property(**interfaces())
+
     """
     CLASS SPECIAL METHODS
     """
@@ -156,6 +209,100 @@ class IBBrokerConnection(BrokerConnection):
     """
     CLASS PUBLIC METHODS
     """
+    def dataInterface(self, key = 0):
+        """
+        SUMMARY:
+            Returns the interface data requests identified by <<key>> are
+            sent on; the only interface of the connection.
+        """
+        return self.interface
+
+
+class IBBrokerConnectionPool(IBBrokerConnection):
+    """
+    CLASS SUMMARY:
+        Several EClientSocket connections to the same TWS or gateway sharing
+        one IBWrapper, so every callback lands in the same registries. The
+        <<interface>> is kept for order flow, account and position requests;
+        data requests are spread round-robin over the <<data_interfaces>>,
+        each connected with its own client id, so a slow backfill never
+        queues in front of an order.
+
+    CLASS PROPERTIES:
+        data_interfaces - list of the interfaces data requests are sent on
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        None
+
+    CLASS PUBLIC METHODS:
+        dataInterface -
+    """
+    def __init__(self, callback = IBWrapper(), data_connections = 1,
+                 connection_type = IBBrokerConnection):
+        """
+        SUMMARY:
+            IBBrokerConnectionPool initializer. Initializes object properties.
+
+        PARAMETERS:
+            callback - IBWrapper() shared by every connection of the pool
+            data_connections - integer number of connections for data
+                               requests, besides the execution connection
+            connection_type - <IBBrokerConnection> class each connection of
+                              the pool is created with
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates an IBBrokerConnectionPool object.
+        """
+        # skips <IBBrokerConnection> initialization and its EClientSocket;
+        # every interface of the pool comes from <<connection_type>>
+        super(IBBrokerConnection, self).__init__()
+        self._interface = connection_type(callback).interface
+        self._data_interfaces = [connection_type(
+                                    DataConnectionWrapper(callback)).interface
+                                 for _ in range(data_connections)]
+
+    """
+    CLASS PROPERTIES
+    """
+    def data_interfaces():
+        doc = "The list of the interfaces data requests are sent on."
+        def fget(self):
+            return self._data_interfaces
+        def fset(self, value):
+            self._data_interfaces = value
+        return locals()
+    data_interfaces = property(**data_interfaces())
+
+    def interfaces():
+        doc = """
+                The list of every interface of the pool, the execution
+                interface first.
+            """
+        def fget(self):
+            return [self.interface] + self.data_interfaces
+        return locals()
+    interfaces = property(**interfaces())
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def dataInterface(self, key = 0):
+        """
+        SUMMARY:
+            Returns the data interface requests identified by <<key>>, a
+            tickerId or reqId, are sent on. Consecutive ids go round-robin
+            over the data interfaces, and a cancel goes to the interface of
+            its request.
+        """
+        if not self.data_interfaces:
+            return self.interface
+        return self.data_interfaces[key % len(self.data_interfaces)]
 
 
 class Broker(object):
@@ -222,6 +369,9 @@ class IBBroker(Broker):
         port -
         client_id -
         current_order_id -
+        order_ids -
+        latency_recorder -
+        governor -
 
     CLASS SPECIAL METHODS:
         __str__ -
@@ -238,6 +388,8 @@ class IBBroker(Broker):
         _createCommodityContract -
         _createNewsContract -
         _createMutualFundContract -
+        _syncOrderIds -
+        _dataTws -
 
     CLASS PUBLIC METHODS:
         connect -
@@ -251,7 +403,9 @@ class IBBroker(Broker):
     """
     def __init__(self, account_name = 'DU603835',
                     connection = IBBrokerConnection(), host = '', port = 7497,
-                    client_id = 100, **kwargs):
+                    client_id = 100, path_order_id = None,
+                    connection_type = IBBrokerConnection,
+                    data_connections = 0, message_rate = 45, **kwargs):
         """
         SUMMARY:
             Broker initializer. Initializes object properties.
@@ -265,6 +419,18 @@ class IBBroker(Broker):
             host -
             port -
             client_id -
+            path_order_id - string
+                The file the last issued order id is persisted to; None keeps
+                order ids in memory only.
+            connection_type - <IBBrokerConnection> class
+                The class the connections of the broker are created with.
+            data_connections - integer
+                The number of extra connections, with client ids following
+                <<client_id>>, data requests are spread over; 0 sends all
+                requests on one connection.
+            message_rate - float
+                The number of messages per second each connection may send,
+                below the IB ceiling of 50.
             
         RETURNS:
             None
@@ -278,14 +444,31 @@ class IBBroker(Broker):
         self._callback = IBWrapper()
         self.callback.initiate_variables()
 
-        self._connection = IBBrokerConnection(self.callback)
-
-        self._tws = self.connection.interface #could just assign to _connection
+        if data_connections > 0:
+            self._connection = IBBrokerConnectionPool(
+                                    self.callback,
+                                    data_connections = data_connections,
+                                    connection_type = connection_type)
+        else:
+            self._connection = connection_type(self.callback)
+
+        # every outbound message is paced by the governor of its connection
+        self._tws = pc.GovernedClient(self.connection.interface,
+                                      pc.MessageGovernor(rate = message_rate))
+        if isinstance(self.connection, IBBrokerConnectionPool):
+            self._data_tws = [pc.GovernedClient(interface,
+                                                pc.MessageGovernor(
+                                                    rate = message_rate))
+                              for interface in self.connection.data_interfaces]
+        else:
+            self._data_tws = []
 
         self._host = host
         self._port = port
         self._client_id = client_id
 
+        self._order_ids = OrderIdAllocator(path_file = path_order_id)
+
         self.connect()
 
     """
@@ -369,16 +552,48 @@ class IBBroker(Broker):
     client_id = property(**client_id())
 
     def current_order_id():
-        doc = "The current_order_id property."
+        doc = """
+                The order id <nextOrderId> returns next. Setting it never
+                moves the <<order_ids>> allocator backwards.
+            """
         def fget(self):
-            return self._current_order_id
+            return self.order_ids.current_id
         def fset(self, value):
-            self._current_order_id = value
-        def fdel(self):
-            del self._current_order_id
+            self.order_ids.sync(value)
         return locals()
     current_order_id = property(**current_order_id())
 
+    def order_ids():
+        doc = "The <OrderIdAllocator> issuing the order ids of this broker."
+        def fget(self):
+            return self._order_ids
+        def fset(self, value):
+            self._order_ids = value
+        def fdel(self):
+            del self._order_ids
+        return locals()
+    order_ids = property(**order_ids())
+
+    def latency_recorder():
+        doc = """
+                The <LatencyRecorder> timing the requests and methods of this
+                broker.
+            """
+        def fget(self):
+            return self.callback.latency_Recorder
+        return locals()
+    latency_recorder = property(**latency_recorder())
+
+    def governor():
+        doc = """
+                The <MessageGovernor> pacing the messages sent on the
+                execution connection.
+            """
+        def fget(self):
+            return self.tws.governor
+        return locals()
+    governor = property(**governor())
+
     """
     CLASS SPECIAL METHODS
     """
@@ -589,13 +804,49 @@ class IBBroker(Broker):
         """
         return contract
 
+    def _syncOrderIds(self, request, time_out = 5):
+        """
+        SUMMARY:
+            Waits for the <nextValidId> <<request>> and syncs the
+            <<order_ids>> allocator with it.
+
+        PARAMETERS:
+            request - <RequestFuture> registered under NEXT_VALID_ID
+            time_out - float number of seconds to wait for <nextValidId>
+
+        RETURNS:
+            boolean - True if the allocator was synced
+
+        RESULTS:
+            None
+        """
+        if not request.wait(time_out) or request.result is None:
+            self.callback.request_Registry.release(NEXT_VALID_ID)
+            print("Request timed out: nextValidId\nOrder ids not synced.")
+            return False
+        self.order_ids.sync(request.result)
+        return True
+
+    def _dataTws(self, key = 0):
+        """
+        SUMMARY:
+            Returns the interface the data request or cancel identified by
+            <<key>>, its tickerId or reqId, is sent on. Without data
+            connections this is <<tws>>.
+        """
+        if not self._data_tws:
+            return self.tws
+        return self._data_tws[key % len(self._data_tws)]
+
     """
     CLASS PUBLIC METHODS
     """
+    @timed
     def connect(self):
         """
         SUMMARY:
-            Method summary
+            Connects to TWS and syncs the <<order_ids>> allocator with the
+            <nextValidId> TWS sends on connect.
         
         PARAMETERS:
             None
@@ -609,7 +860,18 @@ class IBBroker(Broker):
         if self.connected():
             print('Broker is already connected.')
             pass
+        request = self.callback.request_Registry.register(NEXT_VALID_ID)
         self.tws.eConnect(self.host, self.port, self.client_id)
+        if self.connected():
+            self._syncOrderIds(request)
+        else:
+            self.callback.request_Registry.release(NEXT_VALID_ID)
+
+        for index, interface in enumerate(self.connection.interfaces):
+            if interface is not self.connection.interface and \
+               not interface.isConnected():
+                interface.eConnect(self.host, self.port,
+                                   self.client_id + index)
 
     def disconnect(self):
         """
@@ -625,7 +887,12 @@ class IBBroker(Broker):
         RESULTS:
             None
         """
+        for interface in self.connection.interfaces:
+            if interface is not self.connection.interface:
+                interface.eDisconnect()
         self.tws.eDisconnect()
+        if self.callback.execution_Journal is not None:
+            self.callback.execution_Journal.flush()
 
     def connected(self):
         """
@@ -643,25 +910,29 @@ class IBBroker(Broker):
         """
         return self.tws.isConnected()
 
-    def nextOrderId(self, from_IB = False, from_datetime = True):
+    def nextOrderId(self, from_IB = False, from_datetime = False):
         """
         SUMMARY:
-            Method summary
+            Returns a new order id from the <<order_ids>> allocator. Ids are
+            strictly increasing and safe to request from several threads.
         
         PARAMETERS:
-            None
+            from_IB - True to sync the allocator with reqIds first
+            from_datetime - True for the legacy id built from the current
+                            day, hour, minute, second and tenth of a second;
+                            ids within the same tenth of a second collide.
+                            The <<order_ids>> allocator is left untouched
         
         RETURNS:
-            None
+            order_id - integer
         
         RESULTS:
             None
         """
         if from_IB:
+            request = self.callback.request_Registry.register(NEXT_VALID_ID)
             self.tws.reqIds(1)
-            id = self.callback.next_ValidId
-            self.current_order_id = id + 1
-            return id
+            self._syncOrderIds(request)
         if from_datetime:
             now = dt.datetime.now()
             strID = "".join((str('{:02d}'.format(now.day)),
@@ -669,13 +940,9 @@ class IBBroker(Broker):
                              str('{:02d}'.format(now.minute)),
                              str('{:02d}'.format(now.second)),
                              str('{:02d}'.format(now.microsecond)[:1])))
-            id = int(strID)
-            self.current_order_id = id + 1
-            return id
+            return int(strID)
 
-        id = self.current_order_id
-        self.current_order_id += 1
-        return id
+        return self.order_ids.next()
 
     def createContract(self, ticker, instrument_type,
                        exchange='SMART', currency='USD',
@@ -1540,15 +1807,52 @@ class IBDataBroker(IBBroker, DataBroker):
         current_request_id -
         tickers -
         current_ticker_id -
+        historical_scheduler -
+        quote_flights -
+        history_flights -
+        snapshot_lines -
+        bar_cache -
+        market_subscriptions -
+        market_depth -
+        bar_aggregator -
+        contract_cache -
+        execution_journal -
+        account_state -
+        futures_chains -
 
     CLASS SPECIAL METHODS:
         None
 
     CLASS PRIVATE METHODS:
         _resetCallbackAttribute -
+        _nextRequestId -
+        _waitForRequest -
+        _executionJournal -
         _incrementTickerID -
+        _tickerItems -
         _addTicker -
         _isInTradingHours -
+        _adjustDataTime -
+        _historicalRequestKeys -
+        _requestHistoricalData -
+        _submitHistoricalData -
+        _historicalDeadline -
+        _waitForHistoricalData -
+        _historicalChunks -
+        _barSearchFormat -
+        _barAtTime -
+        _cachedBarAtTime -
+        _submitDataAtTime -
+        _submitQuote -
+        _expireQuote -
+        _snapshotFrame -
+        _requestPositions -
+        _collectPositions -
+        _cachedPortfolio -
+        _requestPortfolio -
+        _collectPortfolio -
+        _portfolioFrame -
+        _requestContractDetails -
 
     CLASS PUBLIC METHODS:
         getCallbackAttribute -
@@ -1557,11 +1861,32 @@ class IBDataBroker(IBBroker, DataBroker):
         contractSearch -
         removeFromTickers -
         getAccountInformation -
+        getAccountValue -
+        startAccountUpdates -
+        stopAccountUpdates -
         getDataAtTime -
+        getDataAtTimeBatch -
         getDataInRange -
         getDailyData -
         getContractDetails -
+        getFuturesChain -
+        getFrontContract -
+        getContinuousFutures -
+        resolveContracts -
         getLiveMarketData -
+        getLiveMarketDataBatch -
+        subscribeMarketData -
+        unsubscribeMarketData -
+        getLatestQuote -
+        startTickCapture -
+        stopTickCapture -
+        getCapturedData -
+        subscribeMarketDepth -
+        unsubscribeMarketDepth -
+        getOrderBook -
+        subscribeBars -
+        unsubscribeBars -
+        getBars -
         getPostiions -
         getPortfolio -
         getExecutedOrders -
@@ -1573,13 +1898,29 @@ class IBDataBroker(IBBroker, DataBroker):
     """
 
     def __init__(self, account_name = 'DU603835', host = '', port = 7497,
-                    client_id = 100, path_root = '/', **kwargs):
+                    client_id = 100, path_root = '/', path_bar_cache = None,
+                    max_market_data_lines = 100, path_contract_cache = None,
+                    quote_freshness = 0, history_freshness = 0, **kwargs):
         """
         SUMMARY:
             Method summary
 
         PARAMETERS:
-            None
+            path_bar_cache - string path of the directory historical bars of
+                             closed sessions are cached in; None disables the
+                             cache
+            max_market_data_lines - integer number of streaming market data
+                                    subscriptions the account allows
+            path_contract_cache - string path of the file qualified contracts
+                                  are persisted to between sessions; None
+                                  keeps them in memory only
+            quote_freshness - float number of seconds a snapshot quote is
+                              reused by identical requests after it ended;
+                              0 only shares snapshots in flight
+            history_freshness - float number of seconds a historical data
+                                request is reused by identical requests
+                                after it ended; 0 only shares requests in
+                                flight
 
         RETURNS:
             None
@@ -1595,10 +1936,35 @@ class IBDataBroker(IBBroker, DataBroker):
         #read state from file or call from IB
         #store as dictionary or DF?
         #keep trying to create a valid id?
-        self._current_request_id = 1
+        self._current_request_id = REQUEST_ID_START
+        self._request_id_lock = threading.Lock()
+
+        self._tickers = TickerRegistry(first_id = 1)
 
-        self._tickers = {}
-        self._current_ticker_id = 1
+        self._account_summary_request_id = None
+
+        self._historical_scheduler = pc.HistoricalScheduler()
+
+        self._quote_flights = SingleFlight(freshness = quote_freshness)
+        self._history_flights = SingleFlight(freshness = history_freshness)
+        self._snapshot_lines = pc.MarketDataLines(
+                            lambda: self.market_subscriptions.max_lines -
+                                    len(self.market_subscriptions))
+
+        self._futures_chains = fc.FuturesChainCache()
+
+        if path_bar_cache is None:
+            self._bar_cache = None
+        else:
+            self._bar_cache = bc.BarCache(path_cache = path_bar_cache)
+
+        self.market_subscriptions.max_lines = max_market_data_lines
+
+        self.contract_cache.path_file = path_contract_cache
+        self.contract_cache.load()
+
+        if self.exec_path:
+            self._executionJournal(self.exec_path)
 
     """
     CLASS PROPERTIES
@@ -1615,39 +1981,161 @@ class IBDataBroker(IBBroker, DataBroker):
     current_request_id = property(**current_request_id())
 
     def tickers():
-        doc = "The tickers property."
+        doc = """
+                The <TickerRegistry> of {tickerId: (symbol, Contract())}.
+                Assigning a Contract() registers it under a stable tickerId.
+            """
         def fget(self):
             return self._tickers
-        def fset(self, contract): # ('ticker', Contract())
-            if self.current_ticker_id in self._tickers:
-                self._incrementTickerID()
-            ticker_id = self.current_ticker_id
-            ticker = contract.m_symbol
-            if self._tickers == {}:
-                self._tickers[ticker_id] = (ticker, contract)
-                return
-            for element in self._tickers:
-                if contract == self._tickers[element][1]:
-                    print("Contract already in dictionary.")
-                    return
-            self._tickers[ticker_id] = (ticker, contract)
-            self._incrementTickerID()
+        def fset(self, contract): # Contract()
+            self._tickers.add(contract)
         def fdel(self):
             del self._tickers
         return locals()
     tickers = property(**tickers())
 
     def current_ticker_id():
-        doc = "The current_ticker_id property."
+        doc = "The tickerId assigned to the next new contract."
         def fget(self):
-            return self._current_ticker_id
+            return self.tickers.current_id
         def fset(self, value):
-            self._current_ticker_id = value
-        def fdel(self):
-            del self._current_ticker_id
+            self.tickers.current_id = value
         return locals()
     current_ticker_id = property(**current_ticker_id())
 
+    def historical_scheduler():
+        doc = """
+                The <HistoricalScheduler> pacing the historical data requests
+                of this broker. Exposes <<queue_depth>>, <<in_flight>> and
+                <<wait_time>>.
+            """
+        def fget(self):
+            return self._historical_scheduler
+        def fset(self, value):
+            self._historical_scheduler = value
+        def fdel(self):
+            del self._historical_scheduler
+        return locals()
+    historical_scheduler = property(**historical_scheduler())
+
+    def quote_flights():
+        doc = """
+                The <SingleFlight> identical snapshot quotes share; its
+                <<freshness>> is the seconds an ended snapshot is reused.
+            """
+        def fget(self):
+            return self._quote_flights
+        return locals()
+    quote_flights = property(**quote_flights())
+
+    def snapshot_lines():
+        doc = """
+                The <MarketDataLines> keeping the snapshot quotes open at
+                once within the lines the <<market_subscriptions>> leave
+                free.
+            """
+        def fget(self):
+            return self._snapshot_lines
+        return locals()
+    snapshot_lines = property(**snapshot_lines())
+
+    def history_flights():
+        doc = """
+                The <SingleFlight> identical historical data requests share;
+                its <<freshness>> is the seconds an ended request is reused.
+            """
+        def fget(self):
+            return self._history_flights
+        return locals()
+    history_flights = property(**history_flights())
+
+    def bar_cache():
+        doc = """
+                The <BarCache> historical bars of closed sessions are served
+                from; None if caching is disabled.
+            """
+        def fget(self):
+            return self._bar_cache
+        def fset(self, value):
+            self._bar_cache = value
+        def fdel(self):
+            del self._bar_cache
+        return locals()
+    bar_cache = property(**bar_cache())
+
+    def market_subscriptions():
+        doc = """
+                The <SubscriptionManager> holding the streaming market data
+                subscriptions of this broker.
+            """
+        def fget(self):
+            return self.callback.market_Subscriptions
+        return locals()
+    market_subscriptions = property(**market_subscriptions())
+
+    def market_depth():
+        doc = """
+                The <DepthBookManager> holding the order books of the market
+                depth subscriptions of this broker.
+            """
+        def fget(self):
+            return self.callback.market_Depth
+        return locals()
+    market_depth = property(**market_depth())
+
+    def bar_aggregator():
+        doc = """
+                The <BarAggregator> building 1 min to 1 hour bars of the
+                contracts subscribed with <subscribeBars>. Bar close callbacks
+                are registered with its <addCallback>.
+            """
+        def fget(self):
+            return self.callback.bar_Aggregator
+        return locals()
+    bar_aggregator = property(**bar_aggregator())
+
+    def contract_cache():
+        doc = """
+                The <ContractCache> of the qualified contracts described by
+                <position>, <updatePortfolio> and <contractDetails>.
+            """
+        def fget(self):
+            return self.callback.contract_Cache
+        return locals()
+    contract_cache = property(**contract_cache())
+
+    def execution_journal():
+        doc = """
+                The <ExecutionJournal> the executions and commissions of the
+                account are written to, beside the execution log given as
+                <<exec_path>> or to <placeRecordedOrder>; None until one is
+                given.
+            """
+        def fget(self):
+            return self.callback.execution_Journal
+        return locals()
+    execution_journal = property(**execution_journal())
+
+    def account_state():
+        doc = """
+                The <AccountState> caching the account values and portfolio
+                received from IB. Kept current by <startAccountUpdates>.
+            """
+        def fget(self):
+            return self.callback.account_State
+        return locals()
+    account_state = property(**account_state())
+
+    def futures_chains():
+        doc = """
+                The <FuturesChainCache> of the futures chains loaded with
+                <getFuturesChain>, refreshed at most daily.
+            """
+        def fget(self):
+            return self._futures_chains
+        return locals()
+    futures_chains = property(**futures_chains())
+
     """
     CLASS SPECIAL METHODS
     """
@@ -1693,63 +2181,86 @@ class IBDataBroker(IBBroker, DataBroker):
         else:
             print("Attribute not found.\nNo attribute reset.")
 
-    def getCallbackAttribute(self, attribute = ''):
+    def _nextRequestId(self):
         """
         SUMMARY:
-            Method summary
+            Returns a unique reqId for a request and advances
+            <<current_request_id>>. Safe to call from multiple threads.
 
         PARAMETERS:
             None
 
         RETURNS:
-            None
+            request_id - integer reqId
 
         RESULTS:
-            None
+            Increments <<current_request_id>>.
         """
-        return getattr(self.callback, attribute)
+        with self._request_id_lock:
+            request_id = self.current_request_id
+            self.current_request_id += 1
+        return request_id
 
-    def _incrementTickerID(self):
+    def _waitForRequest(self, request, time_out = 5, description = ''):
         """
         SUMMARY:
-            Method summary
+            Blocks until the <RequestFuture> <<request>> is resolved by its end
+            callback or <<time_out>> seconds pass.
 
         PARAMETERS:
-            None
+            request - <RequestFuture> returned by the callback request registry
+            time_out - float number of seconds to wait
+            description - string naming the request for the time out message
 
         RETURNS:
-            None
+            boolean - True if the end callback arrived in time
 
         RESULTS:
-            None
+            Releases the request from the registry on time out.
         """
-        self.current_ticker_id += 1
+        if request.wait(time_out):
+            return True
+        self.callback.request_Registry.release(request.key)
+        print("Request timed out:", description, "\nReturning partial data.")
+        return False
 
-    # MAY NOT NEED ANYMORE
-    def _addTicker(self, ticker = '', contract = Contract()):
+    def _executionJournal(self, path = ''):
         """
         SUMMARY:
-            Method summary
+            Returns the <ExecutionJournal> kept beside the execution log
+            <<path>>, replacing the <<execution_journal>> if it writes
+            elsewhere. The journal is written to its own file, see
+            <journalPath>, so a CSV log at <<path>> is left untouched.
 
         PARAMETERS:
-            None
+            path - string path of the execution log; '' for <<exec_path>>
 
         RETURNS:
-            None
+            journal - <ExecutionJournal>; None if no path is given or the
+                      journal file holds something else
 
         RESULTS:
-            None
+            Closes the replaced journal once its queue is written.
         """
+        if path == '':
+            path = self.exec_path
+        if not path:
+            return None
+        path = journalPath(path)
+        journal = self.callback.execution_Journal
+        if journal is not None and journal.path_file == path:
+            return journal
+        try:
+            replacement = ExecutionJournal(path_file = path)
+        except ValueError as error:
+            print(error, "\nNo execution journal opened.")
+            return None
+        if journal is not None:
+            journal.close()
+        self.callback.execution_Journal = replacement
+        return self.callback.execution_Journal
 
-        if ticker in self.tickers:
-            ticker_id = self.tickers[ticker]
-        else:
-            ticker_id = self.current_ticker_id
-            self.tickers[ticker] = (ticker_id, contract)
-            self._incrementTickerID()
-        return ticker_id
-
-    def _isInTradingHours(self, yes = True):
+    def getCallbackAttribute(self, attribute = ''):
         """
         SUMMARY:
             Method summary
@@ -1763,14 +2274,9 @@ class IBDataBroker(IBBroker, DataBroker):
         RESULTS:
             None
         """
-        if yes:
-            return 1
-        return 0
+        return getattr(self.callback, attribute)
 
-    """
-    CLASS PUBLIC METHODS
-    """
-    def searchTickers(self, search_object, type_search = '', type_data = ''):
+    def _incrementTickerID(self):
         """
         SUMMARY:
             Method summary
@@ -1784,23 +2290,10 @@ class IBDataBroker(IBBroker, DataBroker):
         RESULTS:
             None
         """
-        if type_data not in ('ID','CONTRACT','TUPLE'):
-            print("Type of data must be 'ID', 'CONTRACT' or 'TUPLE'.")
-            return None
-
-        if type_search not in ('TICKER','CONTRACT'):
-            print("Type of search must be 'ID' or 'CONTRACT'.")
-            return None
-
-        if type_search == 'TICKER':
-            return self.tickerSearch(ticker = search_object,
-                                        type_data = type_data)
-
-        if type_search == 'CONTRACT':
-            return self.contractSearch(contract = search_object,
-                                        type_data = type_data)
+        self.current_ticker_id += 1
 
-    def tickerSearch(self, ticker, type_data = ''):
+    # MAY NOT NEED ANYMORE
+    def _addTicker(self, ticker = '', contract = Contract()):
         """
         SUMMARY:
             Method summary
@@ -1814,43 +2307,34 @@ class IBDataBroker(IBBroker, DataBroker):
         RESULTS:
             None
         """
-        items = []
-        for element in self.tickers:
-            if ticker == self.tickers[element][0]:
-                if type_data == 'ID':
-                    items.append(element)
-                if type_data == 'CONTRACT':
-                    items.append(self.tickers[element][1])
-                if type_data == 'TUPLE':
-                    items.append(self.tickers[element])
-        return items
+        return self.tickers.add(contract)
 
-    def contractSearch(self, contract, type_data = ''):
+    def _tickerItems(self, ticker_ids, type_data = ''):
         """
         SUMMARY:
-            Method summary
+            Returns the entries of <<tickers>> registered under
+            <<ticker_ids>> in the form <<type_data>> asks for.
 
         PARAMETERS:
-            None
+            ticker_ids - list of integer tickerIds
+            type_data - 'ID', 'CONTRACT' or 'TUPLE'
 
         RETURNS:
-            None
+            items - list of tickerIds, Contract() objects or
+                    (symbol, Contract()) tuples
 
         RESULTS:
             None
         """
-        items = []
-        for element in self.tickers:
-            if contract == self.tickers[element][1]:
-                if type_data == 'ID':
-                    items.append(element)
-                if type_data == 'CONTRACT':
-                    items.append(self.tickers[element][1])
-                if type_data == 'TUPLE':
-                    items.append(self.tickers[element])
-        return items
+        if type_data == 'ID':
+            return list(ticker_ids)
+        if type_data == 'CONTRACT':
+            return [self.tickers[ticker_id][1] for ticker_id in ticker_ids]
+        if type_data == 'TUPLE':
+            return [self.tickers[ticker_id] for ticker_id in ticker_ids]
+        return []
 
-    def removeFromTickers(self, search_object, type_object):
+    def _isInTradingHours(self, yes = True):
         """
         SUMMARY:
             Method summary
@@ -1864,49 +2348,690 @@ class IBDataBroker(IBBroker, DataBroker):
         RESULTS:
             None
         """
-        if type_object not in ('ID','TICKER','CONTRACT'):
-            print("Type of data must be 'ID', 'TICKER' or 'CONTRACT'.")
-            return None
+        if yes:
+            return 1
+        return 0
 
-        if type_object == 'ID':
-            del self.tickers[search_object]
+    def _adjustDataTime(self, data_time, type_time = ''):
+        """
+        SUMMARY:
+            Moves <<data_time>> to the market open or close of its day when
+            <<type_time>> is 'OPEN' or 'CLOSE'.
 
-        if type_object == 'TICKER':
-            ticker_id = self.tickerSearch(ticker = search_object,
-                                            type_data = 'ID')
-            del self.tickers[ticker_id[0]]
+        PARAMETERS:
+            data_time - datetime.datetime object
+            type_time - string: 'OPEN', 'CLOSE' or ''
 
-        if type_object == 'CONTRACT':
-            ticker_id = self.contractSearch(contract = search_object,
-                                            type_data = 'ID')
-            # FOR ERROR HANDLING THE BELOW IF STATEMENT WAS ADDED 10/07/17            
-            if len(ticker_id) == 0:
-                return
-            del self.tickers[ticker_id[0]]
+        RETURNS:
+            data_time - datetime.datetime object
 
-    def getAccountInformation(self, all_accounts = True, attributes = ','):
+        RESULTS:
+            None
+        """
+        if type_time == 'OPEN':
+            return dt.datetime(year = data_time.year, month = data_time.month,
+                               day = data_time.day, hour = 9, minute = 30)
+        if type_time == 'CLOSE':
+            return dt.datetime(year = data_time.year, month = data_time.month,
+                               day = data_time.day, hour = 16)
+        return data_time
+
+    def _historicalRequestKeys(self, contract, end_date_time, duration,
+                               bar_size, type_data, trading_hours):
         """
         SUMMARY:
-            Method summary
+            Returns the keys the <<historical_scheduler>> paces a historical
+            data request by.
 
         PARAMETERS:
-            None
+            See <_requestHistoricalData>.
 
         RETURNS:
-            None
+            key - tuple identifying identical requests
+            contract_key - tuple identifying the contract, exchange and
+                           tick type of the request
 
         RESULTS:
             None
         """
+        contract_key = contractKey(contract) + (type_data,)
+        key = contract_key + (end_date_time, duration, bar_size, trading_hours)
+        return key, contract_key
+
+    @timed
+    def _requestHistoricalData(self, contract, end_date_time, duration,
+                               bar_size, type_data, trading_hours,
+                               time_out = 15):
         """
-        attributes values:
-        AccountType - Identifies the IB account structure
-        NetLiquidation - The basis for determining the price of the assets in
-            your account. Total cash value + stock value + options value + bond value
-        TotalCashValue - Total cash balance recognized at the time of trade
-            + futures PNL
-        SettledCash - Cash recognized at the time of settlement
-            - purchases at the time of trade - commissions - taxes - fees
+        SUMMARY:
+            Sends one reqHistoricalData request and blocks until its
+            'finished' bar, an error or <<time_out>>.
+
+        PARAMETERS:
+            contract - Contract() object
+            end_date_time - string end of the request, '%Y%m%d %H:%M:%S'
+            duration - string IB duration, e.g. '60 S', '1 D'
+            bar_size - string IB bar size, e.g. '1 min'
+            type_data - string IB whatToShow, e.g. 'MIDPOINT'
+            trading_hours - 1 for regular trading hours only, 0 otherwise
+            time_out - float number of seconds to wait for the request
+
+        RETURNS:
+            data - pandas DataFrame of bars indexed by date
+
+        RESULTS:
+            Raises <PacingViolation> if IB rejects the request for pacing.
+        """
+        ticker_id = self._nextRequestId()
+        self.callback.callback_Buffers.open('historical_Data', ticker_id)
+        request = self.callback.request_Registry.register(ticker_id)
+        self._dataTws(ticker_id).reqHistoricalData(
+                                   tickerId = ticker_id, contract = contract,
+                                   endDateTime = end_date_time,
+                                   durationStr = duration,
+                                   barSizeSetting = bar_size,
+                                   whatToShow = type_data,
+                                   useRTH = trading_hours, formatDate = 1)
+
+        completed = self._waitForRequest(request, time_out = time_out,
+                                         description = 'reqHistoricalData ' +
+                                                       str(contract.m_symbol))
+        bars = self.callback.callback_Buffers.close('historical_Data',
+                                                    ticker_id)
+
+        if request.error is not None and request.error[0] == 162 and \
+                'pacing' in str(request.error[1]).lower():
+            self.latency_recorder.recordRetry()
+            raise pc.PacingViolation(request.error[1])
+
+        data = pd.DataFrame(bars, columns = ['reqId','date', 'open', 'high',
+                                             'low', 'close', 'volume',
+                                             'count', 'WAP', 'hasGaps'])
+        data = data[~data['date'].astype(str).str.startswith('finished')].copy()
+        data['date'] = data['date'].apply(du.parser.parse)
+        data.set_index('date', inplace=True)
+
+        if self.bar_cache is not None:
+            # only a complete response covers the span of the request
+            span = None
+            if completed and request.error is None:
+                span = bc.requestSpan(end_date_time, duration, bar_size)
+            self.bar_cache.store(contract, type_data, bar_size, trading_hours,
+                                 data, span = span)
+        return data
+
+    def _submitHistoricalData(self, contract, end_date_time, duration,
+                              bar_size, type_data, trading_hours,
+                              time_out = 15):
+        """
+        SUMMARY:
+            Queues <_requestHistoricalData> on the <<historical_scheduler>>,
+            unless an identical request is shared by the <<history_flights>>.
+
+        PARAMETERS:
+            See <_requestHistoricalData>.
+
+        RETURNS:
+            request - <RequestFuture> resolved with the bars DataFrame
+
+        RESULTS:
+            None
+        """
+        key, contract_key = self._historicalRequestKeys(contract,
+                                                        end_date_time,
+                                                        duration, bar_size,
+                                                        type_data,
+                                                        trading_hours)
+        return self.history_flights.submit(
+                    key,
+                    lambda: self.historical_scheduler.submit(
+                                self._requestHistoricalData,
+                                key = key, contract_key = contract_key,
+                                contract = contract,
+                                end_date_time = end_date_time,
+                                duration = duration, bar_size = bar_size,
+                                type_data = type_data,
+                                trading_hours = trading_hours,
+                                time_out = time_out))
+
+    def _historicalDeadline(self, max_wait, time_out):
+        """
+        SUMMARY:
+            Returns the time by which the historical data requests just
+            queued should have completed: <<max_wait>> seconds from now, or
+            if None, the time the <<historical_scheduler>> needs to dispatch
+            its queue plus <<time_out>> seconds.
+        """
+        if max_wait is None:
+            max_wait = self.historical_scheduler.drainTime() + time_out
+        return time.time() + max_wait
+
+    def _waitForHistoricalData(self, requests, deadline):
+        """
+        SUMMARY:
+            Waits for <<requests>> until <<deadline>>. Requests still queued
+            at the deadline are left to complete on the
+            <<historical_scheduler>>, filling the <<bar_cache>>.
+
+        PARAMETERS:
+            requests - list of <RequestFuture> objects; None entries are
+                       skipped
+            deadline - float time as returned by <_historicalDeadline>
+
+        RETURNS:
+            boolean - True if every request completed before the deadline
+        """
+        for request in requests:
+            if request is None:
+                continue
+            if not request.wait(max(deadline - time.time(), 0)):
+                print("Historical data requests not completed in time.",
+                      sum(1 for request in requests
+                          if request is not None and not request.done()),
+                      "of", len(requests), "pending.")
+                return False
+        return True
+
+    def _historicalChunks(self, date_start, date_end, bar_size):
+        """
+        SUMMARY:
+            Splits <<date_start>> to <<date_end>> into the end times and
+            durations of historical data requests no longer than IB allows
+            for <<bar_size>>. Chunks of intraday bars end on midnight so each
+            chunk covers whole sessions.
+
+        PARAMETERS:
+            date_start - datetime.datetime object
+            date_end - datetime.datetime object
+            bar_size - string IB bar size
+
+        RETURNS:
+            chunks - list of (end_date_time, duration) string tuples
+
+        RESULTS:
+            None
+        """
+        chunk_seconds = pc.MAX_DURATION_SECONDS.get(bar_size, 86400)
+        chunks = []
+        chunk_end = date_end
+        while chunk_end > date_start:
+            chunk_start = max(chunk_end - dt.timedelta(seconds = chunk_seconds),
+                              date_start)
+            if chunk_seconds >= 86400 and chunk_start > date_start and \
+                    chunk_start.time() != dt.time():
+                midnight = dt.datetime.combine(chunk_start.date(),
+                                               dt.time()) + dt.timedelta(days = 1)
+                if midnight < chunk_end:
+                    chunk_start = midnight
+            seconds = int(np.ceil((chunk_end - chunk_start).total_seconds()))
+            if seconds <= 86400:
+                duration = str(seconds) + ' S'
+            else:
+                duration = str(int(np.ceil(seconds / 86400.0))) + ' D'
+            chunks.append((chunk_end.strftime('%Y%m%d %H:%M:%S'), duration))
+            chunk_end = chunk_start
+        return chunks
+
+    def _barSearchFormat(self, bar_size):
+        """
+        SUMMARY:
+            Returns the datetime format truncating a time to the start of its
+            bar of size <<bar_size>>.
+
+        PARAMETERS:
+            bar_size - string IB bar size
+
+        RETURNS:
+            index_search_format - string datetime format
+
+        RESULTS:
+            None
+        """
+        #%Y%m%d %H:%M:%S
+
+        #could modularize
+        if bar_size.endswith('sec') or bar_size.endswith('secs'):
+            index_search_format = '%Y%m%d %H:%M:%S'
+        if bar_size.endswith('min') or bar_size.endswith('mins'):
+            index_search_format = '%Y%m%d %H:%M:00'
+        if bar_size.endswith('hour') or bar_size.endswith('hours'):
+            index_search_format = '%Y%m%d %H:00:00'
+
+        #CHECK THE FOLLOWING FOR APPROPRIATE INDEX FORMATS
+        if bar_size.endswith('day'):
+            index_search_format = '%Y%m%d 00:00:00'
+        if bar_size.endswith('week'):
+            index_search_format = '%Y%m%d 00:00:00'
+        if bar_size.endswith('month'):
+            index_search_format = '%Y%m%d 00:00:00'
+        return index_search_format
+
+    def _barAtTime(self, data, data_time, bar_size):
+        """
+        SUMMARY:
+            Returns the bar of <<data>> starting at <<data_time>>; the last
+            bar if there is none.
+
+        PARAMETERS:
+            data - pandas DataFrame of bars indexed by date
+            data_time - datetime.datetime object
+            bar_size - string IB bar size of <<data>>
+
+        RETURNS:
+            bar - pandas Series
+
+        RESULTS:
+            None
+        """
+        index_search_format = self._barSearchFormat(bar_size)
+        try:
+           return data.loc[data_time.strftime(index_search_format)]
+        except:
+           print("Index not found problem")
+           print(traceback.format_exc)
+           return data.iloc[-1]
+        #format must be same as bar_size
+        #end modularize
+
+    def _cachedBarAtTime(self, contract, data_time, bar_size, type_data,
+                         trading_hours):
+        """
+        SUMMARY:
+            Returns the bar of <<contract>> starting at <<data_time>> from the
+            <<bar_cache>>.
+
+        PARAMETERS:
+            See <_requestHistoricalData>.
+
+        RETURNS:
+            bar - pandas Series; None if the bar is not cached
+
+        RESULTS:
+            None
+        """
+        if self.bar_cache is None:
+            return None
+        bar_time = dt.datetime.strptime(
+                        data_time.strftime(self._barSearchFormat(bar_size)),
+                        '%Y%m%d %H:%M:%S')
+        return self.bar_cache.barAtTime(contract, type_data, bar_size,
+                                        trading_hours, bar_time)
+
+    def _submitDataAtTime(self, data_time, type_data = 'BID_ASK',
+                          contract = Contract(), type_time = '',
+                          in_trading_hours = False, duration = '60 S',
+                          bar_size = '1 min', time_out = 15):
+        """
+        SUMMARY:
+            Queues the request of <getDataAtTime> without waiting for it.
+
+        PARAMETERS:
+            See <getDataAtTime>.
+
+        RETURNS:
+            request - <RequestFuture> resolved with the bar, a pandas
+                      Series, or None if no data was received; already
+                      resolved if the bar is in the <<bar_cache>>
+
+        RESULTS:
+            None
+        """
+        data_time = self._adjustDataTime(data_time, type_time)
+
+        trading_hours = self._isInTradingHours(in_trading_hours)
+
+        bar_request = RequestFuture(key = (contract.m_symbol, data_time))
+        bar = self._cachedBarAtTime(contract, data_time, bar_size, type_data,
+                                    trading_hours)
+        if bar is not None:
+            bar_request.resolve(bar)
+            return bar_request
+
+        end_date_time = (data_time + dt.timedelta(seconds=1)).strftime('%Y%m%d %H:%M:%S')
+        request = self._submitHistoricalData(contract = contract,
+                                             end_date_time = end_date_time,
+                                             duration = duration,
+                                             bar_size = bar_size,
+                                             type_data = type_data,
+                                             trading_hours = trading_hours,
+                                             time_out = time_out)
+
+        def resolveBar(request):
+            data = request.result
+            if data is None or data.empty:
+                print("Error retrieving data for: ", contract.m_symbol,
+                        "\nEmpty callback.\nWait time out.")
+                bar_request.resolve(None)
+                return
+            try:
+                bar_request.resolve(self._barAtTime(data, data_time,
+                                                    bar_size))
+            except Exception as error:
+                bar_request.fail(error)
+        request.addDoneCallback(resolveBar)
+        return bar_request
+
+    def _submitQuote(self, contract):
+        """
+        SUMMARY:
+            Sends a snapshot reqMktData for <<contract>>, shared with every
+            identical call while it is in flight or within the freshness of
+            the <<quote_flights>>. The request waits for a free line of the
+            <<snapshot_lines>>.
+
+        RETURNS:
+            quote - <RequestFuture> keyed by the tickerId of the snapshot and
+                    resolved with the list of its <tickPrice> tuples by
+                    <tickSnapshotEnd>, an error or <_expireQuote>
+        """
+        def request():
+            ticker_id = self._nextRequestId()
+            self.callback.callback_Buffers.open('tick_Price', ticker_id)
+            snapshot = self.callback.request_Registry.register(ticker_id)
+            quote = RequestFuture(key = ticker_id)
+            snapshot.addDoneCallback(
+                lambda snapshot: self._expireQuote(quote, snapshot.error,
+                                                   ended = True))
+            self.snapshot_lines.submit(
+                        ticker_id,
+                        lambda: self._dataTws(ticker_id).reqMktData(
+                                tickerId = ticker_id, contract = contract,
+                                genericTickList = '', snapshot = True))
+            return quote
+        return self.quote_flights.submit(contractKey(contract), request)
+
+    def _expireQuote(self, quote, error = None, ended = False):
+        """
+        SUMMARY:
+            Ends the snapshot of <<quote>>, resolving it with the ticks
+            received so far, or failing it with <<error>>. Only a snapshot
+            <<ended>> by <tickSnapshotEnd> with ticks stays shared by the
+            <<quote_flights>>; a timed out or empty one is sent anew.
+        """
+        ticker_id = quote.key
+        self.callback.request_Registry.release(ticker_id)
+        self.snapshot_lines.release(ticker_id)
+        ticks = self.callback.callback_Buffers.close('tick_Price', ticker_id)
+        if not ended or not ticks:
+            self.quote_flights.discard(quote)
+        if error is not None:
+            quote.fail(error)
+        else:
+            quote.resolve(ticks)
+
+    def _snapshotFrame(self, ticks, contract):
+        """
+        SUMMARY:
+            Returns the DataFrame of the snapshot <<ticks>> of <<contract>>
+            with their Type; empty if there are none.
+        """
+        data = pd.DataFrame(ticks or [],
+                            columns = ['tickerId', 'field', 'price',
+                                        'canAutoExecute'])
+        if data.empty:
+            print("Error retrieving data for: ", contract.m_symbol, ':',
+                    contract, "\nEmpty callback.\nWait time out.")
+            return pd.DataFrame()
+        data["Type"] = data["field"].map(TICK_TYPES)
+        return data
+
+    def _requestContractDetails(self, contract, time_out = 5):
+        """
+        SUMMARY:
+            Sends a reqContractDetails for <<contract>> and waits for its
+            <contractDetailsEnd>.
+
+        RETURNS:
+            details - list of the ContractDetails() received
+        """
+        request_id = self._nextRequestId()
+        self.callback.callback_Buffers.open('contract_Details', request_id)
+        request = self.callback.request_Registry.register(request_id)
+        self._dataTws(request_id).reqContractDetails(request_id, contract)
+
+        self._waitForRequest(request, time_out = time_out,
+                             description = 'reqContractDetails')
+        details = self.callback.callback_Buffers.close('contract_Details',
+                                                       request_id)
+        self.contract_cache.save()
+        return details
+
+    def _requestPositions(self):
+        """
+        SUMMARY:
+            Sends reqPositions.
+
+        RETURNS:
+            request - <RequestFuture> resolved by <positionEnd>
+        """
+        self._resetCallbackAttribute('update_Position')
+
+        request = self.callback.request_Registry.register(POSITION_END)
+        self.tws.reqPositions()
+        return request
+
+    def _collectPositions(self):
+        """
+        SUMMARY:
+            Cancels the positions request and returns the positions received.
+
+        RETURNS:
+            data - pandas DataFrame indexed by Contract_Id
+        """
+        self.tws.cancelPositions()
+        self.contract_cache.save()
+
+        data = pd.DataFrame(self.callback.update_Position,
+                            columns = ['Account_Name', 'Contract_Id','Contract_Object',
+                                        'Currency', 'Exchange', 'Expiry',
+                                        'Include_Expired', 'Local_Symbol',
+                                        'Multiplier', 'Right',
+                                        'Financial_Instrument', 'Strike_Price',
+                                        'Symbol', 'Trading_Class',
+                                        'Number_of_Units',
+                                        'Average_Unit_Price'])
+        data.set_index(keys = ['Contract_Id'], inplace = True)
+        return data
+
+    def _cachedPortfolio(self, max_staleness = None):
+        """
+        SUMMARY:
+            Returns the portfolio from the <<account_state>> while
+            <startAccountUpdates> is streaming or when it was downloaded
+            within <<max_staleness>> seconds; None otherwise.
+        """
+        streaming = self.account_name in self.account_state.streaming_accounts
+        if not streaming and max_staleness is None:
+            return None
+        rows = self.account_state.portfolio(self.account_name,
+                                            max_staleness = max_staleness)
+        if rows is None:
+            return None
+        return self._portfolioFrame(rows)
+
+    def _requestPortfolio(self):
+        """
+        SUMMARY:
+            Sends reqAccountUpdates.
+
+        RETURNS:
+            request - <RequestFuture> resolved by <accountDownloadEnd>
+        """
+        self._resetCallbackAttribute('update_Portfolio')
+
+        request = self.callback.request_Registry.register(ACCOUNT_DOWNLOAD_END)
+        self.tws.reqAccountUpdates(True, self.account_name)
+        return request
+
+    def _collectPortfolio(self):
+        """
+        SUMMARY:
+            Ends the account updates unless they are streaming and returns
+            the portfolio received.
+
+        RETURNS:
+            portfolio - pandas DataFrame
+        """
+        if self.account_name not in self.account_state.streaming_accounts:
+            self.tws.reqAccountUpdates(False, self.account_name)
+        self.contract_cache.save()
+        return self._portfolioFrame(self.callback.update_Portfolio)
+
+    def _portfolioFrame(self, rows):
+        """
+        SUMMARY:
+            Returns the portfolio DataFrame of <updatePortfolio> <<rows>>.
+        """
+        portfolio = pd.DataFrame(rows,
+                                    columns = ['Contract_ID', 'Currency',
+                                                'Expiry', 'Include_Expired',
+                                                'Local_Symbol', 'Multiplier',
+                                                'Primary_Exchange', 'Right',
+                                                'Security_Type', 'Strike',
+                                                'Symbol', 'Trading_Class',
+                                                'Position', 'Market_Price',
+                                                'Market_Value', 'Average_Cost',
+                                                'Unrealized_PnL',
+                                                'Realized_PnL', 'Account_Name'])
+        return portfolio
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def searchTickers(self, search_object, type_search = '', type_data = ''):
+        """
+        SUMMARY:
+            Method summary
+
+        PARAMETERS:
+            None
+
+        RETURNS:
+            None
+
+        RESULTS:
+            None
+        """
+        if type_data not in ('ID','CONTRACT','TUPLE'):
+            print("Type of data must be 'ID', 'CONTRACT' or 'TUPLE'.")
+            return None
+
+        if type_search not in ('TICKER','CONTRACT'):
+            print("Type of search must be 'ID' or 'CONTRACT'.")
+            return None
+
+        if type_search == 'TICKER':
+            return self.tickerSearch(ticker = search_object,
+                                        type_data = type_data)
+
+        if type_search == 'CONTRACT':
+            return self.contractSearch(contract = search_object,
+                                        type_data = type_data)
+
+    def tickerSearch(self, ticker, type_data = ''):
+        """
+        SUMMARY:
+            Method summary
+
+        PARAMETERS:
+            None
+
+        RETURNS:
+            None
+
+        RESULTS:
+            None
+        """
+        return self._tickerItems(self.tickers.idsBySymbol(ticker), type_data)
+
+    def contractSearch(self, contract, type_data = ''):
+        """
+        SUMMARY:
+            Method summary
+
+        PARAMETERS:
+            None
+
+        RETURNS:
+            None
+
+        RESULTS:
+            None
+        """
+        ticker_id = self.tickers.idByContract(contract)
+        if ticker_id is None:
+            return []
+        return self._tickerItems([ticker_id], type_data)
+
+    def removeFromTickers(self, search_object, type_object):
+        """
+        SUMMARY:
+            Method summary
+
+        PARAMETERS:
+            None
+
+        RETURNS:
+            None
+
+        RESULTS:
+            None
+        """
+        if type_object not in ('ID','TICKER','CONTRACT'):
+            print("Type of data must be 'ID', 'TICKER' or 'CONTRACT'.")
+            return None
+
+        if type_object == 'ID':
+            del self.tickers[search_object]
+
+        if type_object == 'TICKER':
+            ticker_id = self.tickerSearch(ticker = search_object,
+                                            type_data = 'ID')
+            if len(ticker_id) == 0:
+                return
+            del self.tickers[ticker_id[0]]
+
+        if type_object == 'CONTRACT':
+            ticker_id = self.contractSearch(contract = search_object,
+                                            type_data = 'ID')
+            # FOR ERROR HANDLING THE BELOW IF STATEMENT WAS ADDED 10/07/17            
+            if len(ticker_id) == 0:
+                return
+            del self.tickers[ticker_id[0]]
+
+    @timed
+    def getAccountInformation(self, all_accounts = True, attributes = ',',
+                              time_out = 5, max_staleness = None):
+        """
+        SUMMARY:
+            Returns the account summary values of <<attributes>>. Served
+            from the <<account_state>> when every tag asked for was received
+            within <<max_staleness>> seconds.
+
+        PARAMETERS:
+            all_accounts - True for the values of all accounts
+            attributes - comma separated string of account tags
+            time_out - float number of seconds to wait for
+                       <accountSummaryEnd>
+            max_staleness - float number of seconds cached values may be
+                            old; None always requests the values
+
+        RETURNS:
+            data - pandas DataFrame of Request_ID, Account, Tag, Value and
+                   Currency; Request_ID is None for cached values
+
+        RESULTS:
+            None
+        """
+        """
+        attributes values:
+        AccountType - Identifies the IB account structure
+        NetLiquidation - The basis for determining the price of the assets in
+            your account. Total cash value + stock value + options value + bond value
+        TotalCashValue - Total cash balance recognized at the time of trade
+            + futures PNL
+        SettledCash - Cash recognized at the time of settlement
+            - purchases at the time of trade - commissions - taxes - fees
         AccruedCash - Total accrued cash value of stock, commodities
             and securities
         BuyingPower - Buying power serves as a measurement of the dollar value
@@ -1954,33 +3079,143 @@ class IBDataBroker(IBBroker, DataBroker):
         Leverage - GrossPositionValue / NetLiquidation
         """
 
+        if max_staleness is not None:
+            tags = [tag for tag in attributes.split(',') if tag]
+            cached = self.account_state.values(tags = tags or None,
+                                               max_staleness = max_staleness)
+            if len(cached) and set(tags) <= set(cached['Tag']):
+                cached.insert(0, 'Request_ID', None)
+                return cached.drop('Time', axis = 1)
+
         self._resetCallbackAttribute('account_Summary')
 
         if all_accounts:
             group = "All"
-        self.tws.reqAccountSummary(reqId = self.current_request_id,
+        request_id = self._nextRequestId()
+        request = self.callback.request_Registry.register(request_id)
+        self.tws.reqAccountSummary(reqId = request_id,
                                     group = group, tags = attributes)
 
-        time.sleep(1)
+        self._waitForRequest(request, time_out = time_out,
+                             description = 'reqAccountSummary')
+        self.tws.cancelAccountSummary(request_id)
 
         data =  pd.DataFrame(self.callback.account_Summary,
                         columns = ['Request_ID', 'Account', 'Tag', 'Value',
                                     'Currency'])
-        return data
+        return data[data['Request_ID'] == request_id]
+
+    @timed
+    def getAccountValue(self, tag, currency = None, max_staleness = 60,
+                        time_out = 5):
+        """
+        SUMMARY:
+            Returns the value of account tag <<tag>>, e.g. 'NetLiquidation'
+            or 'BuyingPower', from the <<account_state>>. The value is only
+            requested from IB if none was received within <<max_staleness>>
+            seconds and <startAccountUpdates> is not streaming it.
+
+        PARAMETERS:
+            tag - string account tag
+            currency - string currency; None matches any currency
+            max_staleness - float number of seconds the value may be old
+            time_out - float number of seconds to wait if it is requested
+
+        RETURNS:
+            value - float, or string for non numeric tags; None if IB sent
+                    no value
+
+        RESULTS:
+            None
+        """
+        value = self.account_state.value(tag, currency = currency,
+                                         account = self.account_name,
+                                         max_staleness = max_staleness)
+        if value is not None:
+            return value
+        self.getAccountInformation(attributes = tag, time_out = time_out)
+        return self.account_state.value(tag, currency = currency,
+                                        account = self.account_name)
+
+    def startAccountUpdates(self, attributes = ACCOUNT_SUMMARY_TAGS,
+                            time_out = 5):
+        """
+        SUMMARY:
+            Subscribes to the account updates and the account summary of
+            <<attributes>> until <stopAccountUpdates>, so the
+            <<account_state>> and <getPortfolio> stay current without
+            further requests.
+
+        PARAMETERS:
+            attributes - comma separated string of account summary tags
+            time_out - float number of seconds to wait for the first
+                       <accountDownloadEnd>
+
+        RETURNS:
+            boolean - True if the portfolio was downloaded in time
+
+        RESULTS:
+            None
+        """
+        request = self.callback.request_Registry.register(ACCOUNT_DOWNLOAD_END)
+        self.tws.reqAccountUpdates(True, self.account_name)
+        self.account_state.setStreaming(self.account_name)
+
+        if self._account_summary_request_id is None:
+            self._account_summary_request_id = self._nextRequestId()
+            self.tws.reqAccountSummary(
+                            reqId = self._account_summary_request_id,
+                            group = 'All', tags = attributes)
+
+        return self._waitForRequest(request, time_out = time_out,
+                                    description = 'reqAccountUpdates')
+
+    def stopAccountUpdates(self):
+        """
+        SUMMARY:
+            Cancels the subscriptions of <startAccountUpdates>. Cached values
+            are kept and age from then on.
+
+        PARAMETERS:
+            None
+
+        RETURNS:
+            None
+
+        RESULTS:
+            None
+        """
+        self.tws.reqAccountUpdates(False, self.account_name)
+        self.account_state.setStreaming(self.account_name, streaming = False)
+        if self._account_summary_request_id is not None:
+            self.tws.cancelAccountSummary(self._account_summary_request_id)
+            self._account_summary_request_id = None
 
+    @timed
     def getDataAtTime(self, data_time, type_data = 'BID_ASK',
                         contract = Contract(), type_time = '',
                         in_trading_hours = False, duration = '60 S',
-                        bar_size = '1 min', try_time = 2, time_out = 15):
+                        bar_size = '1 min', try_time = 2, time_out = 15,
+                        max_wait = None):
         """
         SUMMARY:
-            Method summary
+            Returns the bar of <<contract>> at <<data_time>>. The request is
+            queued on the <<historical_scheduler>> and completes on its
+            'finished' bar instead of polling.
 
         PARAMETERS:
-            None
+            try_time - no longer used; requests complete on their end
+                       callback and pacing retries are left to the
+                       <<historical_scheduler>>
+            time_out - float number of seconds to wait for the request once
+                       it is sent
+            max_wait - float number of seconds to wait overall, including
+                       the time the request is queued for pacing; None
+                       waits as long as the <<historical_scheduler>> needs
+                       to dispatch its queue plus <<time_out>>
 
         RETURNS:
-            None
+            bar - pandas Series; None if no data was received in time
 
         RESULTS:
             None
@@ -2001,117 +3236,176 @@ class IBDataBroker(IBBroker, DataBroker):
         REBATE_RATE	Starting rebate rate
         FEE_RATE
         """
+        request = self._submitDataAtTime(data_time, type_data = type_data,
+                                         contract = contract,
+                                         type_time = type_time,
+                                         in_trading_hours = in_trading_hours,
+                                         duration = duration,
+                                         bar_size = bar_size,
+                                         time_out = time_out)
+        deadline = self._historicalDeadline(max_wait, time_out)
+        if not self._waitForHistoricalData([request], deadline):
+            return None
+        if request.error is not None:
+            raise request.error
+        return request.result
 
-        self._resetCallbackAttribute('historical_Data')
-
-#        ticker_id = self._addTicker(ticker = contract.m_symbol)
-        ticker_id = self.nextOrderId(from_datetime=True)
-
-        if type_time in ('OPEN', 'CLOSE'):
-            if type_time == 'OPEN':
-                data_time = dt.datetime(year = data_time.year,
-                                        month = data_time.month,
-                                        day = data_time.day,
-                                        hour = 9, minute = 30)
-            if type_time == 'CLOSE':
-                data_time = dt.datetime(year = data_time.year,
-                                        month = data_time.month,
-                                        day = data_time.day,
-                                        hour = 16)
+    @timed
+    def getDataAtTimeBatch(self, data_time, contracts = [],
+                           type_data = 'BID_ASK', type_time = '',
+                           in_trading_hours = False, duration = '60 S',
+                           bar_size = '1 min', time_out = 15, max_wait = None):
+        """
+        SUMMARY:
+            <getDataAtTime> for a list of contracts. All requests are queued
+            on the <<historical_scheduler>> at once and run concurrently as
+            far as the historical data pacing rules allow.
 
-        trading_hours = self._isInTradingHours(in_trading_hours)
+        PARAMETERS:
+            data_time - datetime.datetime object
+            contracts - list of Contract() objects
+            Remaining parameters as in <getDataAtTime>.
 
-        #could modularize
-        now = dt.datetime.now()
-        end_wait = now + dt.timedelta(seconds = time_out)
-
-        data = pd.DataFrame(self.callback.historical_Data,
-                            columns = ['reqId','date', 'open', 'high', 'low',
-                                        'close', 'volume', 'count', 'WAP',
-                                        'hasGaps'])
-        data_null = data
-        while data.equals(data_null) and now <= end_wait:
-            self.tws.reqHistoricalData( tickerId = ticker_id,
-                                     contract = contract,
-                                     endDateTime = (data_time + dt.timedelta(seconds=1)).strftime('%Y%m%d %H:%M:%S'),
-                                     durationStr = duration,
-                                     barSizeSetting = bar_size,
-                                     whatToShow = type_data,
-                                     useRTH = trading_hours, formatDate = 1)
-
-            time.sleep(try_time)
-            #end modularize
-
-            #could modularize
-            data = pd.DataFrame(self.callback.historical_Data,
-                                columns = ['reqId','date', 'open', 'high', 'low',
-                                            'close', 'volume', 'count', 'WAP',
-                                            'hasGaps'])
+        RETURNS:
+            data - pandas DataFrame with one row per contract, in the order
+                   given, holding the Symbol, Contract_Object and the bar at
+                   <<data_time>>; NaN where no data was received before
+                   <<max_wait>> passed
 
-            now = dt.datetime.now()
+        RESULTS:
+            None
+        """
+        data_time = self._adjustDataTime(data_time, type_time)
 
-            try:
-                data.drop(data.index[-1], inplace=True)
-                data['date'] = data['date'].apply(du.parser.parse)
-                data.set_index('date', inplace=True)
+        trading_hours = self._isInTradingHours(in_trading_hours)
 
-            except:
-                # FIX LOGIC BRANCH, CANNOT RETURN HERE
+        end_date_time = (data_time + dt.timedelta(seconds=1)).strftime('%Y%m%d %H:%M:%S')
+        cached_bars = [self._cachedBarAtTime(contract, data_time, bar_size,
+                                             type_data, trading_hours)
+                       for contract in contracts]
+        requests = [None if bar is not None else
+                    self._submitHistoricalData(contract = contract,
+                                               end_date_time = end_date_time,
+                                               duration = duration,
+                                               bar_size = bar_size,
+                                               type_data = type_data,
+                                               trading_hours = trading_hours,
+                                               time_out = time_out)
+                    for contract, bar in zip(contracts, cached_bars)]
+        deadline = self._historicalDeadline(max_wait, time_out)
+        self._waitForHistoricalData(requests, deadline)
+
+        bars = []
+        for contract, bar, request in zip(contracts, cached_bars, requests):
+            if request is None:
+                bars.append(bar)
+                continue
+            if not request.done():
+                bars.append(pd.Series())
+                continue
+            data = request.result
+            if data is None or data.empty:
                 print("Error retrieving data for: ", contract.m_symbol,
-                        "\nEmpty callback.\nTrying again.")
-                time.sleep(15)
-
-        if data.equals(data_null):
-            print("Error retrieving data for: ", contract.m_symbol,
-                    "\nEmpty callback.\nWait time out.")
-            return None
-
-        #end modularize
-
-        #%Y%m%d %H:%M:%S
-
-        #could modularize
-        if bar_size.endswith('sec') or bar_size.endswith('secs'):
-            index_search_format = '%Y%m%d %H:%M:%S'
-        if bar_size.endswith('min') or bar_size.endswith('mins'):
-            index_search_format = '%Y%m%d %H:%M:00'
-        if bar_size.endswith('hour') or bar_size.endswith('hours'):
-            index_search_format = '%Y%m%d %H:00:00'
-
-        #CHECK THE FOLLOWING FOR APPROPRIATE INDEX FORMATS
-        if bar_size.endswith('day'):
-            index_search_format = '%Y%m%d 00:00:00'
-        if bar_size.endswith('week'):
-            index_search_format = '%Y%m%d 00:00:00'
-        if bar_size.endswith('month'):
-            index_search_format = '%Y%m%d 00:00:00'
-
-        try:
-           return data.loc[data_time.strftime(index_search_format)]
-        except:
-           print("Index not found problem")
-           print(traceback.format_exc)
-           return data.iloc[-1]
-        #format must be same as bar_size
-        #end modularize
+                        "\nEmpty callback.\nWait time out.")
+                bars.append(pd.Series())
+                continue
+            bar = self._barAtTime(data, data_time, bar_size)
+            if isinstance(bar, pd.DataFrame):
+                bar = bar.iloc[-1]
+            bars.append(bar)
+
+        data = pd.DataFrame([bar.to_dict() for bar in bars],
+                            columns = ['reqId', 'open', 'high', 'low', 'close',
+                                       'volume', 'count', 'WAP', 'hasGaps'])
+        data.insert(0, 'Symbol', [contract.m_symbol for contract in contracts])
+        data.insert(1, 'Contract_Object', contracts)
+        return data
 
-    def getDataInRange(self):
+    @timed
+    def getDataInRange(self, date_start, date_end = None,
+                       type_data = 'BID_ASK', contract = Contract(),
+                       in_trading_hours = False, bar_size = '1 min',
+                       time_out = 60, max_wait = None):
         """
         SUMMARY:
-            Method summary
+            Returns the bars of <<contract>> from <<date_start>> to
+            <<date_end>>. Bars of the spans covered by earlier requests are
+            read from the <<bar_cache>>; only the missing spans are split into
+            chunks IB accepts for <<bar_size>>, all queued on the
+            <<historical_scheduler>> at once.
 
         PARAMETERS:
-            None
+            date_start - datetime.datetime object
+            date_end - datetime.datetime object; defaults to now
+            type_data - string IB whatToShow, see <getDataAtTime>
+            contract - Contract() object
+            in_trading_hours - True for regular trading hours only
+            bar_size - string IB bar size
+            time_out - float number of seconds to wait for each chunk once it
+                       is sent
+            max_wait - float number of seconds to wait overall for the
+                       chunks, see <getDataAtTime>
 
         RETURNS:
-            None
+            data - pandas DataFrame of bars indexed by date, without
+                   duplicates; only the chunks received before <<max_wait>>
+                   passed, empty if none was
 
         RESULTS:
             None
         """
-        # EXTEND USING getDataAtTime()
-        raise NotImplementedError("API method getDataInRange has not been implemented.")
-        #return None
+        if date_end is None:
+            date_end = dt.datetime.now()
+
+        trading_hours = self._isInTradingHours(in_trading_hours)
+
+        frames = []
+        spans = [(date_start, date_end)]
+        if self.bar_cache is not None:
+            spans = self.bar_cache.missingSpans(contract, type_data, bar_size,
+                                                trading_hours, date_start,
+                                                date_end)
+            session_date = date_start.date()
+            while session_date <= date_end.date():
+                cached = self.bar_cache.load(contract, type_data, bar_size,
+                                             trading_hours, session_date)
+                if cached is not None and not cached.empty:
+                    frames.append(cached)
+                session_date += dt.timedelta(days = 1)
+
+        requests = []
+        for span_start, span_end in spans:
+            for end_date_time, duration in self._historicalChunks(span_start,
+                                                                  span_end,
+                                                                  bar_size):
+                requests.append(self._submitHistoricalData(
+                                                contract = contract,
+                                                end_date_time = end_date_time,
+                                                duration = duration,
+                                                bar_size = bar_size,
+                                                type_data = type_data,
+                                                trading_hours = trading_hours,
+                                                time_out = time_out))
+
+        deadline = self._historicalDeadline(max_wait, time_out)
+        self._waitForHistoricalData(requests, deadline)
+        for request in requests:
+            if not request.done() or request.result is None or \
+               request.result.empty:
+                continue
+            frames.append(request.result.drop('reqId', axis = 1,
+                                              errors = 'ignore'))
+
+        if not frames:
+            print("Error retrieving data for: ", contract.m_symbol,
+                    "\nEmpty callback.\nWait time out.")
+            return pd.DataFrame(columns = bc.BAR_COLUMNS)
+
+        data = pd.concat(frames)
+        data = data.set_index(pd.DatetimeIndex(data.index))
+        data = data[~data.index.duplicated(keep = 'last')].sort_index()
+        data.index.name = 'date'
+        return data[(data.index >= date_start) & (data.index <= date_end)]
 
     def getDailyData(self, stock_list, provider, date_start, date_end = None):
         """
@@ -2167,6 +3461,7 @@ class IBDataBroker(IBBroker, DataBroker):
             """
             return data
 
+    @timed
     def getContractDetails(self, contract=Contract(), time_out=5):
         """
         SUMMARY:
@@ -2174,239 +3469,744 @@ class IBDataBroker(IBBroker, DataBroker):
             requirements. Used to obtain non-expired future chain right now.
 
         PARAMETERS:
-            None
+            None
+
+        RETURNS:
+            None
+
+        RESULTS:
+            None
+        """
+        contract_details = self._requestContractDetails(contract,
+                                                        time_out = time_out)
+
+        fut_cont_dict = pd.DataFrame(
+                {'market_symbol': [detail.m_marketName
+                                   for detail in contract_details],
+                 'contractMonth': [detail.m_contractMonth
+                                   for detail in contract_details],
+                 'Expiry': fc.parseExpiries([detail.m_summary.m_expiry
+                                             for detail in contract_details]),
+                 'IB_symbol': [detail.m_summary.m_symbol
+                               for detail in contract_details],
+                 'Contract object': [detail.m_summary
+                                     for detail in contract_details]},
+                index = [detail.m_summary.m_localSymbol
+                         for detail in contract_details],
+                columns = ['market_symbol', 'contractMonth', 'Expiry',
+                           'IB_symbol', 'Contract object'])
+        fut_cont_dict = fut_cont_dict[~fut_cont_dict.index.duplicated(
+                                                            keep = 'last')]
+        fut_cont_dict = fut_cont_dict.sort_values('Expiry', ascending=True)
+        fut_cont_dict['Expiry'] = fut_cont_dict['Expiry'].dt.date
+
+        return fut_cont_dict
+
+    @timed
+    def getFuturesChain(self, symbol, exchange, currency = 'USD',
+                        as_of = None, refresh = False, time_out = 5):
+        """
+        SUMMARY:
+            Returns the futures chain of root <<symbol>>, expired contracts
+            included as far as IB still describes them. The chain is
+            requested with <reqContractDetails> at most once a day and served
+            from the <<futures_chains>> otherwise.
+
+        PARAMETERS:
+            symbol - string root symbol, e.g. 'ES'
+            exchange - string exchange, e.g. 'GLOBEX'
+            currency - string currency
+            as_of - date; contracts expired before it are left out
+            refresh - True to request the chain even if it is fresh
+            time_out - float number of seconds to wait for the chain
+
+        RETURNS:
+            data - pandas DataFrame of <<CHAIN_COLUMNS>> of <futuresChain>
+                   sorted by Expiry; empty if IB described no contract
+
+        RESULTS:
+            Replaces the cached chain of <<symbol>> on <<exchange>> in
+            <<currency>>, kept under its <chainKey>, when it is requested.
+        """
+        key = fc.chainKey(symbol, exchange, currency)
+        if refresh or not self.futures_chains.isFresh(key):
+            contract = Contract()
+            contract.m_symbol = symbol
+            contract.m_secType = 'FUT'
+            contract.m_exchange = exchange
+            contract.m_currency = currency
+            contract.m_includeExpired = True
+            details = self._requestContractDetails(contract,
+                                                   time_out = time_out)
+            if not details:
+                print("No futures chain received for: ", symbol)
+                if key not in self.futures_chains:
+                    return pd.DataFrame(columns = fc.CHAIN_COLUMNS)
+            else:
+                self.futures_chains.update(key, details)
+        return self.futures_chains.chain(key, as_of = as_of)
+
+    def getFrontContract(self, symbol, exchange, currency = 'USD',
+                         as_of = None, rule = fc.ROLL_DAYS, days = 0,
+                         offset = 0, time_out = 5):
+        """
+        SUMMARY:
+            Returns the contract of root <<symbol>> held at <<as_of>> under
+            the roll <<rule>>, loading the chain with <getFuturesChain> if it
+            is not fresh.
+
+        PARAMETERS:
+            symbol - string root symbol, e.g. 'ES'
+            exchange - string exchange, e.g. 'GLOBEX'
+            currency - string currency
+            as_of - date or datetime; None is today
+            rule - 'days' to roll <<days>> calendar days before expiry, or
+                   'volume' for the crossovers set with <setVolumeRolls> of
+                   the <<futures_chains>> under the <chainKey> of
+                   <<symbol>>, <<exchange>> and <<currency>>
+            days - integer number of calendar days before expiry
+            offset - integer number of contracts after the front contract,
+                     e.g. 1 for the next contract
+            time_out - float number of seconds to wait for the chain
+
+        RETURNS:
+            contract - Contract() object; None if the chain has no contract
+                       that far out
+        """
+        self.getFuturesChain(symbol, exchange, currency = currency,
+                             time_out = time_out)
+        key = fc.chainKey(symbol, exchange, currency)
+        if key not in self.futures_chains:
+            return None
+        return self.futures_chains.frontContract(key, as_of = as_of,
+                                                 rule = rule, days = days,
+                                                 offset = offset)
+
+    @timed
+    def getContinuousFutures(self, symbol, exchange, date_start,
+                             date_end = None, currency = 'USD',
+                             rule = fc.ROLL_DAYS, days = 0,
+                             adjustment = cf.RATIO, type_data = 'TRADES',
+                             bar_size = '1 day', in_trading_hours = False,
+                             overlap_days = 7, time_out = 60):
+        """
+        SUMMARY:
+            Returns the back-adjusted continuous series of root <<symbol>>
+            from <<date_start>> to <<date_end>>, stitched from the bars of
+            the contracts of its <getFuturesChain> along the roll <<rule>>.
+
+        PARAMETERS:
+            symbol - string root symbol, e.g. 'ES'
+            exchange - string exchange, e.g. 'GLOBEX'
+            date_start - datetime.datetime object
+            date_end - datetime.datetime object; defaults to now
+            currency - string currency
+            rule - see <getFrontContract>
+            days - see <getFrontContract>
+            adjustment - 'ratio' or 'difference', see <ContinuousFutures>
+            type_data - string IB whatToShow, see <getDataAtTime>
+            bar_size - string IB bar size
+            in_trading_hours - True for regular trading hours only
+            overlap_days - integer number of days each contract is requested
+                           before the roll into it, to measure the gap
+            time_out - see <getDataInRange>
+
+        RETURNS:
+            series - <ContinuousFutures> holding the bars in its <<data>>;
+                     new bars are added with its <append>. None if the
+                     chain of <<symbol>> could not be loaded
+
+        RESULTS:
+            None
+        """
+        if date_end is None:
+            date_end = dt.datetime.now()
+
+        self.getFuturesChain(symbol, exchange, currency = currency,
+                             time_out = time_out)
+        key = fc.chainKey(symbol, exchange, currency)
+        if key not in self.futures_chains:
+            return None
+        schedule = self.futures_chains.rollSchedule(key, rule = rule,
+                                                    days = days)
+
+        # each contract is held from the previous roll to its own roll
+        roll_dates = pd.to_datetime(schedule['Roll_Date']).values
+        held_from = np.append(np.datetime64('NaT'), roll_dates[:-1])
+        held = (roll_dates > np.datetime64(date_start)) & \
+               ~(held_from > np.datetime64(date_end))
+
+        bars = {}
+        for position in np.flatnonzero(held):
+            row = schedule.iloc[position]
+            span_start = date_start
+            if position > 0:
+                span_start = max(date_start,
+                                 pd.Timestamp(held_from[position])
+                                 .to_pydatetime() -
+                                 dt.timedelta(days = overlap_days))
+            span_end = min(date_end, pd.Timestamp(roll_dates[position])
+                                     .to_pydatetime())
+            # the contracts held before today have mostly expired
+            contract = copy.copy(row['Contract_Object'])
+            contract.m_includeExpired = True
+            bars[row['Local_Symbol']] = self.getDataInRange(
+                                        span_start, date_end = span_end,
+                                        type_data = type_data,
+                                        contract = contract,
+                                        in_trading_hours = in_trading_hours,
+                                        bar_size = bar_size,
+                                        time_out = time_out)
+
+        series = cf.ContinuousFutures(schedule, adjustment = adjustment)
+        series.build(bars)
+        return series
+
+    @timed
+    def resolveContracts(self, contracts = [], time_out = 5):
+        """
+        SUMMARY:
+            Returns the fully qualified contract of each of <<contracts>>.
+            Contracts in the <<contract_cache>> are served from it; the
+            others are requested with <reqContractDetails> all at once and
+            added to the cache.
+
+        PARAMETERS:
+            contracts - list of Contract() objects, partly specified
+            time_out - float number of seconds to wait for the contract
+                       details of the unknown contracts
+
+        RETURNS:
+            resolved - list of Contract() objects in the order given; None
+                       where IB described no contract or several contracts
+
+        RESULTS:
+            Persists the cache if any contract was requested.
+        """
+        resolved = [self.contract_cache.find(contract)
+                    for contract in contracts]
+
+        requests = {}
+        for index, contract in enumerate(contracts):
+            if resolved[index] is not None:
+                continue
+            request_id = self._nextRequestId()
+            self.callback.callback_Buffers.open('contract_Details', request_id)
+            requests[index] = (request_id,
+                               self.callback.request_Registry.register(
+                                                                request_id))
+            self._dataTws(request_id).reqContractDetails(request_id, contract)
+
+        if not requests:
+            return resolved
+
+        time_end = time.time() + time_out
+        for index, (request_id, request) in requests.items():
+            contract = contracts[index]
+            self._waitForRequest(request,
+                                 time_out = max(time_end - time.time(), 0),
+                                 description = 'reqContractDetails ' + \
+                                               str(contract.m_symbol))
+            details = self.callback.callback_Buffers.close('contract_Details',
+                                                           request_id)
+            if len(details) != 1:
+                print("Could not resolve contract: ", contract.m_symbol,
+                      "\nContracts described: ", len(details))
+                continue
+            self.contract_cache.add(details[0].m_summary, alias = contract)
+            resolved[index] = self.contract_cache.find(contract)
+
+        self.contract_cache.save()
+        return resolved
+
+    @timed
+    def getLiveMarketData(self, contract = Contract(), time_out = 5):
+        """
+        SUMMARY:
+            Method summary
+
+        PARAMETERS:
+            None
+
+        RETURNS:
+            None
+
+        RESULTS:
+            None
+        """
+        """
+        genericTickList options:
+        100 Option Volume (currently for stocks)
+        101 Option Open Interest (currently for stocks)
+        104 Historical Volatility (currently for stocks)
+        106 Option Implied Volatility (currently for stocks)
+        162 Index Future Premium
+        165 Miscellaneous Stats
+        221 Mark Price (used in TWS P&L computations)
+        225 Auction values (volume, price and imbalance)
+        233 RTVolume - contains the last trade price, last trade size, last trade time, total volume, VWAP, and single trade flag.
+        236 Shortable
+        256 Inventory
+        258 Fundamental Ratios
+        411 Realtime Historical Volatility
+        456 IBDividends
+        """
+
+        """
+        self.tickers = contract
+
+        ticker_id = self.searchTickers(search_object = contract,
+                                        type_search = 'CONTRACT',
+                                        type_data = 'ID')[0]
+        """
+        """
+         self.tickers = contract
+        
+        ticker_id = self.searchTickers(search_object = contract,
+                                type_search = 'CONTRACT',
+                                type_data = 'ID')[0]
+        """
+#        ticker_id = self.nextOrderId(from_datetime=True)
+
+        # a snapshot ends on <tickSnapshotEnd>
+        quote = self._submitQuote(contract)
+        if not quote.wait(time_out):
+            self._expireQuote(quote)
+
+        data = self._snapshotFrame(quote.result, contract)
+        if data.empty:
+            self.removeFromTickers(search_object = contract,
+                                    type_object = 'CONTRACT')
+            # CHANGED FUNDAMENTAL ASSUMPTION; ALWAYS RETURNING A DATAFRAME FOR EASIER ERROR HANDLING 10/07/17
+        return data
+
+    @timed
+    def getLiveMarketDataBatch(self, contracts = [], time_out = 5):
+        """
+        SUMMARY:
+            Requests snapshot quotes for every contract in <<contracts>>, as
+            many at once as the <<snapshot_lines>> allow, and collects the
+            ticks of each request until its <tickSnapshotEnd> arrives or
+            <<time_out>> seconds pass.
+
+        PARAMETERS:
+            contracts - list of Contract() objects
+            time_out - float number of seconds to wait for all snapshots
+
+        RETURNS:
+            data - pandas DataFrame indexed by Ticker_ID with one row per
+                   contract, in the order given, and columns Symbol,
+                   Contract_Object, Bid_Price, Ask_Price, Last_Price and
+                   Close_Price; prices not received are NaN
+
+        RESULTS:
+            None
+        """
+        price_fields = {1: 'Bid_Price', 2: 'Ask_Price', 4: 'Last_Price',
+                        9: 'Close_Price'}
+
+        quotes = [self._submitQuote(contract) for contract in contracts]
+
+        end_wait = time.time() + time_out
+        for quote in quotes:
+            quote.wait(max(end_wait - time.time(), 0))
+
+        missing = [contract.m_symbol for (contract, quote)
+                   in zip(contracts, quotes) if not quote.done()]
+        for quote in quotes:
+            if not quote.done():
+                self._expireQuote(quote)
+
+        # identical contracts share one quote, so ticks are placed by row
+        ticks = pd.DataFrame([(row, field, price)
+                              for row, quote in enumerate(quotes)
+                              for (ticker_id, field, price, can_execute)
+                              in (quote.result or [])],
+                             columns = ['Row', 'field', 'price'])
+        ticks = ticks[ticks['field'].isin(list(price_fields.keys())) &
+                      (ticks['price'] != -1)]
+        ticks = ticks.drop_duplicates(subset = ['Row', 'field'],
+                                      keep = 'last')
+        prices = np.full((len(quotes), len(price_fields)), np.nan)
+        columns = sorted(price_fields)
+        prices[ticks['Row'].values.astype(int),
+               np.searchsorted(columns, ticks['field'].values)] = \
+            ticks['price'].values
+
+        ticker_ids = [quote.key for quote in quotes]
+        data = pd.DataFrame({'Symbol': [contract.m_symbol
+                                        for contract in contracts],
+                             'Contract_Object': contracts},
+                            index = ticker_ids,
+                            columns = ['Symbol', 'Contract_Object'])
+        for column, field in enumerate(columns):
+            data[price_fields[field]] = prices[:, column]
+        data.index.name = 'Ticker_ID'
+
+        if missing:
+            print("Snapshot timed out for: ", missing)
+        return data
+
+    def subscribeMarketData(self, contract = Contract(),
+                            generic_ticks = ''):
+        """
+        SUMMARY:
+            Opens a streaming market data subscription of <<contract>>. Its
+            ticks are held in a ring buffer read by <getLatestQuote>.
+
+        PARAMETERS:
+            contract - Contract() object
+            generic_ticks - string IB genericTickList, see <getLiveMarketData>
+
+        RETURNS:
+            ticker_id - integer tickerId of the subscription; None if all
+                        market data lines are in use
+
+        RESULTS:
+            Sends reqMktData unless <<contract>> is already subscribed.
+        """
+        ticker_id = self.market_subscriptions.tickerId(contract)
+        if ticker_id is not None:
+            return ticker_id
+
+        ticker_id = self._nextRequestId()
+        if not self.market_subscriptions.subscribe(contract, ticker_id):
+            print("Market data lines exhausted.\nCould not subscribe: ",
+                    contract.m_symbol)
+            return None
+        self._dataTws(ticker_id).reqMktData(
+                            tickerId = ticker_id, contract = contract,
+                            genericTickList = generic_ticks, snapshot = False)
+        return ticker_id
+
+    def unsubscribeMarketData(self, contract = Contract()):
+        """
+        SUMMARY:
+            Cancels the streaming market data subscription of <<contract>>.
+
+        PARAMETERS:
+            contract - Contract() object
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Sends cancelMktData and frees the market data line.
+        """
+        ticker_id = self.market_subscriptions.unsubscribe(contract)
+        if ticker_id is None:
+            return
+        self._dataTws(ticker_id).cancelMktData(ticker_id)
+
+    def getLatestQuote(self, contract = Contract(), max_staleness = None):
+        """
+        SUMMARY:
+            Returns the latest quote of a subscribed <<contract>> from memory.
+
+        PARAMETERS:
+            contract - Contract() object
+            max_staleness - float number of seconds; quotes whose latest bid
+                            or ask is older are not returned. None accepts
+                            any age
+
+        RETURNS:
+            quote - pandas Series of Bid_Price, Ask_Price, Last_Price,
+                    Close_Price, Bid_Size, Ask_Size and the epoch Time of the
+                    latest bid or ask; None if <<contract>> is not subscribed
+                    or the quote is stale
+
+        RESULTS:
+            None
+        """
+        ticker_id = self.market_subscriptions.tickerId(contract)
+        if ticker_id is None:
+            return None
+        quote = self.market_subscriptions.quote(ticker_id)
+        if quote is None:
+            return None
+        if max_staleness is not None and \
+                not time.time() - quote['Time'] <= max_staleness:
+            return None
+        return pd.Series(quote, index = ['Bid_Price', 'Ask_Price',
+                                         'Last_Price', 'Close_Price',
+                                         'Bid_Size', 'Ask_Size', 'Time'])
+
+    def startTickCapture(self, capacity = 65536):
+        """
+        SUMMARY:
+            Captures the tickPrice, tickSize and historicalData callbacks no
+            request or subscription claims into NumPy structured arrays
+            instead of the <IBWrapper> lists.
+
+        PARAMETERS:
+            capacity - integer number of rows allocated initially per
+                       callback; the arrays grow as needed
+
+        RETURNS:
+            capture - the <TickCapture> in use
+
+        RESULTS:
+            Keeps an existing capture and its rows.
+        """
+        if self.callback.tick_Capture is None:
+            self.callback.tick_Capture = cap.TickCapture(capacity = capacity)
+        return self.callback.tick_Capture
+
+    def stopTickCapture(self):
+        """
+        SUMMARY:
+            Stops the capture started by <startTickCapture>; callbacks are
+            appended to the <IBWrapper> lists again.
+
+        PARAMETERS:
+            None
+
+        RETURNS:
+            capture - the <TickCapture> with the captured rows; None if no
+                      capture was running
+
+        RESULTS:
+            None
+        """
+        capture = self.callback.tick_Capture
+        self.callback.tick_Capture = None
+        return capture
+
+    def getCapturedData(self, attribute = 'tick_Price', key = None):
+        """
+        SUMMARY:
+            Returns the rows captured since <startTickCapture>.
+
+        PARAMETERS:
+            attribute - 'tick_Price', 'tick_Size' or 'historical_Data'
+            key - tickerId/reqId to select; None selects all rows
 
         RETURNS:
-            None
+            data - pandas DataFrame with a receive time column; empty if no
+                   capture is running
 
         RESULTS:
             None
         """
-        self._resetCallbackAttribute('contract_Details')        
-        self.tws.reqContractDetails(1,contract)
-        
-        time.sleep(1)
-        
-#        print( self.callback.contract_Details. ) 
-        
-#        print(self.callback.contract_Details.m_contractMonth)
-        
-        contract_details = self.callback.contract_Details
-        
-        
-        fut_cont_dict = {}
+        if self.callback.tick_Capture is None:
+            print("Tick capture is not running.")
+            return pd.DataFrame()
+        return self.callback.tick_Capture.frame(attribute, key = key)
 
-        for detail in contract_details:
-            fut_cont_dict[detail.m_summary.m_localSymbol] = ( detail.m_marketName,
-                                                          detail.m_contractMonth,
-                                                          detail.m_summary.m_expiry,
-                                                          detail.m_summary.m_symbol,
-                                                          detail.m_summary )
-        fut_cont_dict = pd.DataFrame.from_dict(fut_cont_dict, orient='index' )
-        fut_cont_dict.columns = ['market_symbol', 'contractMonth', 'Expiry', 'IB_symbol', 'Contract object']
-        fut_cont_dict.sort_values('Expiry', inplace=True, ascending=True)
-        
-        def convertExpiry(x):                    
-            if( type(x) == str ):
-                return (dt.datetime.strptime(x, "%Y%m%d" )).date() # should be string
-            else:
-                pass
+    def subscribeMarketDepth(self, contract = Contract(), depth = 10):
+        """
+        SUMMARY:
+            Opens a market depth subscription of <<contract>>. Its events are
+            applied to an <OrderBook> returned by <getOrderBook>.
 
-        fut_cont_dict['Expiry'] = fut_cont_dict['Expiry'].apply( convertExpiry )
+        PARAMETERS:
+            contract - Contract() object
+            depth - integer number of levels requested per side
 
-        return fut_cont_dict
+        RETURNS:
+            ticker_id - integer tickerId of the subscription
 
-    def getLiveMarketData(self, contract = Contract(), time_out = 5):
+        RESULTS:
+            Sends reqMktDepth unless <<contract>> is already subscribed.
+        """
+        ticker_id = self.market_depth.tickerId(contract)
+        if ticker_id is not None:
+            return ticker_id
+
+        ticker_id = self._nextRequestId()
+        self.market_depth.subscribe(contract, ticker_id, max_depth = depth)
+        self._dataTws(ticker_id).reqMktDepth(
+                             tickerId = ticker_id, contract = contract,
+                             numRows = depth)
+        return ticker_id
+
+    def unsubscribeMarketDepth(self, contract = Contract()):
         """
         SUMMARY:
-            Method summary
+            Cancels the market depth subscription of <<contract>>.
 
         PARAMETERS:
-            None
+            contract - Contract() object
 
         RETURNS:
             None
 
         RESULTS:
-            None
-        """
-        """
-        genericTickList options:
-        100 Option Volume (currently for stocks)
-        101 Option Open Interest (currently for stocks)
-        104 Historical Volatility (currently for stocks)
-        106 Option Implied Volatility (currently for stocks)
-        162 Index Future Premium
-        165 Miscellaneous Stats
-        221 Mark Price (used in TWS P&L computations)
-        225 Auction values (volume, price and imbalance)
-        233 RTVolume - contains the last trade price, last trade size, last trade time, total volume, VWAP, and single trade flag.
-        236 Shortable
-        256 Inventory
-        258 Fundamental Ratios
-        411 Realtime Historical Volatility
-        456 IBDividends
+            Sends cancelMktDepth and drops the order book.
         """
-        tick_type = {0 : "BID SIZE",
-                        1 : "BID PRICE",
-                        2 : "ASK PRICE",
-                        3 : "ASK SIZE",
-                        4 : "LAST PRICE",
-                        5 : "LAST SIZE",
-                        6 : "HIGH",
-                        7 : "LOW",
-                        8 : "VOLUME",
-                        9 : "CLOSE PRICE",
-                        10 : "BID OPTION COMPUTATION",
-                        11 : "ASK OPTION COMPUTATION",
-                        12 : "LAST OPTION COMPUTATION",
-                        13 : "MODEL OPTION COMPUTATION",
-                        14 : "OPEN_TICK",
-                        15 : "LOW 13 WEEK",
-                        16 : "HIGH 13 WEEK",
-                        17 : "LOW 26 WEEK",
-                        18 : "HIGH 26 WEEK",
-                        19 : "LOW 52 WEEK",
-                        20 : "HIGH 52 WEEK",
-                        21 : "AVG VOLUME",
-                        22 : "OPEN INTEREST",
-                        23 : "OPTION HISTORICAL VOL",
-                        24 : "OPTION IMPLIED VOL",
-                        27 : "OPTION CALL OPEN INTEREST",
-                        28 : "OPTION PUT OPEN INTEREST",
-                        29 : "OPTION CALL VOLUME"}
+        ticker_id = self.market_depth.unsubscribe(contract)
+        if ticker_id is None:
+            return
+        self._dataTws(ticker_id).cancelMktDepth(ticker_id)
 
+    def getOrderBook(self, contract = Contract()):
         """
-        self.tickers = contract
+        SUMMARY:
+            Returns the live order book of a depth subscribed <<contract>>.
 
-        ticker_id = self.searchTickers(search_object = contract,
-                                        type_search = 'CONTRACT',
-                                        type_data = 'ID')[0]
-        """
-        """
-         self.tickers = contract
-        
-        ticker_id = self.searchTickers(search_object = contract,
-                                type_search = 'CONTRACT',
-                                type_data = 'ID')[0]
-        """
-#        ticker_id = self.nextOrderId(from_datetime=True)
+        PARAMETERS:
+            contract - Contract() object
 
-        self._resetCallbackAttribute('tick_Price')
-        data = pd.DataFrame(self.callback.tick_Price,
-                            columns = ['tickerId', 'field', 'price',
-                                        'canAutoExecute'])
-        data_null = data
+        RETURNS:
+            book - <OrderBook> exposing topOfBook, depthWeightedMid and
+                   cumulativeSize; None if <<contract>> is not subscribed
 
-        now = dt.datetime.now()
-        end_wait = now + dt.timedelta(seconds = time_out)
+        RESULTS:
+            None
+        """
+        ticker_id = self.market_depth.tickerId(contract)
+        if ticker_id is None:
+            print("No market depth subscription for: ", contract.m_symbol)
+            return None
+        return self.market_depth.book(ticker_id)
 
-        while data.equals(data_null) and now <= end_wait:
+    def subscribeBars(self, contract = Contract(), source = 'REALTIME_BARS',
+                      type_data = 'TRADES', in_trading_hours = False):
+        """
+        SUMMARY:
+            Starts building 1 min, 5 mins, 15 mins and 1 hour bars of
+            <<contract>> in the <<bar_aggregator>>.
 
-            self.tws.reqMktData(tickerId = self.nextOrderId(), contract = contract,
-                                genericTickList = '', snapshot = True)
+        PARAMETERS:
+            contract - Contract() object
+            source - 'REALTIME_BARS' to build from 5 second realtime bars,
+                     'RTVOLUME' to build from the trade prints of a streaming
+                     market data subscription (generic tick 233)
+            type_data - string IB whatToShow of the realtime bars
+            in_trading_hours - True for regular trading hours only
 
-            time.sleep(1)
+        RETURNS:
+            ticker_id - integer tickerId feeding the bars; None if the
+                        request could not be made
 
-            data = pd.DataFrame(self.callback.tick_Price,
-                                columns = ['tickerId', 'field', 'price',
-                                            'canAutoExecute'])
+        RESULTS:
+            Sends reqRealTimeBars or opens a market data subscription.
+        """
+        if source not in ('REALTIME_BARS', 'RTVOLUME'):
+            print("Source must be 'REALTIME_BARS' or 'RTVOLUME'.")
+            return None
 
-            now = dt.datetime.now()
+        ticker_id = self.bar_aggregator.tickerId(contract)
+        if ticker_id is not None:
+            return ticker_id
+
+        if source == 'RTVOLUME':
+            ticker_id = self.subscribeMarketData(contract = contract,
+                                                 generic_ticks = '233')
+            if ticker_id is None:
+                return None
+            self.bar_aggregator.subscribe(contract, ticker_id)
+            return ticker_id
+
+        ticker_id = self._nextRequestId()
+        self.bar_aggregator.subscribe(contract, ticker_id)
+        self._dataTws(ticker_id).reqRealTimeBars(
+                                 tickerId = ticker_id, contract = contract,
+                                 barSize = 5, whatToShow = type_data,
+                                 useRTH = self._isInTradingHours(
+                                                in_trading_hours))
+        return ticker_id
 
-        if data.equals(data_null):
-            print("Error retrieving data for: ", contract.m_symbol, ':',
-                    contract, "\nEmpty callback.\nWait time out.")
+    def unsubscribeBars(self, contract = Contract()):
+        """
+        SUMMARY:
+            Stops building bars of <<contract>>.
 
-            self.removeFromTickers(search_object = contract,
-                                    type_object = 'CONTRACT')
-            return pd.DataFrame()
-            # CHANGED FUNDAMENTAL ASSUMPTION; ALWAYS RETURNING A DATAFRAME FOR EASIER ERROR HANDLING 10/07/17
+        PARAMETERS:
+            contract - Contract() object
 
-        data["Type"] = data["field"].map(tick_type)
+        RETURNS:
+            None
 
-        return data
+        RESULTS:
+            Sends cancelRealTimeBars for realtime bar subscriptions. Market
+            data subscriptions feeding RTVolume bars are left open; close them
+            with <unsubscribeMarketData>.
+        """
+        ticker_id = self.bar_aggregator.unsubscribe(contract)
+        if ticker_id is None:
+            return
+        if self.market_subscriptions.tickerId(contract) != ticker_id:
+            self._dataTws(ticker_id).cancelRealTimeBars(ticker_id)
 
-    def getPositions(self):
+    def getBars(self, contract = Contract(), bar_size = '1 min'):
         """
         SUMMARY:
-            Method summary
+            Returns the closed bars of <<contract>> built since
+            <subscribeBars>.
 
         PARAMETERS:
-            None
+            contract - Contract() object
+            bar_size - '1 min', '5 mins', '15 mins' or '1 hour'
 
         RETURNS:
-            None
+            data - pandas DataFrame of open, high, low, close, volume and
+                   VWAP indexed by bar start time; empty if <<contract>> is
+                   not subscribed
 
         RESULTS:
             None
         """
-        self._resetCallbackAttribute('update_Position')
+        ticker_id = self.bar_aggregator.tickerId(contract)
+        if ticker_id is None:
+            print("No bar subscription for: ", contract.m_symbol)
+            return pd.DataFrame()
+        return self.bar_aggregator.bars(ticker_id, bar_size)
 
-        self.tws.reqPositions()
+    @timed
+    def getPositions(self, time_out = 5):
+        """
+        SUMMARY:
+            Returns the account positions once <positionEnd> is received.
 
-        time.sleep(1)
+        PARAMETERS:
+            time_out - float number of seconds to wait for <positionEnd>
 
-        data = pd.DataFrame(self.callback.update_Position,
-                            columns = ['Account_Name', 'Contract_Id','Contract_Object',
-                                        'Currency', 'Exchange', 'Expiry',
-                                        'Include_Expired', 'Local_Symbol',
-                                        'Multiplier', 'Right',
-                                        'Financial_Instrument', 'Strike_Price',
-                                        'Symbol', 'Trading_Class',
-                                        'Number_of_Units',
-                                        'Average_Unit_Price'])
-        data.set_index(keys = ['Contract_Id'], inplace = True)
-        return data
+        RETURNS:
+            data - pandas DataFrame indexed by Contract_Id
+
+        RESULTS:
+            None
+        """
+        request = self._requestPositions()
+        self._waitForRequest(request, time_out = time_out,
+                             description = 'reqPositions')
+        return self._collectPositions()
 
     # TODO: CHECK IF IT IS POSSIBLE TO ACQUIRE PAST PORTFOLIO VALUES
-    def getPortfolio(self):
+    @timed
+    def getPortfolio(self, time_out = 5, max_staleness = None):
         """
         SUMMARY:
-            Method summary
+            Returns the account portfolio once <accountDownloadEnd> is received.
+            Served from the <<account_state>> while <startAccountUpdates> is
+            streaming or when it was downloaded within <<max_staleness>>
+            seconds.
 
         PARAMETERS:
-            None
+            time_out - float number of seconds to wait for <accountDownloadEnd>
+            max_staleness - float number of seconds since the cached
+                            portfolio was downloaded; None only serves it
+                            while streaming
 
         RETURNS:
-            None
+            portfolio - pandas DataFrame
 
         RESULTS:
             None
         """
-        self._resetCallbackAttribute('update_Portfolio')
-
-        self.tws.reqAccountUpdates(True, self.account_name)
-
-        time.sleep(1)
-        """
-        VALUE WAIT ALTERNATIVE TO TIME WAIT:
-        def acctUp():
-        ib._resetCallbackAttribute('update_Portfolio')
-        ib.tws.reqAccountUpdates(True, 'DU550479')
-        updated = ib.callback.accountDownloadEnd_flag
-        while not updated:
-                updated = ib.callback.accountDownloadEnd_flag
-        print pd.DataFrame(ib.callback.update_Portfolio)
-        ib.tws.reqAccountUpdates(False, 'DU550479')
-        """
-
-        self.tws.reqAccountUpdates(False, self.account_name)
+        portfolio = self._cachedPortfolio(max_staleness = max_staleness)
+        if portfolio is not None:
+            return portfolio
 
-        portfolio = pd.DataFrame(self.callback.update_Portfolio,
-                                    columns = ['Contract_ID', 'Currency',
-                                                'Expiry', 'Include_Expired',
-                                                'Local_Symbol', 'Multiplier',
-                                                'Primary_Exchange', 'Right',
-                                                'Security_Type', 'Strike',
-                                                'Symbol', 'Trading_Class',
-                                                'Position', 'Market_Price',
-                                                'Market_Value', 'Average_Cost',
-                                                'Unrealized_PnL',
-                                                'Realized_PnL', 'Account_Name'])
-        return portfolio
+        request = self._requestPortfolio()
+        self._waitForRequest(request, time_out = time_out,
+                             description = 'reqAccountUpdates')
+        return self._collectPortfolio()
 
-    def getExecutedOrders(self, contract = Contract(), since = None):
+    @timed
+    def getExecutedOrders(self, contract = Contract(), since = None,
+                          time_out = 5):
         """
         SUMMARY:
             Method summary
@@ -2426,10 +4226,13 @@ class IBDataBroker(IBBroker, DataBroker):
             execution_filter = self.createExecutionFilter(contract = contract,
                                                             order_time = since)
 
-        self.tws.reqExecutions(1, execution_filter)
+        request_id = self._nextRequestId()
+        request = self.callback.request_Registry.register(request_id)
+        self.tws.reqExecutions(request_id, execution_filter)
+
+        self._waitForRequest(request, time_out = time_out,
+                             description = 'reqExecutions')
 
-        time.sleep(2)
-        
         ''' this will complain if MOC is used '''
         ''' It's trying to look fo rexecutions before it has happened '''
         ''' We should store this internally eventually '''
@@ -2554,56 +4357,74 @@ class IBDataBroker(IBBroker, DataBroker):
 
         PNL_day.to_csv(path_or_buf = path, encoding = 'utf-8', mode = 'a+')
 
-    def recordTransaction(self, contract, path = '', additional_values = {}):
+    @timed
+    def recordTransaction(self, contract, path = '', additional_values = {},
+                          order_id = None):
         """
         SUMMARY:
-            Method summary
+            Requests the executions of <<contract>> so the ones missing from
+            the execution journal of <<path>> are written to it. Executions
+            already journaled are merged on compaction. Does not wait for
+            the executions.
 
         PARAMETERS:
-            None
+            contract - Contract() object
+            path - string path of the execution log; '' for <<exec_path>>
+            additional_values - dictionary of column: value recorded with
+                                the executions of <<order_id>>
+            order_id - integer order id <<additional_values>> belong to
 
         RETURNS:
-            None
+            request - <RequestFuture> resolved by <execDetailsEnd>; None if
+                      no journal path is given
 
         RESULTS:
             None
         """
-        order_details = self.getExecutedOrders(contract)
-
-        if additional_values:
-            additional_details = pd.DataFrame.from_dict([additional_values])
-            transaction_details = pd.concat([order_details,additional_details],
-                                            axis = 1)
-            transaction_details.to_csv(path_or_buf = path, encoding = 'utf-8',
-                                       mode = 'a+', header = None,
-                                       index_label=['Server_Time'])
+        journal = self._executionJournal(path)
+        if journal is None:
+            print("No execution journal path given.\nNo transaction recorded.")
+            return None
+        if additional_values and order_id is not None:
+            journal.annotate(order_id, additional_values)
 
-        order_details.to_csv(path_or_buf = path, encoding = 'utf-8',
-                             mode = 'a+', header = None,
-                             index_label = ['Server_Time'])
+        request_id = self._nextRequestId()
+        request = self.callback.request_Registry.register(request_id)
+        self.tws.reqExecutions(request_id,
+                               self.createExecutionFilter(contract = contract))
+        return request
 
-    def getTransactions(self, path = ''):
+    @timed
+    def getTransactions(self, path = '', order_id = None, symbol = None,
+                        since = None):
         """
         SUMMARY:
-            Returns the executed transactions by a [system] read from a file
-            at the location of <<path>>.
+            Returns the executed transactions read from the execution
+            journal at the location of <<path>>.
 
         PARAMETERS:
-            path -
+            path - string path of the execution log; '' for <<exec_path>>
+            order_id - integer order id to select; None selects all orders
+            symbol - string symbol to select; None selects all symbols
+            since - datetime.datetime object; only executions received after
+                    are returned
 
         RETURNS:
-            data -
+            data - pandas DataFrame of <ExecutionJournal.read>; empty if no
+                   journal path is given
 
         RESULTS:
-            Gets the executed transactions of the current day.
-        """
+            Writes the executions still queued before reading.
         """
-        TODO: just a read or prepare in some fashion? from strategy POV how
-        should the strategy deal with reading from state?
-        """
-        raise NotImplementedError("API method <getTransactions >"\
-                                  "has not been implemented.")
-        #return None
+        journal = self._executionJournal(path)
+        if journal is None:
+            print("No execution journal path given.")
+            return pd.DataFrame()
+        if since is not None:
+            since = time.mktime(since.timetuple())
+        journal.flush()
+        return journal.read(order_id = order_id, symbol = symbol,
+                            since = since)
 
 
 class ExecutionBroker(Broker):
@@ -2813,14 +4634,19 @@ class IBBrokerTotal(IBExecutionBroker, IBDataBroker):
         None
 
     CLASS PRIVATE METHODS:
+        _unitPrices -
+        _basketQuotes -
         _totalDollarToTotalUnits -
+        _closePositions -
 
     CLASS PUBLIC METHODS:
+        submitOrders -
         closeAllPositions -
         closeAllTypePositions -
         closeAllNamePositions -
         closePosition -
         createDollarOder -
+        createDollarOrders -
         palceRecordedOrder -
         getLiveMidPriceData -
     """
@@ -2870,12 +4696,77 @@ class IBBrokerTotal(IBExecutionBroker, IBDataBroker):
     """
     CLASS PRIVATE METHODS
     """
+    def _unitPrices(self, quotes):
+        """
+        SUMMARY:
+            Returns the price per unit of each row of <<quotes>>: the mid
+            price if both sides are quoted, otherwise the close, otherwise
+            the last price.
+
+        PARAMETERS:
+            quotes - pandas DataFrame with columns Bid_Price, Ask_Price,
+                     Last_Price and Close_Price
+
+        RETURNS:
+            prices - numpy array of floats; NaN where no price is known
+        """
+        bid = quotes['Bid_Price'].values.astype(float)
+        ask = quotes['Ask_Price'].values.astype(float)
+        close = quotes['Close_Price'].values.astype(float)
+        last = quotes['Last_Price'].values.astype(float)
+        with np.errstate(invalid = 'ignore'):
+            prices = np.where((bid > 0) & (ask >= bid), (bid + ask) * 0.5,
+                              np.nan)
+            prices = np.where(np.isnan(prices) & (close > 0), close, prices)
+            prices = np.where(np.isnan(prices) & (last > 0), last, prices)
+        return prices
+
+    def _basketQuotes(self, contracts, time_out = 5, max_staleness = 5):
+        """
+        SUMMARY:
+            Returns the quotes of <<contracts>>, read from memory for those
+            subscribed with <subscribeMarketData> and requested in one
+            <getLiveMarketDataBatch> for the others. A subscribed quote that
+            is stale or has no positive price is requested as well.
+
+        PARAMETERS:
+            contracts - list of Contract() objects
+            time_out - float number of seconds to wait for the snapshots
+            max_staleness - float number of seconds a subscribed quote may
+                            be old; None accepts any age
+
+        RETURNS:
+            quotes - pandas DataFrame with one row per contract, in the order
+                     given, and columns Bid_Price, Ask_Price, Last_Price and
+                     Close_Price; prices not received are NaN
+        """
+        columns = ['Bid_Price', 'Ask_Price', 'Last_Price', 'Close_Price']
+        quotes = pd.DataFrame(np.nan, index = np.arange(len(contracts)),
+                              columns = columns)
+        missing = []
+        for row, contract in enumerate(contracts):
+            quote = self.getLatestQuote(contract = contract,
+                                        max_staleness = max_staleness)
+            if quote is None or \
+                    not (quote[columns].values.astype(float) > 0).any():
+                missing.append(row)
+            else:
+                quotes.loc[row, columns] = quote[columns].values
+        if missing:
+            data = self.getLiveMarketDataBatch(
+                            contracts = [contracts[row] for row in missing],
+                            time_out = time_out)
+            quotes.loc[missing, columns] = data[columns].values
+        return quotes
 
     def _totalDollarToTotalUnits(self, amount_dollars, contract, at_time=False,
-                                 data_time=None):
+                                 data_time=None, max_staleness = 5):
         """
         SUMMARY:
-            Method summary
+            Returns the number of units of <<contract>> worth
+            <<amount_dollars>> at the mid price; the latest quote is used if
+            <<contract>> is subscribed with <subscribeMarketData> and was
+            priced within <<max_staleness>> seconds, a snapshot otherwise.
         
         PARAMETERS:
             None
@@ -2898,39 +4789,156 @@ class IBBrokerTotal(IBExecutionBroker, IBDataBroker):
 
             return int(amount_dollars / price_per_unit)
 
-        liveData = self.getLiveMarketData(contract=contract)
+        price_per_unit = self._unitPrices(
+                            self._basketQuotes(contracts = [contract],
+                                               max_staleness = max_staleness))[0]
+        if not price_per_unit > 0:
+            print("No price received for: ", contract.m_symbol)
+            return 0
 
-        liveData = liveData[liveData['price'] != -1]  # remove -1's
+        return int(amount_dollars / price_per_unit)
 
-        try:
-            askPrice = \
-            liveData['price'][liveData['Type'] == 'ASK PRICE'].values[
-                0]  # Try to get mid price .. if not use Close price
-            bidPrice = \
-            liveData['price'][liveData['Type'] == 'BID PRICE'].values[0]
+    def _closePositions(self, positions, order_type, exchanges = ['SMART'],
+                        record = False, time_out = 5):
+        """
+        SUMMARY:
+            Builds the orders closing every row of <<positions>> at once and
+            submits them with <submitOrders>.
 
-            price_per_unit = (askPrice + bidPrice) * 0.5  # mid point
+        PARAMETERS:
+            positions - pandas DataFrame of <getPositions>
+            order_type - see <createOrder>
+            exchanges - list of exchanges each closing order is sent to
+            record - True to record each order in <<exec_path>>
+            time_out - float number of seconds to wait for acknowledgements
 
-        except:
-            price_per_unit = \
-            liveData['price'][liveData['Type'] == 'CLOSE PRICE'].values[0]
+        RETURNS:
+            status - pandas DataFrame of <submitOrders>
 
-        return int(amount_dollars / price_per_unit)
+        RESULTS:
+            None
+        """
+        units = positions['Number_of_Units'].values.astype(float)
+        for symbol in positions['Symbol'].values[units == 0]:
+            print(str(symbol) + ": Position is already closed.")
+        positions = positions[units != 0]
+        units = units[units != 0]
+
+        actions = np.where(units < 0, 'BUY', 'SELL')
+        amounts = np.abs(units).astype(int)
+        prices = positions['Average_Unit_Price'].values.astype(float)
+
+        contracts = []
+        orders = []
+        for exchange in exchanges:
+            for contract, action, amount, price in zip(
+                    positions['Contract_Object'].values, actions, amounts,
+                    prices):
+                cached = self.contract_cache.find(contract)
+                contract = copy.copy(contract) if cached is None else cached
+                contract.m_exchange = exchange
+                contracts.append(contract)
+                orders.append(self.createOrder(trade_type = str(action),
+                                               amount_units = int(amount),
+                                               price_per_unit = float(price),
+                                               order_type = order_type))
+        return self.submitOrders(contracts = contracts, orders = orders,
+                                 record = record, time_out = time_out)
 
     """
     CLASS PUBLIC METHODS
     """
+    @timed
+    def submitOrders(self, contracts = [], orders = [], record = False,
+                     time_out = 5):
+        """
+        SUMMARY:
+            Places every order of <<orders>>, paced in the order lane of the
+            <<governor>>, and waits for their acknowledgement by
+            <orderStatus> or <openOrder>.
+
+        PARAMETERS:
+            contracts - list of Contract() objects
+            orders - list of Order() objects, one per contract
+            record - True to record each order in <<exec_path>>
+            time_out - float number of seconds to wait for all
+                       acknowledgements once the last order is placed
+
+        RETURNS:
+            status - pandas DataFrame indexed by Order_ID with the Symbol,
+                     Contract_Object, Order_Object, Action, Number_of_Units,
+                     Status and Message of each order. Status is the first
+                     order status reported, 'Error' if the order was
+                     rejected and 'Timed Out' if it was not acknowledged
+
+        RESULTS:
+            None
+        """
+        order_ids = []
+        requests = []
+        for contract, order in zip(contracts, orders):
+            order_id = self.nextOrderId()
+            requests.append(self.callback.request_Registry.register(
+                                (ORDER_ACK, order_id)))
+            order_ids.append(order_id)
+            if record:
+                self.placeRecordedOrder(order_id = order_id,
+                                        contract = contract, order = order,
+                                        path = self.exec_path)
+            else:
+                self.placeOrder(order_id = order_id, contract = contract,
+                                order = order)
+
+        end_wait = time.time() + time_out
+        for request in requests:
+            request.wait(max(end_wait - time.time(), 0))
+
+        statuses = []
+        messages = []
+        for request in requests:
+            if not request.done():
+                self.callback.request_Registry.release(request.key)
+                statuses.append('Timed Out')
+                messages.append('')
+            elif request.error is not None:
+                statuses.append('Error')
+                messages.append(str(request.error[0]) + ': ' +
+                                str(request.error[1]))
+            else:
+                statuses.append(request.result)
+                messages.append('')
+
+        status = pd.DataFrame({'Order_ID': order_ids,
+                               'Symbol': [contract.m_symbol
+                                          for contract in contracts],
+                               'Contract_Object': list(contracts),
+                               'Order_Object': list(orders),
+                               'Action': [order.m_action for order in orders],
+                               'Number_of_Units': [order.m_totalQuantity
+                                                   for order in orders],
+                               'Status': statuses,
+                               'Message': messages},
+                              columns = ['Order_ID', 'Symbol',
+                                         'Contract_Object', 'Order_Object',
+                                         'Action', 'Number_of_Units',
+                                         'Status', 'Message'])
+        status.set_index(keys = ['Order_ID'], inplace = True)
+        return status
+
+    @timed
     def closeAllPositions(self, order_type = '', exclude_symbol = [''],
-                            exclude_instrument = [''], record = False):
+                            exclude_instrument = [''], record = False,
+                            time_out = 5):
         """
         SUMMARY:
-            Method summary
+            Closes every position not excluded with one order each, submitted
+            at once through <submitOrders>.
         
         PARAMETERS:
-            None
+            time_out - float number of seconds to wait for acknowledgements
         
         RETURNS:
-            None
+            status - pandas DataFrame of <submitOrders>
         
         RESULTS:
             None
@@ -3009,63 +5017,25 @@ class IBBrokerTotal(IBExecutionBroker, IBDataBroker):
 
         positions = self.getPositions()
 
-        order_id = self.nextOrderId()
-        for position_record in positions.iterrows():
-            position_details = position_record[1]
-
-            ticker = position_details['Symbol']
-            if ticker in exclude_symbol:
-                continue
-
-            instrument_type = position_details['Financial_Instrument']
-            if instrument_type in exclude_instrument:
-                continue
-
-            contract = self.createContract(ticker = ticker,
-                                            instrument_type = instrument_type,
-                                            exchange = 'SMART',
-                                            currency = 'USD')
-            # Make new contract? or is there some way to access previous contracts?
-
-            direction = position_details['Number_of_Units']
-            amount_units = int(abs(direction))
-            price_per_unit = float(position_details['Average_Unit_Price'])
-
-            if direction < 0:
-                trade_type = 'BUY'
-            elif direction > 0:
-                trade_type = 'SELL'
-            elif direction == 0:
-                print(str(ticker) + ": Position is already closed.")
-                continue
-
-            order = self.createOrder(trade_type = trade_type,
-                                        amount_units = amount_units,
-                                        price_per_unit = price_per_unit,
-                                        order_type = order_type)
-
-            if record:
-                self.placeRecordedOrder(order_id=order_id, contract=contract,
-                                        order=order, path=self.exec_path)
-            else:
-                self.placeOrder(order_id = order_id, contract = contract,
-                                order = order)
-            time.sleep(1)
-
-#            order_id += 1
-            order_id = self.nextOrderId()
+        keep = ~positions['Symbol'].isin(exclude_symbol) & \
+               ~positions['Financial_Instrument'].isin(exclude_instrument)
+        return self._closePositions(positions[keep], order_type,
+                                    record = record, time_out = time_out)
 
     def closeAllTypePositions(self, order_type = '', instruments = [''],
-                                exclude_symbol = [''], record = False, exchange=['SMART']):
+                                exclude_symbol = [''], record = False, exchange=['SMART'],
+                                time_out = 5):
         """
         SUMMARY:
-            Method summary
+            Closes every position of the <<instruments>> types with one order
+            per exchange of <<exchange>>, submitted at once through
+            <submitOrders>.
         
         PARAMETERS:
-            None
+            time_out - float number of seconds to wait for acknowledgements
         
         RETURNS:
-            None
+            status - pandas DataFrame of <submitOrders>
         
         RESULTS:
             None
@@ -3086,85 +5056,24 @@ class IBBrokerTotal(IBExecutionBroker, IBDataBroker):
 
         positions = self.getPositions()
 
-        order_id = self.nextOrderId()
-        for position_record in positions.iterrows():
-            position_details = position_record[1]
-
-            ticker = position_details['Symbol']
-            if ticker in exclude_symbol:
-                continue
-
-            instrument_type = position_details['Financial_Instrument']
-            if instrument_type not in instruments:
-                continue
-            
-            if ( instrument_type=='STK' ):
-                contract = self.createContract(ticker = ticker,
-                                                instrument_type = instrument_type,
-                                                exchange = 'SMART',
-                                                currency = 'USD')
-                
-            if ( instrument_type=='FUT' ):            
-#                print( position_details['Local_Symbol'] )
-#                
-##                localSymbol = position_details['Local_Symbol']#.values[0]
-#                expiry = position_details['Expiry']#.values[0]
-#                symbol = position_details['Symbol']#.values[0]
-#                mult = position_details['Multiplier']#.values[0]
-#                
-#                contract = self.createContract( ticker=symbol, #localSymbol=localSymbol,
-#                                                    instrument_type = instrument_type,
-#                                                    expiry=expiry,
-#                                                    multiplier = mult,
-#                                                    exchange = 'DTB',
-#                                                    currency = 'USD')                
-                contract = position_details['Contract_Object']
-                
-
-            
-            for ex in exchange:
-                contract.m_exchange = ex
-            
-                # Make new contract? or is there some way to access previous contracts?
-
-                direction = position_details['Number_of_Units']
-                amount_units = int(abs(direction))
-                price_per_unit = float(position_details['Average_Unit_Price'])
-    
-                if direction < 0:
-                    trade_type = 'BUY'
-                elif direction > 0:
-                    trade_type = 'SELL'
-                elif direction == 0:
-                    print(str(ticker) + ": Position is already closed.")
-                    continue
-    
-                order = self.createOrder(trade_type = trade_type,
-                                            amount_units = amount_units,
-                                            price_per_unit = price_per_unit,
-                                            order_type = order_type)
-    
-                if record:
-                    self.placeRecordedOrder(order_id=self.nextOrderId(), contract=contract,
-                                            order=order, path=self.exec_path)
-                else:
-                    self.placeOrder(order_id = self.nextOrderId(), contract = contract, order = order)
-                time.sleep(1)
-    
-    #            order_id += 1
-                order_id = self.nextOrderId()
+        keep = ~positions['Symbol'].isin(exclude_symbol) & \
+               positions['Financial_Instrument'].isin(instruments)
+        return self._closePositions(positions[keep], order_type,
+                                    exchanges = exchange, record = record,
+                                    time_out = time_out)
 
     def closeAllNamePositions(self, order_type = '', tickers = [''],
-                              record = False):
+                              record = False, time_out = 5):
         """
         SUMMARY:
-            Method summary
+            Closes the positions of <<tickers>> with one order each,
+            submitted at once through <submitOrders>.
         
         PARAMETERS:
-            None
+            time_out - float number of seconds to wait for acknowledgements
         
         RETURNS:
-            None
+            status - pandas DataFrame of <submitOrders>
         
         RESULTS:
             None
@@ -3185,49 +5094,11 @@ class IBBrokerTotal(IBExecutionBroker, IBDataBroker):
 
         positions = self.getPositions()
 
-        order_id = self.nextOrderId()
-        for position_record in positions.iterrows():
-            position_details = position_record[1]
-
-            ticker = position_details['Symbol']
-            if ticker not in tickers:
-                continue
-
-            instrument_type = position_details['Financial_Instrument']
-
-            contract = self.createContract(ticker = ticker,
-                                            instrument_type = instrument_type,
-                                            exchange = 'SMART',
-                                            currency = 'USD')
-            # Make new contract? or is there some way to access previous contracts?
-
-            direction = position_details['Number_of_Units']
-            amount_units = int(abs(direction))
-            price_per_unit = float(position_details['Average_Unit_Price'])
-
-            if direction < 0:
-                trade_type = 'BUY'
-            elif direction > 0:
-                trade_type = 'SELL'
-            elif direction == 0:
-                print(str(ticker) + ": Position is already closed.")
-                continue
-
-            order = self.createOrder(trade_type = trade_type,
-                                        amount_units = amount_units,
-                                        price_per_unit = price_per_unit,
-                                        order_type = order_type)
-
-            if record:
-                self.placeRecordedOrder(order_id=order_id, contract=contract,
-                                        order=order, path=self.exec_path)
-            else:
-                self.placeOrder(order_id = order_id, contract = contract, order = order)
-            time.sleep(1)
-
-#            order_id += 1
-            order_id = self.nextOrderId()
+        keep = positions['Symbol'].isin(tickers)
+        return self._closePositions(positions[keep], order_type,
+                                    record = record, time_out = time_out)
 
+    @timed
     def closePosition(self, symbol = '', order_type = '', record = False):
         """
         SUMMARY:
@@ -3266,13 +5137,10 @@ class IBBrokerTotal(IBExecutionBroker, IBDataBroker):
             return None
         if(position_details.empty):
             return None
-        ticker = position_details['Symbol'].iloc[0]
-        instrument_type = position_details['Financial_Instrument'].iloc[0]
-
-        contract = self.createContract(ticker = ticker,
-                                        instrument_type = instrument_type,
-                                        exchange = 'SMART',
-                                        currency = 'USD')
+        contract = position_details['Contract_Object'].iloc[0]
+        cached = self.contract_cache.find(contract)
+        contract = copy.copy(contract) if cached is None else cached
+        contract.m_exchange = 'SMART'
 
         direction = position_details['Number_of_Units'].iloc[0]
         amount_units = int(abs(direction))
@@ -3301,7 +5169,6 @@ class IBBrokerTotal(IBExecutionBroker, IBDataBroker):
 #            print( symbol, order_id )
         else:
             self.placeOrder(order_id = self.nextOrderId(), contract = contract, order = order)
-        time.sleep(1.1)
 
     def createDollarOrder(self, amount_dollars, contract, trade_type,
                             price_per_unit = 0.0, order_type = '',
@@ -3332,19 +5199,110 @@ class IBBrokerTotal(IBExecutionBroker, IBDataBroker):
                                     time_in_force=time_in_force)
         return order
 
+    @timed
+    def createDollarOrders(self, basket, order_type = 'MARKET',
+                           time_in_force = None, lot_size = 1,
+                           min_notional = 0.0, time_out = 5,
+                           max_staleness = 5):
+        """
+        SUMMARY:
+            Sizes a whole basket of dollar amounts into orders from a single
+            round of quotes, so entering many positions at once costs one
+            <getLiveMarketDataBatch> instead of a snapshot per contract.
+
+        PARAMETERS:
+            basket - pandas DataFrame with columns Contract_Object,
+                     Amount_Dollars and Trade_Type ('BUY' or 'SELL'), and
+                     optionally Lot_Size and Min_Notional overriding
+                     <<lot_size>> and <<min_notional>> per row
+            order_type - see <createOrder>
+            time_in_force - see <createOrder>
+            lot_size - integer number of units orders are rounded down to a
+                       multiple of
+            min_notional - float dollar value under which an order is dropped
+            time_out - float number of seconds to wait for the snapshots
+            max_staleness - float number of seconds a subscribed quote may
+                            be old before a snapshot is requested instead
+
+        RETURNS:
+            orders - pandas DataFrame of the rows of <<basket>> sized to at
+                     least one lot, with columns Symbol, Contract_Object,
+                     Trade_Type, Price, Number_of_Units, Notional and
+                     Order_Object, ready for <submitOrders>
+
+        RESULTS:
+            Prints the symbols of the rows that were dropped.
+        """
+        contracts = list(basket['Contract_Object'].values)
+        prices = self._unitPrices(self._basketQuotes(
+                                            contracts = contracts,
+                                            time_out = time_out,
+                                            max_staleness = max_staleness))
+
+        dollars = basket['Amount_Dollars'].values.astype(float)
+        if 'Lot_Size' in basket.columns:
+            lots = basket['Lot_Size'].values.astype(float)
+        else:
+            lots = np.full(len(basket), float(lot_size))
+        if 'Min_Notional' in basket.columns:
+            minimums = basket['Min_Notional'].values.astype(float)
+        else:
+            minimums = np.full(len(basket), float(min_notional))
+
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            valid = (prices > 0) & (lots > 0) & (dollars > 0)
+            units = np.where(valid,
+                             np.floor(dollars / (prices * lots)) * lots, 0)
+            notional = units * prices
+            units[~(notional >= minimums)] = 0
+        sized = units > 0
+
+        symbols = np.array([contract.m_symbol for contract in contracts],
+                           dtype = object)
+        if not sized.all():
+            print("No order sized for: ", list(symbols[~sized]))
+
+        orders = pd.DataFrame({'Symbol': symbols[sized],
+                               'Contract_Object': basket['Contract_Object']
+                                                  .values[sized],
+                               'Trade_Type': basket['Trade_Type']
+                                             .values[sized],
+                               'Price': prices[sized],
+                               'Number_of_Units': units[sized].astype(int),
+                               'Notional': notional[sized]},
+                              index = basket.index[sized],
+                              columns = ['Symbol', 'Contract_Object',
+                                         'Trade_Type', 'Price',
+                                         'Number_of_Units', 'Notional'])
+        orders['Order_Object'] = [self.createOrder(
+                                        trade_type = str(trade_type),
+                                        amount_units = int(amount),
+                                        price_per_unit = float(price),
+                                        order_type = order_type,
+                                        time_in_force = time_in_force)
+                                  for trade_type, amount, price in zip(
+                                        orders['Trade_Type'].values,
+                                        orders['Number_of_Units'].values,
+                                        orders['Price'].values)]
+        return orders
+
+    @timed
     def placeRecordedOrder(self, order_id, contract, order, path = '',
                            additional_values = {}):
         """
         SUMMARY:
             Places an [order] on the [#Interactive Brokers server] and records
-            the transaction.
+            the transaction. Does not wait: the executions of the order are
+            written to the execution journal by the writer thread as IB
+            reports them.
         
         PARAMETERS:
             order_id - 
             contract - 
             order - 
-            path - 
-            additional_values - 
+            path - string path of the execution log, see <_executionJournal>
+            additional_values - dictionary of column: value recorded with
+                                the executions of the order
         
         RETURNS:
             None
@@ -3355,13 +5313,16 @@ class IBBrokerTotal(IBExecutionBroker, IBDataBroker):
         """
         self.tws.placeOrder(order_id, contract, order)
         if (path != ''):
-            self.recordTransaction(contract=contract, path=path,
-                                          additional_values=additional_values)
+            journal = self._executionJournal(path)
+            if journal is not None:
+                journal.annotate(order_id, additional_values)
 
+    @timed
     def getLiveMidPriceData(self, contract):
         """
         SUMMARY:
-            Method summary
+            Returns the mid price of <<contract>>; read from memory if it is
+            subscribed with <subscribeMarketData>, otherwise from a snapshot.
         
         PARAMETERS:
             None
@@ -3372,6 +5333,12 @@ class IBBrokerTotal(IBExecutionBroker, IBDataBroker):
         RESULTS:
             None
         """
+        quote = self.getLatestQuote(contract = contract)
+        if quote is not None:
+            midPrice = (quote['Ask_Price'] + quote['Bid_Price']) * 0.5
+            if np.isfinite(midPrice):
+                return midPrice
+
         liveData = self.getLiveMarketData(contract)
 
         askPrice = liveData['price'][liveData['Type'] == 'ASK PRICE'].values[0]
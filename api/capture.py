@@ -0,0 +1,250 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/capture.py
+Created on 2026-10-18T14:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+#imports from stdlib
+import threading
+import time
+
+# third party imports
+import numpy as np
+import pandas as pd
+
+TICK_PRICE_DTYPE = np.dtype([('tickerId', 'i4'), ('field', 'i2'),
+                             ('price', 'f8'), ('canAutoExecute', 'i1'),
+                             ('time', 'f8')])
+TICK_SIZE_DTYPE = np.dtype([('tickerId', 'i4'), ('field', 'i2'),
+                            ('size', 'i8'), ('time', 'f8')])
+HISTORICAL_DATA_DTYPE = np.dtype([('reqId', 'i4'), ('date', 'S64'),
+                                  ('open', 'f8'), ('high', 'f8'),
+                                  ('low', 'f8'), ('close', 'f8'),
+                                  ('volume', 'i8'), ('count', 'i4'),
+                                  ('WAP', 'f8'), ('hasGaps', '?'),
+                                  ('time', 'f8')])
+
+# dtype of each <IBWrapper> attribute captured
+CAPTURE_DTYPES = {'tick_Price': TICK_PRICE_DTYPE,
+                  'tick_Size': TICK_SIZE_DTYPE,
+                  'historical_Data': HISTORICAL_DATA_DTYPE}
+
+
+class ColumnarBuffer(object):
+    """
+    CLASS SUMMARY:
+        Growable NumPy structured array. Rows are written in place and the
+        array doubles its capacity when full, so appending a row allocates
+        no Python objects.
+
+    CLASS PROPERTIES:
+        dtype - NumPy dtype of the rows
+        capacity - number of rows allocated
+
+    CLASS SPECIAL METHODS:
+        __len__ -
+
+    CLASS PRIVATE METHODS:
+        None
+
+    CLASS PUBLIC METHODS:
+        append -
+        array -
+        clear -
+    """
+    def __init__(self, dtype, capacity = 1024):
+        """
+        SUMMARY:
+            ColumnarBuffer initializer. Initializes object properties.
+
+        PARAMETERS:
+            dtype - NumPy structured dtype of the rows
+            capacity - integer number of rows allocated initially
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates an empty <ColumnarBuffer> object.
+        """
+        super(ColumnarBuffer, self).__init__()
+        self._rows = np.zeros(capacity, dtype = dtype)
+        self._length = 0
+        self._lock = threading.Lock()
+
+    """
+    CLASS PROPERTIES
+    """
+    def dtype():
+        doc = "The NumPy dtype of the rows."
+        def fget(self):
+            return self._rows.dtype
+        return locals()
+    dtype = property(**dtype())
+
+    def capacity():
+        doc = "The number of rows allocated."
+        def fget(self):
+            return len(self._rows)
+        return locals()
+    capacity = property(**capacity())
+
+    """
+    CLASS SPECIAL METHODS
+    """
+    def __len__(self):
+        return self._length
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def append(self, row):
+        """
+        SUMMARY:
+            Writes <<row>>, a tuple in the field order of <<dtype>>, after
+            the last row.
+        """
+        with self._lock:
+            if self._length == len(self._rows):
+                rows = np.zeros(max(2 * len(self._rows), 1),
+                                dtype = self._rows.dtype)
+                rows[:self._length] = self._rows
+                self._rows = rows
+            self._rows[self._length] = row
+            self._length += 1
+
+    def array(self):
+        """
+        SUMMARY:
+            Returns a view of the rows written so far. The view is not
+            copied; it stays valid until the buffer grows or is cleared.
+        """
+        with self._lock:
+            return self._rows[:self._length]
+
+    def clear(self):
+        """
+        SUMMARY:
+            Discards all rows, keeping the allocated capacity.
+        """
+        with self._lock:
+            self._length = 0
+
+
+class TickCapture(object):
+    """
+    CLASS SUMMARY:
+        Columnar capture of the <IBWrapper> callbacks listed in
+        <<CAPTURE_DTYPES>>. Each callback is written with its receive time
+        into one <ColumnarBuffer>; pandas DataFrames are only built when
+        asked for.
+
+    CLASS PROPERTIES:
+        names - the captured <IBWrapper> attribute names
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        None
+
+    CLASS PUBLIC METHODS:
+        append -
+        array -
+        frame -
+        clear -
+    """
+    def __init__(self, capacity = 65536):
+        """
+        SUMMARY:
+            TickCapture initializer. Initializes object properties.
+
+        PARAMETERS:
+            capacity - integer number of rows allocated initially per
+                       captured callback
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates an empty <TickCapture> object.
+        """
+        super(TickCapture, self).__init__()
+        self._buffers = dict((name, ColumnarBuffer(dtype, capacity = capacity))
+                             for (name, dtype) in CAPTURE_DTYPES.items())
+
+    """
+    CLASS PROPERTIES
+    """
+    def names():
+        doc = "The captured <IBWrapper> attribute names."
+        def fget(self):
+            return sorted(self._buffers.keys())
+        return locals()
+    names = property(**names())
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def append(self, name, row):
+        """
+        SUMMARY:
+            Captures one callback of the <<name>> attribute, stamped with the
+            current time.
+
+        PARAMETERS:
+            name - string <IBWrapper> attribute name, e.g. 'tick_Price'
+            row - tuple of the callback arguments in the order the attribute
+                  holds them
+
+        RETURNS:
+            boolean - True if <<name>> is captured
+        """
+        buffer = self._buffers.get(name)
+        if buffer is None:
+            return False
+        buffer.append(tuple(row) + (time.time(),))
+        return True
+
+    def array(self, name):
+        """
+        SUMMARY:
+            Returns a view of the rows captured for <<name>> as a NumPy
+            structured array, without copying them; see
+            <ColumnarBuffer.array>.
+        """
+        return self._buffers[name].array()
+
+    def frame(self, name, key = None):
+        """
+        SUMMARY:
+            Builds a pandas DataFrame of the rows captured for <<name>>.
+            The rows are copied into the frame, which cannot be a view of
+            the buffer since its fields have different dtypes; the frame
+            stays valid when the buffer grows or is cleared. Use <array>
+            to read the rows without a copy.
+
+        PARAMETERS:
+            name - string <IBWrapper> attribute name
+            key - tickerId/reqId to select; None selects all rows
+
+        RETURNS:
+            data - pandas DataFrame with one column per dtype field, holding
+                   a copy of the rows
+        """
+        rows = self.array(name)
+        if key is not None:
+            rows = rows[rows[rows.dtype.names[0]] == key]
+        return pd.DataFrame(rows)
+
+    def clear(self, name = None):
+        """
+        SUMMARY:
+            Discards the rows captured for <<name>>; all names if None.
+        """
+        names = self.names if name is None else [name]
+        for name in names:
+            self._buffers[name].clear()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/continuousFutures.py
+Created on 2026-10-19T01:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+# third party imports
+import numpy as np
+import pandas as pd
+
+# back-adjustment methods of <ContinuousFutures>
+RATIO = 'ratio'
+DIFFERENCE = 'difference'
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'WAP']
+
+ROLL_COLUMNS = ['Date', 'From_Symbol', 'To_Symbol', 'Gap']
+
+
+class ContinuousFutures(object):
+    """
+    CLASS SUMMARY:
+        Continuous series of a futures root stitched from the bars of its
+        contracts along a roll schedule. The prices held before each roll
+        are back-adjusted by the gap between the two contracts on the last
+        day both traded before the roll, as a ratio or a difference, so the
+        latest segment keeps its traded prices. Bars are appended
+        incrementally: the history is only adjusted again, in one NumPy
+        operation, when an appended bar crosses a roll.
+
+    CLASS PROPERTIES:
+        adjustment - 'ratio' or 'difference'
+        roll_schedule - DataFrame of the contracts and their Roll_Date
+        data - DataFrame of the back-adjusted bars
+        rolls - DataFrame of the rolls applied and their gaps
+
+    CLASS SPECIAL METHODS:
+        __len__ -
+
+    CLASS PRIVATE METHODS:
+        _frontBars -
+        _gaps -
+        _adjust -
+
+    CLASS PUBLIC METHODS:
+        build -
+        append -
+    """
+    def __init__(self, roll_schedule, adjustment = RATIO):
+        """
+        SUMMARY:
+            ContinuousFutures initializer. Initializes object properties.
+
+        PARAMETERS:
+            roll_schedule - pandas DataFrame with columns Local_Symbol and
+                            Roll_Date sorted by expiry, as returned by
+                            <rollSchedule> of a <FuturesChainCache>
+            adjustment - 'ratio' to scale or 'difference' to shift the prices
+                         before each roll
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates an empty <ContinuousFutures> object. Raises ValueError
+            for an unknown <<adjustment>>.
+        """
+        super(ContinuousFutures, self).__init__()
+        if adjustment not in (RATIO, DIFFERENCE):
+            raise ValueError("Unknown adjustment: " + str(adjustment))
+        self._adjustment = adjustment
+        self._roll_schedule = roll_schedule.reset_index(drop = True)
+        self._symbols = self._roll_schedule['Local_Symbol'].values
+        self._positions = dict((symbol, position) for (position, symbol)
+                               in enumerate(self._symbols))
+        self._roll_dates = pd.to_datetime(
+                                self._roll_schedule['Roll_Date']).values \
+                             .astype('datetime64[D]')
+        self._data = pd.DataFrame()
+        # closes of every contract received, one column per chain position
+        self._closes = pd.DataFrame()
+        self._rolls = []
+
+    """
+    CLASS PROPERTIES
+    """
+    def adjustment():
+        doc = "The back-adjustment method, 'ratio' or 'difference'."
+        def fget(self):
+            return self._adjustment
+        return locals()
+    adjustment = property(**adjustment())
+
+    def roll_schedule():
+        doc = "The DataFrame of the contracts and their Roll_Date."
+        def fget(self):
+            return self._roll_schedule
+        return locals()
+    roll_schedule = property(**roll_schedule())
+
+    def data():
+        doc = """
+                The DataFrame of the back-adjusted bars indexed by date, with
+                the Local_Symbol each bar was taken from.
+            """
+        def fget(self):
+            return self._data.drop('Position', axis = 1, errors = 'ignore')
+        return locals()
+    data = property(**data())
+
+    def rolls():
+        doc = """
+                The DataFrame of <<ROLL_COLUMNS>> of the rolls applied, with
+                the Date of the first bar of the new contract and the Gap the
+                earlier prices were adjusted by.
+            """
+        def fget(self):
+            return pd.DataFrame(self._rolls, columns = ROLL_COLUMNS)
+        return locals()
+    rolls = property(**rolls())
+
+    """
+    CLASS SPECIAL METHODS
+    """
+    def __len__(self):
+        return len(self._data)
+
+    """
+    CLASS PRIVATE METHODS
+    """
+    def _frontBars(self, bars):
+        """
+        SUMMARY:
+            Returns the bars of <<bars>> of the contract that is the front
+            contract on their day, and the closes of every contract.
+
+        PARAMETERS:
+            bars - dictionary of {local symbol: pandas DataFrame of bars
+                   indexed by date}
+
+        RETURNS:
+            (front, closes) - pandas DataFrames of the front bars with their
+                              Local_Symbol and Position in the chain, and of
+                              the closes with one column per Position
+        """
+        frames = []
+        closes = []
+        for symbol, frame in bars.items():
+            position = self._positions.get(symbol)
+            if position is None:
+                print("Contract not in the roll schedule: ", symbol)
+                continue
+            if frame is None or frame.empty:
+                continue
+            frame = frame.set_index(pd.DatetimeIndex(frame.index))
+            frame = frame[~frame.index.duplicated(keep = 'last')]
+            frame = frame.assign(Local_Symbol = symbol, Position = position)
+            frames.append(frame)
+            closes.append(frame['close'].astype(float).rename(position))
+        if not frames:
+            return pd.DataFrame(), pd.DataFrame()
+
+        data = pd.concat(frames).sort_index(kind = 'mergesort')
+        days = data.index.values.astype('datetime64[D]')
+        front = np.searchsorted(self._roll_dates, days, side = 'right')
+        return data[data['Position'].values == front], \
+               pd.concat(closes, axis = 1)
+
+    def _gaps(self, first, last):
+        """
+        SUMMARY:
+            Returns the gaps of the rolls from position <<first>> up to
+            <<last>> of the chain, each taken on the last day before the
+            roll both contracts have a close.
+
+        RETURNS:
+            gaps - numpy array of the ratio or difference of the close of
+                   the new contract to the close of the old one; 1 or 0
+                   where the contracts have no close on a common day
+        """
+        positions = np.arange(first, last + 1)
+        closes = self._closes.reindex(columns = positions).values
+        days = self._closes.index.values.astype('datetime64[D]')
+        old, new = closes[:, :-1], closes[:, 1:]
+        common = ~np.isnan(old) & ~np.isnan(new) & \
+                 (days[:, None] < self._roll_dates[positions[:-1]][None, :])
+        has_common = common.any(axis = 0)
+        row = len(days) - 1 - common[::-1].argmax(axis = 0)
+        columns = np.arange(len(positions) - 1)
+        old, new = old[row, columns], new[row, columns]
+        for position in positions[:-1][~has_common]:
+            print("No common close to roll from: ", self._symbols[position],
+                  "to", self._symbols[position + 1])
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            if self.adjustment == RATIO:
+                return np.where(has_common, new / old, 1.0)
+            return np.where(has_common, new - old, 0.0)
+
+    def _adjust(self, data, adjustments):
+        """
+        SUMMARY:
+            Returns <<data>> with its price columns scaled or shifted by
+            <<adjustments>>, one per row.
+        """
+        columns = [column for column in PRICE_COLUMNS
+                   if column in data.columns]
+        prices = data[columns].values.astype(float)
+        if self.adjustment == RATIO:
+            prices = prices * adjustments[:, None]
+        else:
+            prices = prices + adjustments[:, None]
+        data = data.copy()
+        data[columns] = prices
+        return data
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def build(self, bars):
+        """
+        SUMMARY:
+            Builds the series from scratch out of <<bars>>.
+
+        PARAMETERS:
+            bars - dictionary of {local symbol: pandas DataFrame of bars
+                   indexed by date}, as returned by <getDataInRange>, for
+                   the contracts of the roll schedule
+
+        RETURNS:
+            data - pandas DataFrame of the back-adjusted bars
+        """
+        self._data = pd.DataFrame()
+        self._closes = pd.DataFrame()
+        self._rolls = []
+        return self.append(bars)
+
+    def append(self, bars):
+        """
+        SUMMARY:
+            Appends the bars of <<bars>> later than the series. The bars of
+            the contract rolled into should be appended from a few days
+            before the roll, so its gap can be measured.
+
+        PARAMETERS:
+            bars - dictionary of {local symbol: pandas DataFrame of bars
+                   indexed by date}
+
+        RETURNS:
+            data - pandas DataFrame of the back-adjusted bars
+        """
+        front, closes = self._frontBars(bars)
+        if closes.empty:
+            return self.data
+        closes = pd.concat([self._closes, closes]) if len(self._closes) \
+                 else closes
+        closes = closes.groupby(level = 0).last()
+        self._closes = closes.sort_index()
+
+        if len(self._data):
+            front = front[front.index > self._data.index[-1]]
+            current = int(self._data['Position'].values[-1])
+            front = front[front['Position'].values >= current]
+        if front.empty:
+            return self.data
+        positions = front['Position'].values.astype(int)
+        if not len(self._data):
+            current = int(positions[0])
+        last = int(positions.max())
+
+        # adjustment of each segment from <<current>> to <<last>>
+        gaps = self._gaps(current, last)
+        if self.adjustment == RATIO:
+            segments = np.append(np.cumprod(gaps[::-1])[::-1], 1.0)
+        else:
+            segments = np.append(np.cumsum(gaps[::-1])[::-1], 0.0)
+        front = self._adjust(front, segments[positions - current])
+        if len(self._data) and last > current:
+            self._data = self._adjust(self._data,
+                                      np.full(len(self._data), segments[0]))
+        self._data = pd.concat([self._data, front]) if len(self._data) \
+                     else front
+
+        for position in range(current, last):
+            date = front.index[np.searchsorted(positions, position + 1)]
+            self._rolls.append((date, self._symbols[position],
+                                self._symbols[position + 1],
+                                gaps[position - current]))
+        return self.data
@@ -0,0 +1,229 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/contractCache.py
+Created on 2026-10-18T18:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+#imports from stdlib
+import copy
+import os
+import pickle
+import threading
+
+# internal/custom imports
+from registry import contractKey
+
+
+class ContractCache(object):
+    """
+    CLASS SUMMARY:
+        Cache of fully qualified Interactive Brokers (IB) contracts, as
+        described by <position>, <updatePortfolio> and <contractDetails>.
+        Contracts are stored by conId and by their <contractKey> and can be
+        persisted between sessions, so a known instrument is never looked up
+        with IB again. The file is only rewritten when the cache changed.
+
+    CLASS PROPERTIES:
+        path_file - file the cache is persisted to; None disables persistence
+        changed - True if the cache changed since it was loaded or saved
+
+    CLASS SPECIAL METHODS:
+        __contains__ -
+        __len__ -
+
+    CLASS PRIVATE METHODS:
+        None
+
+    CLASS PUBLIC METHODS:
+        add -
+        byConId -
+        find -
+        load -
+        save -
+    """
+    def __init__(self, path_file = None):
+        """
+        SUMMARY:
+            ContractCache initializer. Initializes object properties.
+
+        PARAMETERS:
+            path_file - string path of the file the cache is persisted to;
+                        None keeps contracts in memory only
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates a <ContractCache> object holding the persisted contracts.
+        """
+        super(ContractCache, self).__init__()
+        self._path_file = path_file
+        self._by_con_id = {}
+        self._by_key = {}
+        # <contractKey> without the exchange: contract, to find contracts
+        # asked for on another exchange
+        self._by_instrument = {}
+        # <contractKey> of each alias: conId
+        self._aliases = {}
+        self._changed = False
+        self._lock = threading.Lock()
+        self.load()
+
+    """
+    CLASS PROPERTIES
+    """
+    def path_file():
+        doc = "The file the cache is persisted to."
+        def fget(self):
+            return self._path_file
+        def fset(self, value):
+            self._path_file = value
+        return locals()
+    path_file = property(**path_file())
+
+    def changed():
+        doc = "True if the cache changed since it was loaded or saved."
+        def fget(self):
+            return self._changed
+        return locals()
+    changed = property(**changed())
+
+    """
+    CLASS SPECIAL METHODS
+    """
+    def __contains__(self, contract):
+        return self.find(contract) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._by_con_id)
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def add(self, contract, alias = None):
+        """
+        SUMMARY:
+            Stores a copy of the qualified <<contract>>. Contracts without a
+            conId are not qualified and are ignored.
+
+        PARAMETERS:
+            contract - Contract() object described by IB
+            alias - Contract() object <<contract>> is also found by, e.g.
+                    the partly specified contract it was resolved from
+
+        RETURNS:
+            boolean - True if <<contract>> was stored
+        """
+        if not contract.m_conId:
+            return False
+        contract = copy.copy(contract)
+        with self._lock:
+            cached = self._by_con_id.get(contract.m_conId)
+            if cached is None or not cached == contract:
+                self._changed = True
+            else:
+                contract = cached
+            self._by_con_id[contract.m_conId] = contract
+            self._by_key[contractKey(contract)] = contract
+            self._by_instrument[contractKey(contract,
+                                            exchange = False)] = contract
+            if alias is not None:
+                alias_key = contractKey(alias)
+                if self._aliases.get(alias_key) != contract.m_conId:
+                    self._changed = True
+                self._aliases[alias_key] = contract.m_conId
+                self._by_key[alias_key] = contract
+        return True
+
+    def byConId(self, con_id):
+        """
+        SUMMARY:
+            Returns a copy of the contract with conId <<con_id>>; None if it
+            is not cached.
+        """
+        with self._lock:
+            contract = self._by_con_id.get(con_id)
+        if contract is None:
+            return None
+        return copy.copy(contract)
+
+    def find(self, contract):
+        """
+        SUMMARY:
+            Returns a copy of the cached qualified contract matching
+            <<contract>>, routed to the exchange of <<contract>>.
+
+        PARAMETERS:
+            contract - Contract() object; matched by its conId if it has
+                       one, then by its <contractKey>, then by the same
+                       instrument on any exchange
+
+        RETURNS:
+            contract - Contract() object; None if it is not cached
+        """
+        with self._lock:
+            cached = self._by_con_id.get(contract.m_conId) or \
+                     self._by_key.get(contractKey(contract)) or \
+                     self._by_instrument.get(contractKey(contract,
+                                                         exchange = False))
+        if cached is None:
+            return None
+        cached = copy.copy(cached)
+        if contract.m_exchange:
+            cached.m_exchange = contract.m_exchange
+        return cached
+
+    def load(self):
+        """
+        SUMMARY:
+            Adds the contracts persisted in <<path_file>> to the cache.
+            Contracts read from the file do not mark the cache changed.
+
+        RETURNS:
+            None
+        """
+        if self.path_file is None or not os.path.isfile(self.path_file):
+            return
+        try:
+            with open(self.path_file, 'rb') as f:
+                contracts, aliases = pickle.load(f)
+        except Exception:
+            print("Could not read the contract cache from: ", self.path_file)
+            return
+        changed = self._changed
+        for contract in contracts:
+            self.add(contract)
+        with self._lock:
+            self._changed = changed
+            for key, con_id in aliases.items():
+                if con_id in self._by_con_id:
+                    self._aliases[key] = con_id
+                    self._by_key[key] = self._by_con_id[con_id]
+
+    def save(self):
+        """
+        SUMMARY:
+            Persists the cached contracts to <<path_file>> if the cache
+            changed since it was loaded or last saved.
+
+        RETURNS:
+            None
+        """
+        if self.path_file is None:
+            return
+        with self._lock:
+            if not self._changed:
+                return
+            contracts = list(self._by_con_id.values())
+            aliases = dict(self._aliases)
+            self._changed = False
+        path_tmp = self.path_file + '.tmp'
+        with open(path_tmp, 'wb') as f:
+            pickle.dump((contracts, aliases), f, pickle.HIGHEST_PROTOCOL)
+        if os.path.isfile(self.path_file):
+            os.remove(self.path_file)
+        os.rename(path_tmp, self.path_file)
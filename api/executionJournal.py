@@ -0,0 +1,534 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/executionJournal.py
+Created on 2026-10-18T19:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+#imports from stdlib
+import collections
+import os
+import pickle
+import threading
+import time
+import traceback
+
+# third party imports
+import numpy as np
+import pandas as pd
+
+# kinds of journal rows
+EXECUTION = 0
+COMMISSION = 1
+
+# first bytes of every journal file, followed by its rows
+JOURNAL_HEADER = b'IBEXECJOURNAL01\n'
+
+# extension of the journal kept beside an execution log
+JOURNAL_EXTENSION = '.journal'
+
+JOURNAL_DTYPE = np.dtype([('Received_Time', 'f8'), ('Kind', 'i1'),
+                          ('Order_ID', 'i8'), ('Permanent_ID', 'i8'),
+                          ('Client_ID', 'i4'), ('Contract_ID', 'i8'),
+                          ('Execution_ID', 'S40'), ('Server_Time', 'S24'),
+                          ('Account_Name', 'S16'), ('Ticker', 'S16'),
+                          ('Financial_Instrument', 'S8'),
+                          ('Exchange', 'S16'), ('Currency', 'S4'),
+                          ('Expiry', 'S16'), ('Local_Symbol', 'S32'),
+                          ('Side', 'S4'), ('Shares', 'f8'), ('Price', 'f8'),
+                          ('Cumulative_Quantity', 'f8'),
+                          ('Average_Unit_Price', 'f8'),
+                          ('Order_Reference', 'S32'), ('Commission', 'f8'),
+                          ('Commission_Currency', 'S4'),
+                          ('Realized_PnL', 'f8')])
+
+
+def journalPath(path):
+    """
+    SUMMARY:
+        Returns the path of the journal kept beside the execution log
+        <<path>>, e.g. a CSV log, so the journal never writes into the log:
+        <<path>> with its extension replaced by <<JOURNAL_EXTENSION>>.
+    """
+    root, extension = os.path.splitext(path)
+    if extension == JOURNAL_EXTENSION:
+        return path
+    return root + JOURNAL_EXTENSION
+
+
+def _text(value):
+    """
+    SUMMARY:
+        Returns <<value>> as a string for a journal row; '' for None.
+    """
+    if value is None:
+        return ''
+    return str(value)
+
+
+class ExecutionJournal(object):
+    """
+    CLASS SUMMARY:
+        Append-only journal of the executions and commission reports of
+        Interactive Brokers (IB). Callbacks only queue their rows; a writer
+        thread appends them in batches of fixed size NumPy records to
+        <<path_file>>, after its <<JOURNAL_HEADER>>, and compacts the file
+        every <<compact_every>> rows,
+        merging each commission report into its execution. Rows are indexed
+        by order id and symbol so reads do not scan the file.
+
+        Values recorded with an order by <annotate> are appended to
+        <<path_file>>.orders and joined to its executions on read.
+
+    CLASS PROPERTIES:
+        path_file - file the journal is written to
+        compact_every - number of rows appended between compactions
+        queue_depth - number of rows waiting to be written
+
+    CLASS SPECIAL METHODS:
+        __len__ -
+
+    CLASS PRIVATE METHODS:
+        _open -
+        _readRows -
+        _load -
+        _index -
+        _merge -
+        _append -
+        _compact -
+        _run -
+        _queue -
+
+    CLASS PUBLIC METHODS:
+        recordExecution -
+        recordCommission -
+        annotate -
+        flush -
+        compact -
+        close -
+        read -
+    """
+    def __init__(self, path_file, compact_every = 10000):
+        """
+        SUMMARY:
+            ExecutionJournal initializer. Initializes object properties.
+
+        PARAMETERS:
+            path_file - string path of the journal file; created if missing.
+                        See <journalPath>
+            compact_every - integer number of rows appended between
+                            compactions
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates an <ExecutionJournal> object indexing the rows already
+            in <<path_file>>. The writer thread is started on the first
+            record. Raises ValueError if <<path_file>> exists and is not a
+            journal.
+        """
+        super(ExecutionJournal, self).__init__()
+        self._path_file = path_file
+        self._compact_every = compact_every
+
+        self._pending = collections.deque()
+        self._pending_annotations = collections.deque()
+        self._rows_since_compaction = 0
+        self._writing = False
+        self._closed = False
+
+        self._condition = threading.Condition()
+        # guards the file and the indices
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self._length = 0
+        self._order_rows = {}
+        self._symbol_rows = {}
+        self._execution_rows = {}
+        self._annotations = {}
+        self._open()
+        self._load()
+
+    """
+    CLASS PROPERTIES
+    """
+    def path_file():
+        doc = "The file the journal is written to."
+        def fget(self):
+            return self._path_file
+        return locals()
+    path_file = property(**path_file())
+
+    def compact_every():
+        doc = "The number of rows appended between compactions."
+        def fget(self):
+            return self._compact_every
+        def fset(self, value):
+            self._compact_every = value
+        return locals()
+    compact_every = property(**compact_every())
+
+    def queue_depth():
+        doc = "The number of rows waiting to be written."
+        def fget(self):
+            with self._condition:
+                return len(self._pending)
+        return locals()
+    queue_depth = property(**queue_depth())
+
+    """
+    CLASS SPECIAL METHODS
+    """
+    def __len__(self):
+        return self._length
+
+    """
+    CLASS PRIVATE METHODS
+    """
+    def _open(self):
+        """
+        SUMMARY:
+            Writes the <<JOURNAL_HEADER>> of a new or empty journal file.
+            Raises ValueError if the file holds anything else, e.g. a CSV
+            execution log.
+        """
+        if os.path.isfile(self.path_file) and os.path.getsize(self.path_file):
+            with open(self.path_file, 'rb') as f:
+                header = f.read(len(JOURNAL_HEADER))
+            if header != JOURNAL_HEADER:
+                raise ValueError("Not an execution journal: " +
+                                 str(self.path_file))
+            return
+        with open(self.path_file, 'wb') as f:
+            f.write(JOURNAL_HEADER)
+
+    def _readRows(self):
+        """
+        SUMMARY:
+            Returns every row of the journal file. Must be called holding
+            the lock, or before the writer thread starts.
+        """
+        with open(self.path_file, 'rb') as f:
+            f.seek(len(JOURNAL_HEADER))
+            return np.fromfile(f, dtype = JOURNAL_DTYPE)
+
+    def _load(self):
+        """
+        SUMMARY:
+            Indexes the rows and reads the annotations already on disk.
+        """
+        self._index(self._readRows(), 0)
+        path_orders = self.path_file + '.orders'
+        if os.path.isfile(path_orders):
+            with open(path_orders, 'rb') as f:
+                while True:
+                    try:
+                        order_id, values = pickle.load(f)
+                    except EOFError:
+                        break
+                    except Exception:
+                        print("Could not read order annotations from: ",
+                              path_orders)
+                        break
+                    self._annotations.setdefault(order_id, {}).update(values)
+
+    def _index(self, rows, start):
+        """
+        SUMMARY:
+            Adds <<rows>>, stored from row <<start>> of the file on, to the
+            order id, symbol and execution id indices. Must be called
+            holding the lock, or before the writer thread starts.
+        """
+        for position, (kind, order_id, symbol, execution_id) in enumerate(
+                zip(rows['Kind'], rows['Order_ID'], rows['Ticker'],
+                    rows['Execution_ID']), start):
+            self._execution_rows.setdefault(execution_id, []).append(position)
+            if kind == EXECUTION:
+                self._order_rows.setdefault(int(order_id), []).append(position)
+                self._symbol_rows.setdefault(symbol, []).append(position)
+        self._length = start + len(rows)
+
+    def _merge(self, rows):
+        """
+        SUMMARY:
+            Returns <<rows>> with the latest row of each execution id, the
+            commission reports merged into their executions and the
+            commission reports of unknown executions kept, in the order
+            received.
+        """
+        executions = rows[rows['Kind'] == EXECUTION]
+        commissions = rows[rows['Kind'] == COMMISSION]
+        # commissions of compacted executions, merged again if IB resends
+        # the execution
+        reports = np.concatenate((
+                    executions[np.isfinite(executions['Commission'])],
+                    commissions))
+        if len(executions):
+            # IB sends an execution again on every execution request
+            _, last = np.unique(executions['Execution_ID'][::-1],
+                                return_index = True)
+            executions = executions[len(executions) - 1 - last]
+        if len(executions) and len(reports):
+            order = np.argsort(executions['Execution_ID'])
+            positions = np.searchsorted(executions['Execution_ID'],
+                                        reports['Execution_ID'],
+                                        sorter = order)
+            positions = order[np.minimum(positions, len(executions) - 1)]
+            matched = executions['Execution_ID'][positions] == \
+                      reports['Execution_ID']
+            for field in ('Commission', 'Commission_Currency',
+                          'Realized_PnL'):
+                executions[field][positions[matched]] = \
+                    reports[field][matched]
+            commissions = commissions[
+                            ~matched[len(reports) - len(commissions):]]
+
+        merged = np.concatenate((executions, commissions))
+        return merged[np.argsort(merged['Received_Time'], kind = 'mergesort')]
+
+    def _append(self, rows, annotations):
+        """
+        SUMMARY:
+            Appends <<rows>> and <<annotations>> to the journal files and
+            indexes them.
+        """
+        with self._lock:
+            if len(rows):
+                with open(self.path_file, 'ab') as f:
+                    f.write(rows.tostring())
+                self._index(rows, self._length)
+            if annotations:
+                with open(self.path_file + '.orders', 'ab') as f:
+                    for order_id, values in annotations:
+                        pickle.dump((order_id, values), f,
+                                    pickle.HIGHEST_PROTOCOL)
+        self._rows_since_compaction += len(rows)
+
+    def _compact(self):
+        """
+        SUMMARY:
+            Rewrites the journal file merged by <_merge> and rebuilds the
+            indices.
+        """
+        with self._lock:
+            if not os.path.isfile(self.path_file):
+                return
+            rows = self._merge(self._readRows())
+            path_tmp = self.path_file + '.tmp'
+            with open(path_tmp, 'wb') as f:
+                f.write(JOURNAL_HEADER)
+                f.write(rows.tostring())
+            os.remove(self.path_file)
+            os.rename(path_tmp, self.path_file)
+            self._order_rows = {}
+            self._symbol_rows = {}
+            self._execution_rows = {}
+            self._index(rows, 0)
+        self._rows_since_compaction = 0
+
+    def _run(self):
+        """
+        SUMMARY:
+            Writer loop. Writes every queued row in one append and compacts
+            the journal once <<compact_every>> rows were appended.
+        """
+        while True:
+            with self._condition:
+                while not self._pending and \
+                      not self._pending_annotations and not self._closed:
+                    self._condition.wait()
+                if self._closed and not self._pending and \
+                   not self._pending_annotations:
+                    return
+                rows = np.array(list(self._pending), dtype = JOURNAL_DTYPE)
+                annotations = list(self._pending_annotations)
+                self._pending.clear()
+                self._pending_annotations.clear()
+                self._writing = True
+            try:
+                self._append(rows, annotations)
+                if self._rows_since_compaction >= self.compact_every:
+                    self._compact()
+            except Exception:
+                print("Execution journal write failed:\n",
+                      traceback.format_exc())
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+    def _queue(self, row = None, annotation = None):
+        """
+        SUMMARY:
+            Queues a row or an annotation for the writer thread, starting it
+            if it is not running.
+        """
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target = self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            if row is not None:
+                self._pending.append(row)
+            if annotation is not None:
+                self._pending_annotations.append(annotation)
+            self._condition.notify_all()
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def recordExecution(self, contract, execution):
+        """
+        SUMMARY:
+            Queues the <execDetails> of <<execution>> of <<contract>>.
+
+        RETURNS:
+            None
+        """
+        get = lambda name: getattr(execution, name, None)
+        self._queue(row = (time.time(), EXECUTION, get('m_orderId') or 0,
+                           get('m_permId') or 0, get('m_clientId') or 0,
+                           contract.m_conId or 0, _text(get('m_execId')),
+                           _text(get('m_time')), _text(get('m_acctNumber')),
+                           _text(contract.m_symbol),
+                           _text(contract.m_secType),
+                           _text(get('m_exchange')),
+                           _text(contract.m_currency),
+                           _text(contract.m_expiry),
+                           _text(contract.m_localSymbol),
+                           _text(get('m_side')), get('m_shares') or 0,
+                           get('m_price') or 0, get('m_cumQty') or 0,
+                           get('m_avgPrice') or 0, _text(get('m_orderRef')),
+                           np.nan, '', np.nan))
+
+    def recordCommission(self, commission_report):
+        """
+        SUMMARY:
+            Queues the <commissionReport> <<commission_report>>.
+
+        RETURNS:
+            None
+        """
+        get = lambda name: getattr(commission_report, name, None)
+        self._queue(row = (time.time(), COMMISSION, -1, 0, 0, 0,
+                           _text(get('m_execId')), '', '', '', '', '', '',
+                           '', '', '', 0, 0, 0, 0, '',
+                           get('m_commission') or 0,
+                           _text(get('m_currency')),
+                           get('m_realizedPNL') or 0))
+
+    def annotate(self, order_id, values):
+        """
+        SUMMARY:
+            Queues <<values>>, a dictionary of column: value, to be joined to
+            the executions of <<order_id>> on read.
+
+        RETURNS:
+            None
+        """
+        if not values:
+            return
+        self._annotations.setdefault(order_id, {}).update(values)
+        self._queue(annotation = (order_id, dict(values)))
+
+    def flush(self, time_out = 5):
+        """
+        SUMMARY:
+            Blocks until every queued row is written or <<time_out>> seconds
+            pass.
+
+        RETURNS:
+            boolean - True if the queue was written
+        """
+        time_end = time.time() + time_out
+        with self._condition:
+            while self._pending or self._pending_annotations or \
+                  self._writing:
+                remaining = time_end - time.time()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def compact(self):
+        """
+        SUMMARY:
+            Writes the queued rows and compacts the journal now.
+
+        RETURNS:
+            None
+        """
+        self.flush()
+        self._compact()
+
+    def close(self, time_out = 5):
+        """
+        SUMMARY:
+            Writes the queued rows and stops the writer thread.
+
+        RETURNS:
+            None
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(time_out)
+
+    def read(self, order_id = None, symbol = None, since = None):
+        """
+        SUMMARY:
+            Returns the journaled executions with their commissions. Rows of
+            an order or a symbol are looked up in the indices and read from
+            the file without scanning it.
+
+        PARAMETERS:
+            order_id - integer order id to select; None selects all orders
+            symbol - string symbol to select; None selects all symbols
+            since - epoch seconds; only rows received after are returned
+
+        RETURNS:
+            data - pandas DataFrame with one column per <<JOURNAL_DTYPE>>
+                   field plus the annotated columns; queued rows not yet
+                   written are not included
+        """
+        with self._lock:
+            if not self._length:
+                rows = np.zeros(0, dtype = JOURNAL_DTYPE)
+            elif order_id is None and symbol is None:
+                rows = self._readRows()
+            else:
+                positions = None
+                if order_id is not None:
+                    positions = set(self._order_rows.get(order_id, []))
+                if symbol is not None:
+                    symbol_rows = set(self._symbol_rows.get(symbol, []))
+                    positions = symbol_rows if positions is None else \
+                                positions & symbol_rows
+                journal = np.memmap(self.path_file, dtype = JOURNAL_DTYPE,
+                                    mode = 'r', offset = len(JOURNAL_HEADER),
+                                    shape = (self._length,))
+                executions = journal[sorted(positions)]
+                positions |= set(position
+                                 for execution_id in
+                                 executions['Execution_ID']
+                                 for position in
+                                 self._execution_rows.get(execution_id, []))
+                rows = np.array(journal[sorted(positions)])
+                del journal
+
+        rows = self._merge(rows)
+        if order_id is not None or symbol is not None:
+            rows = rows[rows['Kind'] == EXECUTION]
+        if since is not None:
+            rows = rows[rows['Received_Time'] > since]
+
+        data = pd.DataFrame(rows)
+        if self._annotations and len(data):
+            annotations = pd.DataFrame.from_dict(self._annotations,
+                                                 orient = 'index')
+            data = data.join(annotations, on = 'Order_ID')
+        return data
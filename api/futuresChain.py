@@ -0,0 +1,367 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/futuresChain.py
+Created on 2026-10-19T00:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+#imports from stdlib
+import datetime as dt
+import threading
+
+# third party imports
+import numpy as np
+import pandas as pd
+
+CHAIN_COLUMNS = ['Local_Symbol', 'Market_Symbol', 'Contract_Month',
+                 'Expiry', 'Contract_Object']
+
+# roll rules of <rollDates>
+ROLL_DAYS = 'days'
+ROLL_VOLUME = 'volume'
+
+
+def chainKey(symbol, exchange, currency = 'USD'):
+    """
+    SUMMARY:
+        Returns the key of the chain of root <<symbol>> traded on
+        <<exchange>> in <<currency>>; the same root may list different
+        contracts on other exchanges or in other currencies.
+    """
+    return (str(symbol).upper(), str(exchange).upper(),
+            str(currency).upper())
+
+
+def parseExpiries(expiries):
+    """
+    SUMMARY:
+        Parses IB 'YYYYMMDD' expiry strings at once; any time of day after
+        the date is ignored.
+
+    RETURNS:
+        expiries - numpy datetime64[D] array; NaT where not parsable
+    """
+    expiries = pd.Series(expiries, dtype = object).astype(str).str[:8]
+    return pd.to_datetime(expiries, format = '%Y%m%d',
+                          errors = 'coerce').values.astype('datetime64[D]')
+
+
+def parseContractMonths(months):
+    """
+    SUMMARY:
+        Parses IB 'YYYYMM' contract month strings at once.
+
+    RETURNS:
+        months - numpy datetime64[M] array; NaT where not parsable
+    """
+    months = pd.Series(months, dtype = object).astype(str).str[:6]
+    return pd.to_datetime(months, format = '%Y%m',
+                          errors = 'coerce').values.astype('datetime64[M]')
+
+
+class FuturesChainCache(object):
+    """
+    CLASS SUMMARY:
+        Cache of the futures chains of root symbols, built from the
+        <contractDetails> of a FUT request. Each chain is kept sorted by
+        expiry in NumPy arrays, and its roll dates are computed once per
+        rule, so finding the front or next contract at a date is a
+        <searchsorted> in memory. Chains are stale once the day they were
+        loaded is over. Chains are keyed by a root symbol or, to tell apart
+        the listings of a root, by its <chainKey>.
+
+    CLASS PROPERTIES:
+        None
+
+    CLASS SPECIAL METHODS:
+        __contains__ -
+        __len__ -
+
+    CLASS PRIVATE METHODS:
+        _chain -
+        _rollIndex -
+
+    CLASS PUBLIC METHODS:
+        update -
+        isFresh -
+        chain -
+        setVolumeRolls -
+        rollDates -
+        rollSchedule -
+        frontContract -
+        nextContract -
+        clear -
+    """
+    def __init__(self):
+        """
+        SUMMARY:
+            FuturesChainCache initializer. Initializes object properties.
+
+        PARAMETERS:
+            None
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates an empty <FuturesChainCache> object.
+        """
+        super(FuturesChainCache, self).__init__()
+        # root: {'local_symbols', 'market_symbols', 'months', 'expiries',
+        #        'contracts', 'date_loaded', 'roll_dates', 'volume_rolls'}
+        self._chains = {}
+        self._lock = threading.Lock()
+
+    """
+    CLASS SPECIAL METHODS
+    """
+    def __contains__(self, root):
+        with self._lock:
+            return root in self._chains
+
+    def __len__(self):
+        with self._lock:
+            return len(self._chains)
+
+    """
+    CLASS PRIVATE METHODS
+    """
+    def _chain(self, root):
+        """
+        SUMMARY:
+            Returns the chain of <<root>>. Raises KeyError if it was never
+            loaded.
+        """
+        with self._lock:
+            chain = self._chains.get(root)
+        if chain is None:
+            raise KeyError("No futures chain cached for: " + str(root))
+        return chain
+
+    def _rollIndex(self, root, as_of, rule, days):
+        """
+        SUMMARY:
+            Returns the position in the chain of <<root>> of the front
+            contract at <<as_of>>: the first contract whose roll date under
+            <<rule>> is after <<as_of>>.
+        """
+        as_of = np.datetime64(pd.Timestamp(as_of).date(), 'D')
+        roll_dates = self.rollDates(root, rule = rule, days = days)
+        return int(np.searchsorted(roll_dates, as_of, side = 'right'))
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def update(self, root, details):
+        """
+        SUMMARY:
+            Replaces the chain of <<root>> with the contracts of <<details>>.
+            The volume rolls set with <setVolumeRolls> are kept for the
+            contracts still in the chain; new contracts roll at expiry until
+            they are set again.
+
+        PARAMETERS:
+            root - string root symbol, e.g. 'ES', or its <chainKey>
+            details - list of ContractDetails() of <contractDetails>
+
+        RETURNS:
+            None
+        """
+        summaries = [detail.m_summary for detail in details]
+        expiries = parseExpiries([summary.m_expiry for summary in summaries])
+        order = np.argsort(expiries, kind = 'mergesort')
+        expiries = expiries[order]
+        valid = ~np.isnat(expiries)
+        order = order[valid]
+
+        def column(values):
+            return np.array(values, dtype = object)[order]
+        chain = {'local_symbols': column([summary.m_localSymbol
+                                          for summary in summaries]),
+                 'market_symbols': column([detail.m_marketName
+                                           for detail in details]),
+                 'months': parseContractMonths(
+                                [detail.m_contractMonth
+                                 for detail in details])[order],
+                 'expiries': expiries[valid],
+                 'contracts': column(summaries),
+                 'date_loaded': dt.date.today(),
+                 'roll_dates': {},
+                 'volume_rolls': {}}
+        with self._lock:
+            previous = self._chains.get(root)
+        if previous is not None and previous['volume_rolls']:
+            roll_dates = np.array([previous['volume_rolls'].get(symbol, expiry)
+                                   for (symbol, expiry)
+                                   in zip(chain['local_symbols'],
+                                          chain['expiries'])],
+                                  dtype = 'datetime64[D]')
+            chain['volume_rolls'] = previous['volume_rolls']
+            if len(roll_dates):
+                chain['roll_dates'][(ROLL_VOLUME, 0)] = \
+                    np.maximum.accumulate(roll_dates)
+        with self._lock:
+            self._chains[root] = chain
+
+    def isFresh(self, root):
+        """
+        SUMMARY:
+            Returns True if the chain of <<root>> was loaded today.
+        """
+        with self._lock:
+            chain = self._chains.get(root)
+        return chain is not None and chain['date_loaded'] == dt.date.today()
+
+    def chain(self, root, as_of = None):
+        """
+        SUMMARY:
+            Returns the chain of <<root>>.
+
+        PARAMETERS:
+            root - string root symbol or its <chainKey>
+            as_of - date; contracts expired before it are left out. None
+                    returns every contract loaded
+
+        RETURNS:
+            data - pandas DataFrame of <<CHAIN_COLUMNS>> sorted by Expiry,
+                   with Contract_Month and Expiry as datetimes
+        """
+        chain = self._chain(root)
+        start = 0
+        if as_of is not None:
+            start = int(np.searchsorted(
+                            chain['expiries'],
+                            np.datetime64(pd.Timestamp(as_of).date(), 'D')))
+        return pd.DataFrame({'Local_Symbol': chain['local_symbols'][start:],
+                             'Market_Symbol': chain['market_symbols'][start:],
+                             'Contract_Month': chain['months'][start:],
+                             'Expiry': chain['expiries'][start:],
+                             'Contract_Object': chain['contracts'][start:]},
+                            columns = CHAIN_COLUMNS)
+
+    def setVolumeRolls(self, root, volumes):
+        """
+        SUMMARY:
+            Computes the volume crossover roll dates of <<root>>: a contract
+            is rolled on the first day the next contract trades more volume.
+            Contracts without a crossover in <<volumes>> roll at expiry.
+
+        PARAMETERS:
+            root - string root symbol or its <chainKey>
+            volumes - pandas DataFrame of daily volumes indexed by date with
+                      one column per local symbol of the chain
+
+        RETURNS:
+            None
+        """
+        chain = self._chain(root)
+        volumes = volumes.sort_index().reindex(
+                        columns = list(chain['local_symbols'])).fillna(0)
+        values = volumes.values.astype(float)
+        dates = pd.to_datetime(volumes.index).values.astype('datetime64[D]')
+
+        roll_dates = chain['expiries'].copy()
+        if values.shape[1] > 1 and len(dates):
+            crossed = values[:, 1:] > values[:, :-1]
+            first = crossed.argmax(axis = 0)
+            has_crossed = crossed.any(axis = 0)
+            # the next contract is the front contract from the crossover day
+            roll_dates[:-1] = np.where(
+                                has_crossed,
+                                np.minimum(dates[first], roll_dates[:-1]),
+                                roll_dates[:-1])
+        roll_dates = np.maximum.accumulate(roll_dates)
+        with self._lock:
+            chain['roll_dates'][(ROLL_VOLUME, 0)] = roll_dates
+            chain['volume_rolls'] = dict(zip(chain['local_symbols'],
+                                             roll_dates))
+
+    def rollDates(self, root, rule = ROLL_DAYS, days = 0):
+        """
+        SUMMARY:
+            Returns the day each contract of <<root>> is rolled into the next
+            one under <<rule>>, computed once per rule.
+
+        PARAMETERS:
+            root - string root symbol or its <chainKey>
+            rule - <<ROLL_DAYS>> to roll <<days>> calendar days before
+                   expiry, or <<ROLL_VOLUME>> for the crossovers set with
+                   <setVolumeRolls>
+            days - integer number of calendar days before expiry
+
+        RETURNS:
+            roll_dates - numpy datetime64[D] array aligned with <chain>
+        """
+        chain = self._chain(root)
+        key = (rule, 0 if rule == ROLL_VOLUME else int(days))
+        with self._lock:
+            roll_dates = chain['roll_dates'].get(key)
+        if roll_dates is not None:
+            return roll_dates
+        if rule == ROLL_VOLUME:
+            raise KeyError("No volume rolls set for: " + str(root))
+        if rule != ROLL_DAYS:
+            raise ValueError("Unknown roll rule: " + str(rule))
+        roll_dates = chain['expiries'] - np.timedelta64(int(days), 'D')
+        with self._lock:
+            chain['roll_dates'][key] = roll_dates
+        return roll_dates
+
+    def rollSchedule(self, root, rule = ROLL_DAYS, days = 0):
+        """
+        SUMMARY:
+            Returns the <chain> of <<root>> with the Roll_Date of each
+            contract under <<rule>>; see <rollDates>.
+        """
+        data = self.chain(root)
+        data['Roll_Date'] = self.rollDates(root, rule = rule, days = days)
+        return data
+
+    def frontContract(self, root, as_of = None, rule = ROLL_DAYS, days = 0,
+                      offset = 0):
+        """
+        SUMMARY:
+            Returns the contract of <<root>> held at <<as_of>> under
+            <<rule>>.
+
+        PARAMETERS:
+            root - string root symbol or its <chainKey>
+            as_of - date or datetime; None is today
+            rule - see <rollDates>
+            days - see <rollDates>
+            offset - integer number of contracts after the front contract,
+                     e.g. 1 for the next contract
+
+        RETURNS:
+            contract - Contract() object; None if the chain has no contract
+                       that far out
+        """
+        if as_of is None:
+            as_of = dt.date.today()
+        index = self._rollIndex(root, as_of, rule, days) + offset
+        contracts = self._chain(root)['contracts']
+        if index >= len(contracts):
+            return None
+        return contracts[index]
+
+    def nextContract(self, root, as_of = None, rule = ROLL_DAYS, days = 0):
+        """
+        SUMMARY:
+            Returns the contract <<root>> rolls into after the
+            <frontContract> at <<as_of>>.
+        """
+        return self.frontContract(root, as_of = as_of, rule = rule,
+                                  days = days, offset = 1)
+
+    def clear(self, root = None):
+        """
+        SUMMARY:
+            Drops the chain of <<root>>, or every chain if None.
+        """
+        with self._lock:
+            if root is None:
+                self._chains = {}
+            else:
+                self._chains.pop(root, None)
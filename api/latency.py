@@ -0,0 +1,359 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/latency.py
+Created on 2026-10-18T22:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+#imports from stdlib
+import collections
+import functools
+import threading
+import time
+
+# third party imports
+import numpy as np
+import pandas as pd
+
+# kinds of latency samples
+METHOD = 'method'
+REQUEST = 'request'
+FIRST_CALLBACK = 'first_callback'
+MESSAGE = 'message'
+
+LATENCY_COLUMNS = ['Kind', 'Name', 'Count', 'Timeouts', 'Failures',
+                   'Retries', 'Mean', 'P50', 'P95', 'P99', 'Max']
+
+# upper edges in seconds of the buckets of <histogram>
+HISTOGRAM_EDGES = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5,
+                   1.0, 2.0, 5.0, 10.0, 20.0, 60.0, np.inf]
+
+
+def timed(method):
+    """
+    SUMMARY:
+        Decorator recording the duration of a broker method in the
+        <LatencyRecorder> of the broker's callback. Requests registered while
+        the method runs are recorded under its name.
+    """
+    @functools.wraps(method)
+    def timedMethod(self, *args, **kwargs):
+        recorder = self.callback.latency_Recorder
+        token = recorder.startMethod(method.__name__)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            recorder.endMethod(token)
+    return timedMethod
+
+
+class LatencyRecorder(object):
+    """
+    CLASS SUMMARY:
+        Thread safe latency instrumentation of a broker connection. Records
+        the duration of broker methods, the round trip of each request from
+        its registration to its end callback, error or time out, the delay of
+        its first callback and of the first callback of each message type.
+        Samples are kept per kind and name in bounded windows, from which
+        percentiles and histograms are computed on demand.
+
+    CLASS PROPERTIES:
+        enabled - False stops recording
+        max_samples - number of most recent samples kept per kind and name
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        _stats -
+        _record -
+
+    CLASS PUBLIC METHODS:
+        startMethod -
+        endMethod -
+        currentMethod -
+        startRequest -
+        recordMessage -
+        endRequest -
+        recordRetry -
+        summary -
+        histogram -
+        dump -
+        reset -
+    """
+    def __init__(self, max_samples = 10000):
+        """
+        SUMMARY:
+            LatencyRecorder initializer. Initializes object properties.
+
+        PARAMETERS:
+            max_samples - integer number of most recent samples kept per kind
+                          and name
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates an empty <LatencyRecorder> object.
+        """
+        super(LatencyRecorder, self).__init__()
+        self._enabled = True
+        self._max_samples = max_samples
+        # (kind, name): {'samples': deque, 'count', 'timeouts', ...}
+        self._statistics = {}
+        # request key: [name, time sent, time of first callback, types seen]
+        self._requests = {}
+        # stack of the names of the methods running on each thread
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    """
+    CLASS PROPERTIES
+    """
+    def enabled():
+        doc = "False stops recording."
+        def fget(self):
+            return self._enabled
+        def fset(self, value):
+            self._enabled = value
+        return locals()
+    enabled = property(**enabled())
+
+    def max_samples():
+        doc = "The number of most recent samples kept per kind and name."
+        def fget(self):
+            return self._max_samples
+        return locals()
+    max_samples = property(**max_samples())
+
+    """
+    CLASS PRIVATE METHODS
+    """
+    def _stats(self, kind, name):
+        """
+        SUMMARY:
+            Returns the statistics of <<kind>> and <<name>>, creating them if
+            needed. Must be called holding the lock.
+        """
+        stats = self._statistics.get((kind, name))
+        if stats is None:
+            stats = {'samples': collections.deque(maxlen = self.max_samples),
+                     'count': 0, 'timeouts': 0, 'failures': 0, 'retries': 0}
+            self._statistics[(kind, name)] = stats
+        return stats
+
+    def _record(self, kind, name, seconds):
+        """
+        SUMMARY:
+            Adds a sample of <<seconds>>. Must be called holding the lock.
+        """
+        stats = self._stats(kind, name)
+        stats['samples'].append(seconds)
+        stats['count'] += 1
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def startMethod(self, name):
+        """
+        SUMMARY:
+            Records the start of broker method <<name>> on this thread.
+
+        RETURNS:
+            token - (name, start time) to pass to <endMethod>
+        """
+        stack = getattr(self._local, 'methods', None)
+        if stack is None:
+            stack = self._local.methods = []
+        stack.append(name)
+        return (name, time.time())
+
+    def endMethod(self, token):
+        """
+        SUMMARY:
+            Records the duration of the method started with <<token>>.
+        """
+        name, time_start = token
+        self._local.methods.pop()
+        if not self.enabled:
+            return
+        with self._lock:
+            self._record(METHOD, name, time.time() - time_start)
+
+    def currentMethod(self):
+        """
+        SUMMARY:
+            Returns the name of the innermost broker method running on this
+            thread; None if there is none.
+        """
+        stack = getattr(self._local, 'methods', None)
+        if not stack:
+            return None
+        return stack[-1]
+
+    def startRequest(self, key, name = None):
+        """
+        SUMMARY:
+            Records that a request was sent under <<key>>.
+
+        PARAMETERS:
+            key - reqId or callback name the request is registered under
+            name - string name the request is recorded under; defaults to
+                   the running broker method, then to the type of its first
+                   callback
+
+        RETURNS:
+            None
+        """
+        if not self.enabled:
+            return
+        if name is None:
+            name = self.currentMethod()
+        with self._lock:
+            self._requests[key] = [name, time.time(), None, set()]
+
+    def recordMessage(self, key, message_type):
+        """
+        SUMMARY:
+            Records a callback of <<message_type>> for the request pending
+            under <<key>>. Callbacks of requests not recorded are ignored.
+        """
+        if key not in self._requests:
+            return
+        now = time.time()
+        with self._lock:
+            request = self._requests.get(key)
+            if request is None:
+                return
+            if request[2] is None:
+                request[2] = now
+                if request[0] is None:
+                    request[0] = message_type
+            if message_type not in request[3]:
+                request[3].add(message_type)
+                self._record(MESSAGE, message_type, now - request[1])
+
+    def endRequest(self, key, outcome = 'resolved'):
+        """
+        SUMMARY:
+            Records the end of the request pending under <<key>>.
+
+        PARAMETERS:
+            key - reqId or callback name the request is registered under
+            outcome - 'resolved', 'failed' or 'timed_out'
+
+        RETURNS:
+            None
+        """
+        if key not in self._requests:
+            return
+        now = time.time()
+        with self._lock:
+            request = self._requests.pop(key, None)
+            if request is None:
+                return
+            name, time_sent, time_first, message_types = request
+            if name is None:
+                name = str(key[0] if isinstance(key, tuple) else
+                           REQUEST if isinstance(key, int) else key)
+            stats = self._stats(REQUEST, name)
+            if outcome == 'timed_out':
+                stats['timeouts'] += 1
+                stats['count'] += 1
+                return
+            if outcome == 'failed':
+                stats['failures'] += 1
+            self._record(REQUEST, name, now - time_sent)
+            if time_first is not None:
+                self._record(FIRST_CALLBACK, name, time_first - time_sent)
+
+    def recordRetry(self, name = None):
+        """
+        SUMMARY:
+            Counts a retry of a request of <<name>>, e.g. after a pacing
+            violation; defaults to the running broker method.
+        """
+        if not self.enabled:
+            return
+        if name is None:
+            name = self.currentMethod()
+        with self._lock:
+            self._stats(REQUEST, name)['retries'] += 1
+
+    def summary(self, kind = None):
+        """
+        SUMMARY:
+            Returns the latency statistics.
+
+        PARAMETERS:
+            kind - string 'method', 'request', 'first_callback' or 'message'
+                   to select; None selects all kinds
+
+        RETURNS:
+            data - pandas DataFrame of <<LATENCY_COLUMNS>>, one row per kind
+                   and name, with the Count of calls or requests recorded,
+                   their Timeouts, Failures and Retries, and the Mean, P50,
+                   P95, P99 and Max in seconds of the most recent samples
+        """
+        with self._lock:
+            statistics = [(key, np.array(stats['samples'], dtype = float),
+                           stats['count'], stats['timeouts'],
+                           stats['failures'], stats['retries'])
+                          for key, stats in self._statistics.items()
+                          if kind is None or key[0] == kind]
+        rows = []
+        for (stats_kind, name), samples, count, timeouts, failures, retries \
+                in sorted(statistics, key = lambda stats: stats[0]):
+            if len(samples):
+                p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+                mean, maximum = samples.mean(), samples.max()
+            else:
+                mean = p50 = p95 = p99 = maximum = np.nan
+            rows.append((stats_kind, name, count, timeouts, failures, retries,
+                         mean, p50, p95, p99, maximum))
+        return pd.DataFrame(rows, columns = LATENCY_COLUMNS)
+
+    def histogram(self, kind, name, edges = HISTOGRAM_EDGES):
+        """
+        SUMMARY:
+            Returns the histogram of the most recent samples of <<kind>> and
+            <<name>>.
+
+        PARAMETERS:
+            kind - string kind of the samples, see <summary>
+            name - string name of the samples
+            edges - list of the increasing upper edges in seconds of the
+                    buckets
+
+        RETURNS:
+            counts - pandas Series of the number of samples per bucket,
+                     indexed by the upper edge of the bucket
+        """
+        with self._lock:
+            stats = self._statistics.get((kind, name))
+            samples = [] if stats is None else list(stats['samples'])
+        bins = np.searchsorted(edges, samples, side = 'left')
+        counts = np.bincount(bins, minlength = len(edges))[:len(edges)]
+        return pd.Series(counts, index = edges, name = name)
+
+    def dump(self, path_file):
+        """
+        SUMMARY:
+            Writes the <summary> of all kinds to <<path_file>> as csv.
+
+        RETURNS:
+            None
+        """
+        self.summary().to_csv(path_or_buf = path_file, encoding = 'utf-8',
+                              index = False)
+
+    def reset(self):
+        """
+        SUMMARY:
+            Drops every sample and count recorded so far.
+        """
+        with self._lock:
+            self._statistics = {}
+            self._requests = {}
@@ -0,0 +1,340 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/marketData.py
+Created on 2026-10-18T13:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+#imports from stdlib
+import threading
+import time
+
+# third party imports
+import numpy as np
+
+# internal/custom imports
+from registry import contractKey
+
+# IB tick types held by the latest quote
+BID_SIZE = 0
+BID_PRICE = 1
+ASK_PRICE = 2
+ASK_SIZE = 3
+LAST_PRICE = 4
+LAST_SIZE = 5
+CLOSE_PRICE = 9
+
+# IB price tick types: bid, ask, last, high, low, close and open. IB sends
+# <<NO_PRICE>> for a price it has no value for, e.g. a side pulled from the
+# book
+NO_PRICE = -1
+PRICE_FIELDS = frozenset([BID_PRICE, ASK_PRICE, LAST_PRICE, 6, 7,
+                          CLOSE_PRICE, 14])
+
+# number of IB tick types the latest values are kept for
+NUMBER_OF_FIELDS = 100
+
+TICK_DTYPE = np.dtype([('time', 'f8'), ('field', 'i2'), ('value', 'f8')])
+
+
+class TickRing(object):
+    """
+    CLASS SUMMARY:
+        Preallocated NumPy ring buffer of the ticks of one streaming market
+        data subscription. Each tick overwrites the oldest one once the buffer
+        is full; the latest value of every tick type is kept separately so
+        reading a quote never scans the buffer.
+
+    CLASS PROPERTIES:
+        size - number of ticks the buffer holds
+        count - number of ticks written since the buffer was created
+
+    CLASS SPECIAL METHODS:
+        __len__ -
+
+    CLASS PRIVATE METHODS:
+        None
+
+    CLASS PUBLIC METHODS:
+        write -
+        latest -
+        latestTime -
+        history -
+    """
+    def __init__(self, size = 1024):
+        """
+        SUMMARY:
+            TickRing initializer. Initializes object properties.
+
+        PARAMETERS:
+            size - integer number of ticks the buffer holds
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates an empty <TickRing> object.
+        """
+        super(TickRing, self).__init__()
+        self._size = size
+        self._ticks = np.zeros(size, dtype = TICK_DTYPE)
+        self._count = 0
+        self._latest = np.full(NUMBER_OF_FIELDS, np.nan)
+        self._latest_time = np.full(NUMBER_OF_FIELDS, np.nan)
+        self._lock = threading.Lock()
+
+    """
+    CLASS PROPERTIES
+    """
+    def size():
+        doc = "The number of ticks the buffer holds."
+        def fget(self):
+            return self._size
+        return locals()
+    size = property(**size())
+
+    def count():
+        doc = "The number of ticks written since the buffer was created."
+        def fget(self):
+            return self._count
+        return locals()
+    count = property(**count())
+
+    """
+    CLASS SPECIAL METHODS
+    """
+    def __len__(self):
+        return min(self._count, self._size)
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def write(self, field, value, time_received = None):
+        """
+        SUMMARY:
+            Writes one tick to the buffer.
+
+        PARAMETERS:
+            field - integer IB tick type
+            value - float price or size of the tick
+            time_received - float epoch time; defaults to now
+
+        RETURNS:
+            None
+        """
+        if time_received is None:
+            time_received = time.time()
+        with self._lock:
+            self._ticks[self._count % self._size] = (time_received, field,
+                                                     value)
+            self._count += 1
+            if 0 <= field < NUMBER_OF_FIELDS:
+                self._latest[field] = value
+                self._latest_time[field] = time_received
+
+    def latest(self, field):
+        """
+        SUMMARY:
+            Returns the latest value of tick type <<field>>; NaN if none was
+            received.
+        """
+        return self._latest[field]
+
+    def latestTime(self, field):
+        """
+        SUMMARY:
+            Returns the epoch time the latest value of tick type <<field>>
+            was received; NaN if none was received.
+        """
+        return self._latest_time[field]
+
+    def history(self):
+        """
+        SUMMARY:
+            Returns a copy of the buffered ticks, oldest first, as a NumPy
+            structured array with fields time, field and value.
+        """
+        with self._lock:
+            if self._count <= self._size:
+                return self._ticks[:self._count].copy()
+            start = self._count % self._size
+            return np.concatenate((self._ticks[start:], self._ticks[:start]))
+
+
+class SubscriptionManager(object):
+    """
+    CLASS SUMMARY:
+        Tracks the streaming market data subscriptions of a connection and
+        routes their <tickPrice> and <tickSize> callbacks into one <TickRing>
+        per subscription. Subscriptions are limited to the number of market
+        data lines of the account.
+
+    CLASS PROPERTIES:
+        max_lines - number of simultaneous subscriptions allowed
+        ring_size - number of ticks held per subscription
+
+    CLASS SPECIAL METHODS:
+        __contains__ -
+        __len__ -
+
+    CLASS PRIVATE METHODS:
+        None
+
+    CLASS PUBLIC METHODS:
+        subscribe -
+        unsubscribe -
+        tickerId -
+        ring -
+        route -
+        quote -
+    """
+    def __init__(self, max_lines = 100, ring_size = 1024):
+        """
+        SUMMARY:
+            SubscriptionManager initializer. Initializes object properties.
+
+        PARAMETERS:
+            max_lines - integer number of simultaneous subscriptions allowed
+            ring_size - integer number of ticks held per subscription
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates a <SubscriptionManager> object without subscriptions.
+        """
+        super(SubscriptionManager, self).__init__()
+        self._max_lines = max_lines
+        self._ring_size = ring_size
+        self._rings = {}
+        self._ticker_ids = {}
+        self._lock = threading.Lock()
+
+    """
+    CLASS PROPERTIES
+    """
+    def max_lines():
+        doc = "The number of simultaneous subscriptions allowed."
+        def fget(self):
+            return self._max_lines
+        def fset(self, value):
+            self._max_lines = value
+        return locals()
+    max_lines = property(**max_lines())
+
+    def ring_size():
+        doc = "The number of ticks held per subscription."
+        def fget(self):
+            return self._ring_size
+        def fset(self, value):
+            self._ring_size = value
+        return locals()
+    ring_size = property(**ring_size())
+
+    """
+    CLASS SPECIAL METHODS
+    """
+    def __contains__(self, contract):
+        return self.tickerId(contract) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rings)
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def subscribe(self, contract, ticker_id):
+        """
+        SUMMARY:
+            Registers a subscription of <<contract>> under <<ticker_id>>.
+
+        PARAMETERS:
+            contract - Contract() object
+            ticker_id - integer tickerId the subscription is requested with
+
+        RETURNS:
+            boolean - True if registered; False if all lines are in use
+        """
+        with self._lock:
+            if len(self._rings) >= self.max_lines:
+                return False
+            self._ticker_ids[contractKey(contract)] = ticker_id
+            self._rings[ticker_id] = TickRing(size = self.ring_size)
+            return True
+
+    def unsubscribe(self, contract):
+        """
+        SUMMARY:
+            Removes the subscription of <<contract>>.
+
+        RETURNS:
+            ticker_id - integer tickerId of the subscription; None if
+                        <<contract>> was not subscribed
+        """
+        with self._lock:
+            ticker_id = self._ticker_ids.pop(contractKey(contract),
+                                             None)
+            self._rings.pop(ticker_id, None)
+            return ticker_id
+
+    def tickerId(self, contract):
+        """
+        SUMMARY:
+            Returns the tickerId of the subscription of <<contract>>; None if
+            it is not subscribed.
+        """
+        with self._lock:
+            return self._ticker_ids.get(contractKey(contract))
+
+    def ring(self, ticker_id):
+        """
+        SUMMARY:
+            Returns the <TickRing> of subscription <<ticker_id>>; None if
+            there is no such subscription.
+        """
+        return self._rings.get(ticker_id)
+
+    def route(self, ticker_id, field, value):
+        """
+        SUMMARY:
+            Writes a tick to the ring buffer of subscription <<ticker_id>>.
+            A price of <<NO_PRICE>> is written as NaN, so the side it pulls
+            reads as absent; every other price, zero or negative ones
+            included, is kept.
+
+        RETURNS:
+            boolean - True if <<ticker_id>> is a subscription
+        """
+        ring = self._rings.get(ticker_id)
+        if ring is None:
+            return False
+        if field in PRICE_FIELDS and value == NO_PRICE:
+            value = np.nan
+        ring.write(field, value)
+        return True
+
+    def quote(self, ticker_id):
+        """
+        SUMMARY:
+            Returns the latest quote of subscription <<ticker_id>>.
+
+        RETURNS:
+            quote - dictionary of Bid_Price, Ask_Price, Last_Price,
+                    Close_Price, Bid_Size, Ask_Size and the epoch Time of
+                    the latest bid or ask; None if there is no such
+                    subscription
+        """
+        ring = self._rings.get(ticker_id)
+        if ring is None:
+            return None
+        return {'Bid_Price': ring.latest(BID_PRICE),
+                'Ask_Price': ring.latest(ASK_PRICE),
+                'Last_Price': ring.latest(LAST_PRICE),
+                'Close_Price': ring.latest(CLOSE_PRICE),
+                'Bid_Size': ring.latest(BID_SIZE),
+                'Ask_Size': ring.latest(ASK_SIZE),
+                'Time': np.fmax(ring.latestTime(BID_PRICE),
+                                ring.latestTime(ASK_PRICE))}
@@ -0,0 +1,353 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/orderBook.py
+Created on 2026-10-18T15:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+#imports from stdlib
+import threading
+
+# third party imports
+import numpy as np
+
+# internal/custom imports
+from registry import contractKey
+
+# updateMktDepth operations
+INSERT = 0
+UPDATE = 1
+DELETE = 2
+
+# updateMktDepth sides
+ASK = 0
+BID = 1
+
+
+class OrderBook(object):
+    """
+    CLASS SUMMARY:
+        Level 2 order book of one contract. The bid and ask ladders are NumPy
+        arrays updated in place by the insert, update and delete events of
+        <updateMktDepth>; running cumulative size and notional per level are
+        kept alongside so depth queries are single array reads.
+
+    CLASS PROPERTIES:
+        max_depth - number of levels held per side
+        bid_levels - number of bid levels in the book
+        ask_levels - number of ask levels in the book
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        _side -
+        _accumulate -
+
+    CLASS PUBLIC METHODS:
+        apply -
+        topOfBook -
+        cumulativeSize -
+        depthWeightedPrice -
+        depthWeightedMid -
+        ladder -
+    """
+    def __init__(self, max_depth = 10):
+        """
+        SUMMARY:
+            OrderBook initializer. Initializes object properties.
+
+        PARAMETERS:
+            max_depth - integer number of levels held per side; events for
+                        deeper levels are ignored
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates an empty <OrderBook> object.
+        """
+        super(OrderBook, self).__init__()
+        self._max_depth = max_depth
+        # per side: price, size, cumulative size, cumulative notional
+        self._prices = np.full((2, max_depth), np.nan)
+        self._sizes = np.zeros((2, max_depth))
+        self._cumulative_sizes = np.zeros((2, max_depth))
+        self._cumulative_notionals = np.zeros((2, max_depth))
+        self._levels = [0, 0]
+        self._lock = threading.Lock()
+
+    """
+    CLASS PROPERTIES
+    """
+    def max_depth():
+        doc = "The number of levels held per side."
+        def fget(self):
+            return self._max_depth
+        return locals()
+    max_depth = property(**max_depth())
+
+    def bid_levels():
+        doc = "The number of bid levels in the book."
+        def fget(self):
+            return self._levels[BID]
+        return locals()
+    bid_levels = property(**bid_levels())
+
+    def ask_levels():
+        doc = "The number of ask levels in the book."
+        def fget(self):
+            return self._levels[ASK]
+        return locals()
+    ask_levels = property(**ask_levels())
+
+    """
+    CLASS PRIVATE METHODS
+    """
+    def _side(self, side):
+        """
+        SUMMARY:
+            Returns the side index of <<side>>, given as 0/1 or 'ASK'/'BID'.
+        """
+        if side in ('BID', 'bid'):
+            return BID
+        if side in ('ASK', 'ask'):
+            return ASK
+        return int(side)
+
+    def _accumulate(self, side):
+        """
+        SUMMARY:
+            Recomputes the cumulative size and notional of <<side>>. Must be
+            called holding the lock.
+        """
+        levels = self._levels[side]
+        sizes = self._sizes[side, :levels]
+        np.cumsum(sizes, out = self._cumulative_sizes[side, :levels])
+        np.cumsum(sizes * self._prices[side, :levels],
+                  out = self._cumulative_notionals[side, :levels])
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def apply(self, position, operation, side, price, size):
+        """
+        SUMMARY:
+            Applies one <updateMktDepth> event to the book. An update of a
+            level beyond the book is applied as an insert after its last
+            level, so the book never holds empty levels.
+
+        PARAMETERS:
+            position - integer level of the event, 0 being the top
+            operation - 0 insert, 1 update, 2 delete
+            side - 0 ask, 1 bid
+            price - float price of the level
+            size - integer size of the level
+
+        RETURNS:
+            None
+        """
+        side = self._side(side)
+        if not 0 <= position < self.max_depth:
+            return
+        with self._lock:
+            levels = self._levels[side]
+            prices = self._prices[side]
+            sizes = self._sizes[side]
+            if operation == UPDATE and position >= levels:
+                operation = INSERT
+            if operation == INSERT:
+                position = min(position, levels)
+                prices[position + 1:] = prices[position:-1].copy()
+                sizes[position + 1:] = sizes[position:-1].copy()
+                prices[position] = price
+                sizes[position] = size
+                self._levels[side] = min(levels + 1, self.max_depth)
+            elif operation == UPDATE:
+                prices[position] = price
+                sizes[position] = size
+            elif operation == DELETE:
+                if position >= levels:
+                    return
+                prices[position:-1] = prices[position + 1:].copy()
+                sizes[position:-1] = sizes[position + 1:].copy()
+                prices[-1] = np.nan
+                sizes[-1] = 0
+                self._levels[side] = levels - 1
+            self._accumulate(side)
+
+    def topOfBook(self):
+        """
+        SUMMARY:
+            Returns the best bid and ask.
+
+        RETURNS:
+            top - dictionary of Bid_Price, Bid_Size, Ask_Price and Ask_Size;
+                  NaN prices for an empty side
+        """
+        return {'Bid_Price': self._prices[BID, 0],
+                'Bid_Size': self._sizes[BID, 0],
+                'Ask_Price': self._prices[ASK, 0],
+                'Ask_Size': self._sizes[ASK, 0]}
+
+    def cumulativeSize(self, side, levels):
+        """
+        SUMMARY:
+            Returns the total size of the best <<levels>> levels of <<side>>.
+        """
+        side = self._side(side)
+        levels = min(levels, self._levels[side])
+        if levels <= 0:
+            return 0.0
+        return self._cumulative_sizes[side, levels - 1]
+
+    def depthWeightedPrice(self, side, levels):
+        """
+        SUMMARY:
+            Returns the size weighted average price of the best <<levels>>
+            levels of <<side>>; NaN if the side is empty.
+        """
+        side = self._side(side)
+        levels = min(levels, self._levels[side])
+        if levels <= 0 or self._cumulative_sizes[side, levels - 1] <= 0:
+            return np.nan
+        return self._cumulative_notionals[side, levels - 1] / \
+               self._cumulative_sizes[side, levels - 1]
+
+    def depthWeightedMid(self, levels = 1):
+        """
+        SUMMARY:
+            Returns the mid price of the book over the best <<levels>>
+            levels: the size weighted bid and ask prices, each weighted by
+            the cumulative size of the opposite side. With one level this is
+            the micro price.
+
+        RETURNS:
+            mid - float; NaN if either side is empty
+        """
+        bid_price = self.depthWeightedPrice(BID, levels)
+        ask_price = self.depthWeightedPrice(ASK, levels)
+        bid_size = self.cumulativeSize(BID, levels)
+        ask_size = self.cumulativeSize(ASK, levels)
+        if np.isnan(bid_price) or np.isnan(ask_price):
+            return np.nan
+        return (bid_price * ask_size + ask_price * bid_size) / \
+               (bid_size + ask_size)
+
+    def ladder(self, side):
+        """
+        SUMMARY:
+            Returns copies of the prices and sizes of the levels of <<side>>,
+            best first, as two NumPy arrays.
+        """
+        side = self._side(side)
+        with self._lock:
+            levels = self._levels[side]
+            return (self._prices[side, :levels].copy(),
+                    self._sizes[side, :levels].copy())
+
+
+class DepthBookManager(object):
+    """
+    CLASS SUMMARY:
+        Tracks the market depth subscriptions of a connection and routes
+        their <updateMktDepth> and <updateMktDepthL2> callbacks into one
+        <OrderBook> per subscription.
+
+    CLASS PROPERTIES:
+        None
+
+    CLASS SPECIAL METHODS:
+        __contains__ -
+        __len__ -
+
+    CLASS PRIVATE METHODS:
+        None
+
+    CLASS PUBLIC METHODS:
+        subscribe -
+        unsubscribe -
+        tickerId -
+        book -
+        route -
+    """
+    def __init__(self):
+        """
+        SUMMARY:
+            DepthBookManager initializer. Initializes object properties.
+        """
+        super(DepthBookManager, self).__init__()
+        self._books = {}
+        self._ticker_ids = {}
+        self._lock = threading.Lock()
+
+    """
+    CLASS SPECIAL METHODS
+    """
+    def __contains__(self, contract):
+        return self.tickerId(contract) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._books)
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def subscribe(self, contract, ticker_id, max_depth = 10):
+        """
+        SUMMARY:
+            Registers a depth subscription of <<contract>> under
+            <<ticker_id>> with an empty <OrderBook>.
+        """
+        with self._lock:
+            self._ticker_ids[contractKey(contract)] = ticker_id
+            self._books[ticker_id] = OrderBook(max_depth = max_depth)
+
+    def unsubscribe(self, contract):
+        """
+        SUMMARY:
+            Removes the depth subscription of <<contract>>.
+
+        RETURNS:
+            ticker_id - integer tickerId of the subscription; None if
+                        <<contract>> was not subscribed
+        """
+        with self._lock:
+            ticker_id = self._ticker_ids.pop(contractKey(contract),
+                                             None)
+            self._books.pop(ticker_id, None)
+            return ticker_id
+
+    def tickerId(self, contract):
+        """
+        SUMMARY:
+            Returns the tickerId of the depth subscription of <<contract>>;
+            None if it is not subscribed.
+        """
+        with self._lock:
+            return self._ticker_ids.get(contractKey(contract))
+
+    def book(self, ticker_id):
+        """
+        SUMMARY:
+            Returns the <OrderBook> of subscription <<ticker_id>>; None if
+            there is no such subscription.
+        """
+        return self._books.get(ticker_id)
+
+    def route(self, ticker_id, position, operation, side, price, size):
+        """
+        SUMMARY:
+            Applies a depth event to the book of subscription <<ticker_id>>.
+
+        RETURNS:
+            boolean - True if <<ticker_id>> is a subscription
+        """
+        book = self._books.get(ticker_id)
+        if book is None:
+            return False
+        book.apply(position, operation, side, price, size)
+        return True
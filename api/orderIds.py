@@ -0,0 +1,182 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/orderIds.py
+Created on 2026-10-18T17:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+#imports from stdlib
+import os
+import threading
+
+
+class OrderIdAllocator(object):
+    """
+    CLASS SUMMARY:
+        Thread safe source of strictly increasing Interactive Brokers (IB)
+        order ids. The allocator is synced with the <nextValidId> IB sends on
+        connect and persists the end of the block of ids it reserved, so a
+        restart resumes past every id already used even before IB answers.
+        The file is only written once per <<block_size>> ids.
+
+    CLASS PROPERTIES:
+        path_file - file the last reserved id is persisted to; None disables
+                    persistence
+        block_size - number of ids reserved per write of <<path_file>>
+        current_id - the id the next <next> call returns
+        last_issued_id - the last id returned by <next>
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        _read -
+        _write -
+
+    CLASS PUBLIC METHODS:
+        sync -
+        next -
+    """
+    def __init__(self, path_file = None, first_id = 1, block_size = 100):
+        """
+        SUMMARY:
+            OrderIdAllocator initializer. Initializes object properties.
+
+        PARAMETERS:
+            path_file - string path of the file the last reserved id is
+                        persisted to; None keeps ids in memory only
+            first_id - integer id issued first if nothing is persisted and
+                       IB has not been synced
+            block_size - integer number of ids reserved per write; unused
+                         ids of the last block are skipped on restart
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates an <OrderIdAllocator> object resuming after the persisted
+            id.
+        """
+        super(OrderIdAllocator, self).__init__()
+        self._path_file = path_file
+        self._block_size = max(int(block_size), 1)
+        self._lock = threading.Lock()
+        self._last_issued_id = None
+        persisted_id = self._read()
+        if persisted_id is None:
+            self._current_id = first_id
+        else:
+            self._current_id = max(first_id, persisted_id + 1)
+        # ids below are reserved in <<path_file>>
+        self._reserved_id = self._current_id
+
+    """
+    CLASS PROPERTIES
+    """
+    def path_file():
+        doc = "The file the last reserved id is persisted to."
+        def fget(self):
+            return self._path_file
+        return locals()
+    path_file = property(**path_file())
+
+    def block_size():
+        doc = "The number of ids reserved per write of <<path_file>>."
+        def fget(self):
+            return self._block_size
+        return locals()
+    block_size = property(**block_size())
+
+    def current_id():
+        doc = "The id the next <next> call returns."
+        def fget(self):
+            return self._current_id
+        return locals()
+    current_id = property(**current_id())
+
+    def last_issued_id():
+        doc = "The last id returned by <next>; None if none was issued."
+        def fget(self):
+            return self._last_issued_id
+        return locals()
+    last_issued_id = property(**last_issued_id())
+
+    """
+    CLASS PRIVATE METHODS
+    """
+    def _read(self):
+        """
+        SUMMARY:
+            Returns the id persisted in <<path_file>>; None if there is none.
+        """
+        if self.path_file is None or not os.path.isfile(self.path_file):
+            return None
+        try:
+            with open(self.path_file, 'r') as f:
+                return int(f.read().strip())
+        except (IOError, ValueError):
+            print("Could not read the last order id from: ", self.path_file)
+            return None
+
+    def _write(self, order_id):
+        """
+        SUMMARY:
+            Persists <<order_id>> to <<path_file>>, replacing the file in
+            one step so a crash never leaves it missing or partly written.
+            Must be called holding the lock.
+        """
+        if self.path_file is None:
+            return
+        path_tmp = self.path_file + '.tmp'
+        with open(path_tmp, 'w') as f:
+            f.write(str(order_id))
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.rename(path_tmp, self.path_file)
+        except OSError:
+            # Windows does not rename over an existing file
+            os.remove(self.path_file)
+            os.rename(path_tmp, self.path_file)
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def sync(self, next_valid_id):
+        """
+        SUMMARY:
+            Moves the allocator up to <<next_valid_id>> reported by IB. The
+            allocator never moves backwards.
+
+        PARAMETERS:
+            next_valid_id - integer id from <nextValidId>
+
+        RETURNS:
+            current_id - integer id the next <next> call returns
+        """
+        with self._lock:
+            self._current_id = max(self._current_id, int(next_valid_id))
+            return self._current_id
+
+    def next(self):
+        """
+        SUMMARY:
+            Returns a new order id, greater than every id issued before.
+
+        RETURNS:
+            order_id - integer
+
+        RESULTS:
+            Reserves the next <<block_size>> ids in <<path_file>> once the
+            reserved block is used up.
+        """
+        with self._lock:
+            order_id = self._current_id
+            if order_id >= self._reserved_id:
+                self._reserved_id = order_id + self._block_size
+                self._write(self._reserved_id - 1)
+            self._current_id += 1
+            self._last_issued_id = order_id
+            return order_id
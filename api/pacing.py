@@ -0,0 +1,788 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/pacing.py
+Created on 2026-10-18T11:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+#imports from stdlib
+import collections
+import threading
+import time
+
+# internal/custom imports
+from registry import RequestFuture
+
+# longest duration, in seconds, of one historical data request per bar size
+MAX_DURATION_SECONDS = {
+    '1 secs': 1800,
+    '5 secs': 3600,
+    '10 secs': 14400,
+    '15 secs': 14400,
+    '30 secs': 28800,
+    '1 min': 86400,
+    '2 mins': 172800,
+    '3 mins': 604800,
+    '5 mins': 604800,
+    '10 mins': 604800,
+    '15 mins': 1209600,
+    '20 mins': 1209600,
+    '30 mins': 2592000,
+    '1 hour': 2592000,
+    '2 hours': 2592000,
+    '3 hours': 2592000,
+    '4 hours': 2592000,
+    '8 hours': 2592000,
+    '1 day': 31536000,
+    '1 week': 31536000,
+    '1 month': 31536000,
+}
+
+# priority lanes of <MessageGovernor>, highest priority first
+ORDER_LANE = 0
+MARKET_DATA_LANE = 1
+HISTORICAL_LANE = 2
+
+# lane of each EClientSocket message; messages not listed use the
+# <<MARKET_DATA_LANE>>
+MESSAGE_LANES = {
+    'placeOrder': ORDER_LANE,
+    'cancelOrder': ORDER_LANE,
+    'reqGlobalCancel': ORDER_LANE,
+    'reqIds': ORDER_LANE,
+    'reqOpenOrders': ORDER_LANE,
+    'reqAllOpenOrders': ORDER_LANE,
+    'reqAutoOpenOrders': ORDER_LANE,
+    'exerciseOptions': ORDER_LANE,
+    'reqHistoricalData': HISTORICAL_LANE,
+    'cancelHistoricalData': HISTORICAL_LANE,
+    'reqFundamentalData': HISTORICAL_LANE,
+    'cancelFundamentalData': HISTORICAL_LANE,
+}
+
+# messages Interactive Brokers (IB) accepts per second on a connection
+MAX_MESSAGE_RATE = 50
+
+# EClientSocket calls that send no message counted against the rate
+UNGOVERNED_CALLS = frozenset(['eConnect', 'eDisconnect', 'isConnected',
+                              'serverVersion', 'TwsConnectionTime'])
+
+
+class PacingViolation(Exception):
+    """
+    Raised by a scheduled request when Interactive Brokers (IB) rejects it
+    with a historical data pacing violation. The scheduler backs off and
+    queues the request again, up to its number of retries.
+    """
+    pass
+
+
+class HistoricalScheduler(object):
+    """
+    CLASS SUMMARY:
+        Queues historical data requests and dispatches them as fast as the
+        Interactive Brokers (IB) historical data pacing rules allow:
+            - no more than <<max_requests>> requests in any <<window>> seconds
+            - no identical request within <<identical_cooldown>> seconds
+            - no more than <<max_same_contract>> requests for the same
+              contract, exchange and tick type within
+              <<same_contract_window>> seconds
+            - no more than <<max_concurrent>> requests open at once
+        Dispatched requests run concurrently, each on its own thread. A
+        request rejected for pacing more than <<max_retries>> times fails.
+
+    CLASS PROPERTIES:
+        queue_depth - number of requests waiting to be dispatched
+        in_flight - number of dispatched requests not yet completed
+        wait_time - mean seconds recent requests waited in the queue
+        violations - number of pacing violations reported by IB
+        max_retries - number of times a request is queued again after a
+                      pacing violation
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        _delay -
+        _dispatch -
+        _run -
+        _execute -
+
+    CLASS PUBLIC METHODS:
+        submit -
+        nextSlotIn -
+        drainTime -
+    """
+    def __init__(self, max_requests = 60, window = 600,
+                 identical_cooldown = 15, max_same_contract = 6,
+                 same_contract_window = 2, max_concurrent = 50,
+                 violation_backoff = 15, max_retries = 5):
+        """
+        SUMMARY:
+            HistoricalScheduler initializer. Initializes object properties.
+
+        PARAMETERS:
+            max_requests - integer number of requests allowed per <<window>>
+            window - float number of seconds of the request window
+            identical_cooldown - float number of seconds before an identical
+                                 request may be sent again
+            max_same_contract - integer number of requests allowed for the
+                                same contract, exchange and tick type per
+                                <<same_contract_window>>
+            same_contract_window - float number of seconds
+            max_concurrent - integer number of simultaneously open requests
+            violation_backoff - float number of seconds no request is sent
+                                after IB reports a pacing violation
+            max_retries - integer number of times a request is queued again
+                          after a pacing violation before its future fails
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates a <HistoricalScheduler> object. The dispatcher thread is
+            started on the first <submit>.
+        """
+        super(HistoricalScheduler, self).__init__()
+        self._max_requests = max_requests
+        self._window = window
+        self._identical_cooldown = identical_cooldown
+        self._max_same_contract = max_same_contract
+        self._same_contract_window = same_contract_window
+        self._max_concurrent = max_concurrent
+        self._violation_backoff = violation_backoff
+        self._max_retries = max_retries
+
+        self._queue = collections.deque()
+        self._sent = collections.deque() # (time, key, contract_key)
+        self._in_flight = 0
+        self._violations = 0
+        self._backoff_until = 0.0
+        self._wait_times = collections.deque(maxlen = 100)
+
+        self._condition = threading.Condition()
+        self._thread = None
+
+    """
+    CLASS PROPERTIES
+    """
+    def queue_depth():
+        doc = "The number of requests waiting to be dispatched."
+        def fget(self):
+            with self._condition:
+                return len(self._queue)
+        return locals()
+    queue_depth = property(**queue_depth())
+
+    def in_flight():
+        doc = "The number of dispatched requests not yet completed."
+        def fget(self):
+            with self._condition:
+                return self._in_flight
+        return locals()
+    in_flight = property(**in_flight())
+
+    def wait_time():
+        doc = "The mean number of seconds recent requests waited in the queue."
+        def fget(self):
+            with self._condition:
+                if not self._wait_times:
+                    return 0.0
+                return sum(self._wait_times) / len(self._wait_times)
+        return locals()
+    wait_time = property(**wait_time())
+
+    def violations():
+        doc = "The number of pacing violations reported by IB."
+        def fget(self):
+            return self._violations
+        return locals()
+    violations = property(**violations())
+
+    def max_retries():
+        doc = """
+                The number of times a request is queued again after a pacing
+                violation before its future fails.
+            """
+        def fget(self):
+            return self._max_retries
+        return locals()
+    max_retries = property(**max_retries())
+
+    """
+    CLASS PRIVATE METHODS
+    """
+    def _delay(self, job, now):
+        """
+        SUMMARY:
+            Returns the number of seconds until <<job>> may be dispatched
+            under the pacing rules; 0 if it may be dispatched now.
+            Must be called holding the condition lock.
+        """
+        while self._sent and self._sent[0][0] <= now - self._window:
+            self._sent.popleft()
+
+        delays = [self._backoff_until - now]
+        if self._in_flight >= self._max_concurrent:
+            # woken up by <_execute> once a request completes
+            delays.append(self._window)
+        if len(self._sent) >= self._max_requests:
+            delays.append(self._sent[0][0] + self._window - now)
+
+        same_contract = [sent_time for (sent_time, key, contract_key)
+                         in self._sent
+                         if contract_key == job['contract_key'] and
+                         sent_time > now - self._same_contract_window]
+        if len(same_contract) >= self._max_same_contract:
+            delays.append(same_contract[0] + self._same_contract_window - now)
+
+        identical = [sent_time for (sent_time, key, contract_key)
+                     in self._sent if key == job['key']]
+        if identical:
+            delays.append(identical[-1] + self._identical_cooldown - now)
+        return max(max(delays), 0)
+
+    def _dispatch(self, job, now):
+        """
+        SUMMARY:
+            Records <<job>> against the pacing windows and runs it on its own
+            thread. Must be called holding the condition lock.
+        """
+        self._sent.append((now, job['key'], job['contract_key']))
+        self._in_flight += 1
+        self._wait_times.append(now - job['time_submitted'])
+        worker = threading.Thread(target = self._execute, args = (job,))
+        worker.daemon = True
+        worker.start()
+
+    def _run(self):
+        """
+        SUMMARY:
+            Dispatcher loop. Dispatches queued requests in order, letting a
+            request pass one that is held back by a per-request rule.
+        """
+        with self._condition:
+            while True:
+                if not self._queue:
+                    self._condition.wait()
+                    continue
+                now = time.time()
+                next_delay = None
+                for job in list(self._queue):
+                    delay = self._delay(job, now)
+                    if delay == 0:
+                        self._queue.remove(job)
+                        self._dispatch(job, now)
+                        next_delay = 0
+                        break
+                    if next_delay is None or delay < next_delay:
+                        next_delay = delay
+                if next_delay:
+                    self._condition.wait(next_delay)
+
+    def _execute(self, job):
+        """
+        SUMMARY:
+            Runs the request function of <<job>> and resolves its future.
+            Requests rejected for pacing are queued again after a back off,
+            up to <<max_retries>> times.
+        """
+        violation = None
+        try:
+            result = job['request'](**job['kwargs'])
+        except PacingViolation as error:
+            violation = error
+        except Exception as error:
+            job['future'].fail(error)
+        else:
+            job['future'].resolve(result)
+
+        requeue = False
+        with self._condition:
+            self._in_flight -= 1
+            if violation is not None:
+                self._violations += 1
+                self._backoff_until = time.time() + self._violation_backoff
+                requeue = job['retries'] < self._max_retries
+                if requeue:
+                    job['retries'] += 1
+                    self._queue.appendleft(job)
+                    print("Historical data pacing violation.\nBacking off",
+                          self._violation_backoff, "seconds.")
+            self._condition.notify()
+        if violation is not None and not requeue:
+            print("Historical data pacing violation.\nGiving up after",
+                  self._max_retries, "retries.")
+            job['future'].fail(violation)
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def submit(self, request, key = None, contract_key = None, **kwargs):
+        """
+        SUMMARY:
+            Queues a historical data request.
+
+        PARAMETERS:
+            request - function sending the request and blocking until it
+                      completes; called with <<kwargs>>. It returns the
+                      request's data or raises <PacingViolation>
+            key - hashable identifying identical requests
+            contract_key - hashable identifying the contract, exchange and
+                           tick type of the request
+            kwargs - keyword arguments passed to <<request>>
+
+        RETURNS:
+            future - <RequestFuture> resolved with the result of <<request>>
+
+        RESULTS:
+            Starts the dispatcher thread if it is not running.
+        """
+        future = RequestFuture(key = key)
+        job = {'request': request, 'key': key, 'contract_key': contract_key,
+               'kwargs': kwargs, 'future': future,
+               'time_submitted': time.time(), 'retries': 0}
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target = self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._queue.append(job)
+            self._condition.notify()
+        return future
+
+    def nextSlotIn(self):
+        """
+        SUMMARY:
+            Returns the number of seconds until the request window allows
+            another request to be sent.
+        """
+        with self._condition:
+            now = time.time()
+            while self._sent and self._sent[0][0] <= now - self._window:
+                self._sent.popleft()
+            delay = self._backoff_until - now
+            if len(self._sent) >= self._max_requests:
+                delay = max(delay, self._sent[0][0] + self._window - now)
+            return max(delay, 0)
+
+    def drainTime(self, count = 0):
+        """
+        SUMMARY:
+            Returns an estimate of the number of seconds until the queued
+            requests, and <<count>> more queued behind them, are dispatched
+            under the request window.
+        """
+        with self._condition:
+            pending = len(self._queue) + count
+        windows = max(pending - 1, 0) // self._max_requests
+        return self.nextSlotIn() + windows * self._window
+
+
+class MessageRateLimiter(object):
+    """
+    CLASS SUMMARY:
+        Token bucket keeping the messages sent to Interactive Brokers (IB)
+        under its message rate ceiling of <<MAX_MESSAGE_RATE>> messages per
+        second. The bucket starts full, so the <<burst>> plus the <<rate>>
+        is what may be sent in any one second. Callers block in <acquire>
+        only as long as the bucket needs to refill.
+
+    CLASS PROPERTIES:
+        rate - number of messages allowed per second
+        burst - number of messages that may be sent at once
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        _refill -
+
+    CLASS PUBLIC METHODS:
+        acquire -
+    """
+    def __init__(self, rate = 45, burst = None):
+        """
+        SUMMARY:
+            MessageRateLimiter initializer. Initializes object properties.
+
+        PARAMETERS:
+            rate - float number of messages allowed per second
+            burst - float number of messages that may be sent at once;
+                    defaults to what <<rate>> leaves of
+                    <<MAX_MESSAGE_RATE>>, at least 1
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates a full <MessageRateLimiter> object.
+        """
+        super(MessageRateLimiter, self).__init__()
+        if burst is None:
+            burst = max(MAX_MESSAGE_RATE - rate, 1)
+        self._rate = float(rate)
+        self._burst = float(burst)
+        self._tokens = self._burst
+        self._time_refilled = time.time()
+        self._lock = threading.Lock()
+
+    """
+    CLASS PROPERTIES
+    """
+    def rate():
+        doc = "The number of messages allowed per second."
+        def fget(self):
+            return self._rate
+        return locals()
+    rate = property(**rate())
+
+    def burst():
+        doc = "The number of messages that may be sent at once."
+        def fget(self):
+            return self._burst
+        return locals()
+    burst = property(**burst())
+
+    """
+    CLASS PRIVATE METHODS
+    """
+    def _refill(self, now):
+        """
+        SUMMARY:
+            Adds the tokens earned since the last refill. Must be called
+            holding the lock.
+        """
+        self._tokens = min(self._burst,
+                           self._tokens + (now - self._time_refilled) *
+                           self._rate)
+        self._time_refilled = now
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def acquire(self, count = 1):
+        """
+        SUMMARY:
+            Blocks until <<count>> messages may be sent and takes their
+            tokens.
+
+        PARAMETERS:
+            count - number of messages about to be sent
+
+        RETURNS:
+            waited - float number of seconds blocked
+        """
+        time_start = time.time()
+        while True:
+            with self._lock:
+                now = time.time()
+                self._refill(now)
+                if self._tokens >= count:
+                    self._tokens -= count
+                    return now - time_start
+                delay = (count - self._tokens) / self._rate
+            time.sleep(delay)
+
+
+class MessageGovernor(MessageRateLimiter):
+    """
+    CLASS SUMMARY:
+        <MessageRateLimiter> shared by every message sent on a connection,
+        with priority lanes. A message waits while a message of a higher
+        priority lane is waiting, so orders and cancels never queue behind
+        market data requests, nor market data behind historical backfills.
+
+    CLASS PROPERTIES:
+        waiting - dictionary of {lane: number of callers waiting}
+        sent - dictionary of {lane: number of messages sent}
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        None
+
+    CLASS PUBLIC METHODS:
+        acquire -
+    """
+    def __init__(self, rate = 45, burst = None, lanes = 3):
+        """
+        SUMMARY:
+            MessageGovernor initializer. Initializes object properties.
+
+        PARAMETERS:
+            rate - float number of messages allowed per second
+            burst - float number of messages that may be sent at once;
+                    see <MessageRateLimiter>
+            lanes - integer number of priority lanes
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates a full <MessageGovernor> object.
+        """
+        super(MessageGovernor, self).__init__(rate = rate, burst = burst)
+        self._condition = threading.Condition(self._lock)
+        self._waiting = [0] * lanes
+        self._sent = [0] * lanes
+
+    """
+    CLASS PROPERTIES
+    """
+    def waiting():
+        doc = "The number of callers waiting in each lane."
+        def fget(self):
+            with self._lock:
+                return dict(enumerate(self._waiting))
+        return locals()
+    waiting = property(**waiting())
+
+    def sent():
+        doc = "The number of messages sent in each lane."
+        def fget(self):
+            with self._lock:
+                return dict(enumerate(self._sent))
+        return locals()
+    sent = property(**sent())
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def acquire(self, count = 1, lane = MARKET_DATA_LANE):
+        """
+        SUMMARY:
+            Blocks until <<count>> messages may be sent in <<lane>> and takes
+            their tokens.
+
+        PARAMETERS:
+            count - number of messages about to be sent
+            lane - integer priority lane; lower lanes go first
+
+        RETURNS:
+            waited - float number of seconds blocked
+        """
+        time_start = time.time()
+        with self._condition:
+            self._waiting[lane] += 1
+            try:
+                while True:
+                    now = time.time()
+                    self._refill(now)
+                    if any(self._waiting[:lane]):
+                        # a higher lane takes the next token
+                        self._condition.wait(1.0 / self._rate)
+                        continue
+                    if self._tokens >= count:
+                        self._tokens -= count
+                        self._sent[lane] += count
+                        return now - time_start
+                    self._condition.wait((count - self._tokens) / self._rate)
+            finally:
+                self._waiting[lane] -= 1
+                self._condition.notify_all()
+
+
+class GovernedClient(object):
+    """
+    CLASS SUMMARY:
+        Proxy of an EClientSocket passing every outbound message through a
+        <MessageGovernor> in the lane of <<MESSAGE_LANES>> before it is
+        written to the socket.
+
+    CLASS PROPERTIES:
+        client - the EClientSocket messages are sent on
+        governor - the <MessageGovernor> pacing the messages
+
+    CLASS SPECIAL METHODS:
+        __getattr__ -
+
+    CLASS PRIVATE METHODS:
+        None
+
+    CLASS PUBLIC METHODS:
+        None
+    """
+    def __init__(self, client, governor = None):
+        """
+        SUMMARY:
+            GovernedClient initializer. Initializes object properties.
+
+        PARAMETERS:
+            client - EClientSocket object
+            governor - <MessageGovernor>; a new one at the default rate if
+                       None
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates a <GovernedClient> object.
+        """
+        super(GovernedClient, self).__init__()
+        self._client = client
+        self._governor = MessageGovernor() if governor is None else governor
+
+    """
+    CLASS PROPERTIES
+    """
+    def client():
+        doc = "The EClientSocket messages are sent on."
+        def fget(self):
+            return self._client
+        return locals()
+    client = property(**client())
+
+    def governor():
+        doc = "The <MessageGovernor> pacing the messages."
+        def fget(self):
+            return self._governor
+        return locals()
+    governor = property(**governor())
+
+    """
+    CLASS SPECIAL METHODS
+    """
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        attribute = getattr(self._client, name)
+        if name in UNGOVERNED_CALLS or not callable(attribute):
+            return attribute
+        lane = MESSAGE_LANES.get(name, MARKET_DATA_LANE)
+        governor = self._governor
+
+        def governed(*args, **kwargs):
+            governor.acquire(lane = lane)
+            return attribute(*args, **kwargs)
+        # later calls skip <__getattr__>
+        setattr(self, name, governed)
+        return governed
+
+
+class MarketDataLines(object):
+    """
+    CLASS SUMMARY:
+        Keeps the snapshot market data requests open at once within the
+        market data lines of the account left free by its streaming
+        subscriptions. Requests beyond them are queued and sent, in order,
+        as open snapshots end, instead of being rejected by Interactive
+        Brokers (IB) with error 101.
+
+    CLASS PROPERTIES:
+        in_use - number of snapshots sent and not yet ended
+        queue_depth - number of snapshots waiting for a line
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        _sendQueued -
+
+    CLASS PUBLIC METHODS:
+        submit -
+        release -
+    """
+    def __init__(self, free_lines):
+        """
+        SUMMARY:
+            MarketDataLines initializer. Initializes object properties.
+
+        PARAMETERS:
+            free_lines - function returning the number of market data lines
+                         not used by streaming subscriptions
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates a <MarketDataLines> object with no snapshot open.
+        """
+        super(MarketDataLines, self).__init__()
+        self._free_lines = free_lines
+        self._open = set()
+        self._queue = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    """
+    CLASS PROPERTIES
+    """
+    def in_use():
+        doc = "The number of snapshots sent and not yet ended."
+        def fget(self):
+            with self._lock:
+                return len(self._open)
+        return locals()
+    in_use = property(**in_use())
+
+    def queue_depth():
+        doc = "The number of snapshots waiting for a line."
+        def fget(self):
+            with self._lock:
+                return len(self._queue)
+        return locals()
+    queue_depth = property(**queue_depth())
+
+    """
+    CLASS PRIVATE METHODS
+    """
+    def _sendQueued(self):
+        """
+        SUMMARY:
+            Sends the queued snapshots the free lines allow, on the calling
+            thread.
+        """
+        while True:
+            with self._lock:
+                if not self._queue or \
+                        len(self._open) >= self._free_lines():
+                    return
+                key, send = self._queue.popitem(last = False)
+                self._open.add(key)
+            try:
+                send()
+            except Exception:
+                self.release(key)
+                raise
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def submit(self, key, send):
+        """
+        SUMMARY:
+            Calls <<send>> to send snapshot <<key>> now if a line is free,
+            or once one is; lines are taken in the order requests arrive.
+
+        PARAMETERS:
+            key - hashable identifying the snapshot, e.g. its tickerId
+            send - function sending the snapshot request
+
+        RETURNS:
+            None
+        """
+        with self._lock:
+            self._queue[key] = send
+        self._sendQueued()
+
+    def release(self, key):
+        """
+        SUMMARY:
+            Frees the line of snapshot <<key>>, or drops it from the queue
+            if it was never sent, and sends the snapshots queued behind it
+            on a separate thread, so the callback thread ending a snapshot
+            is never held by the message governor.
+        """
+        with self._lock:
+            self._queue.pop(key, None)
+            if key not in self._open:
+                return
+            self._open.discard(key)
+            if not self._queue:
+                return
+        sender = threading.Thread(target = self._sendQueued)
+        sender.daemon = True
+        sender.start()
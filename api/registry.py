@@ -0,0 +1,871 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/registry.py
+Created on 2026-10-18T10:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+#imports from stdlib
+import collections
+import threading
+import time
+
+# IB rights of an option contract, as given in full
+RIGHTS = {'CALL': 'C', 'PUT': 'P'}
+
+
+def contractKey(contract, exchange = True):
+    """
+    SUMMARY:
+        Returns the tuple of the fields identifying the instrument of
+        <<contract>>: symbol, secType, exchange, currency, expiry, strike,
+        right and multiplier. Unset fields, strikes and rights are
+        normalized so every Contract() describing the same instrument has
+        the same key.
+
+    PARAMETERS:
+        contract - Contract() object
+        exchange - False to leave the exchange out of the key
+
+    RETURNS:
+        key - tuple
+    """
+    right = (contract.m_right or '').upper()
+    key = (contract.m_symbol or '', contract.m_secType or '',
+           contract.m_exchange or '', contract.m_currency or '',
+           (contract.m_expiry or '')[:8], float(contract.m_strike or 0),
+           RIGHTS.get(right, right), str(contract.m_multiplier or ''))
+    if not exchange:
+        return key[:2] + key[3:]
+    return key
+
+
+class RequestFuture(object):
+    """
+    CLASS SUMMARY:
+        Completion handle for a single request made through the
+        Interactive Brokers (IB) API. The handle is resolved by the <IBWrapper>
+        when the callback ending the request (e.g. <positionEnd>,
+        <contractDetailsEnd>) arrives.
+
+    CLASS PROPERTIES:
+        key - the reqId (or callback name) the request is registered under
+        result - the value the request was resolved with
+        error - the error the request failed with; None if it succeeded
+        time_created - epoch time the request was registered
+        time_resolved - epoch time the request was resolved
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        None
+
+    CLASS PUBLIC METHODS:
+        done -
+        wait -
+        resolve -
+        fail -
+        addDoneCallback -
+    """
+    def __init__(self, key = None):
+        """
+        SUMMARY:
+            RequestFuture initializer. Initializes object properties.
+
+        PARAMETERS:
+            key - the reqId or callback name identifying the request
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates an unresolved <RequestFuture> object.
+        """
+        super(RequestFuture, self).__init__()
+        self._key = key
+        self._result = None
+        self._error = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._done_callbacks = []
+        self._time_created = time.time()
+        self._time_resolved = None
+
+    """
+    CLASS PROPERTIES
+    """
+    def key():
+        doc = "The reqId or callback name the request is registered under."
+        def fget(self):
+            return self._key
+        return locals()
+    key = property(**key())
+
+    def result():
+        doc = "The value the request was resolved with."
+        def fget(self):
+            return self._result
+        return locals()
+    result = property(**result())
+
+    def error():
+        doc = "The error the request failed with; None if it succeeded."
+        def fget(self):
+            return self._error
+        return locals()
+    error = property(**error())
+
+    def time_created():
+        doc = "The epoch time the request was registered."
+        def fget(self):
+            return self._time_created
+        return locals()
+    time_created = property(**time_created())
+
+    def time_resolved():
+        doc = "The epoch time the request was resolved; None if pending."
+        def fget(self):
+            return self._time_resolved
+        return locals()
+    time_resolved = property(**time_resolved())
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def done(self):
+        """
+        SUMMARY:
+            Returns True if the request has been resolved.
+        """
+        return self._event.is_set()
+
+    def wait(self, time_out = None):
+        """
+        SUMMARY:
+            Blocks until the request is resolved or <<time_out>> seconds pass.
+
+        PARAMETERS:
+            time_out - float number of seconds to wait; None waits forever
+
+        RETURNS:
+            boolean - True if the request was resolved in time
+        """
+        return self._event.wait(time_out)
+
+    def resolve(self, result = None):
+        """
+        SUMMARY:
+            Resolves the request and runs any registered done callbacks.
+
+        PARAMETERS:
+            result - value handed to waiters and done callbacks
+
+        RETURNS:
+            None
+        """
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._result = result
+            self._time_resolved = time.time()
+            self._event.set()
+            done_callbacks = list(self._done_callbacks)
+            self._done_callbacks = []
+        for done_callback in done_callbacks:
+            done_callback(self)
+
+    def fail(self, error):
+        """
+        SUMMARY:
+            Resolves the request as failed with <<error>> so waiters return
+            immediately instead of running into their time out.
+        """
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._error = error
+        self.resolve(None)
+
+    def addDoneCallback(self, done_callback):
+        """
+        SUMMARY:
+            Registers <<done_callback>> to be called with this future once it
+            is resolved. Called immediately if already resolved.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._done_callbacks.append(done_callback)
+                return
+        done_callback(self)
+
+
+class RequestRegistry(object):
+    """
+    CLASS SUMMARY:
+        Thread safe registry of pending <RequestFuture> objects keyed by
+        reqId. Callbacks without a reqId (<positionEnd>, <accountDownloadEnd>)
+        are keyed by the callback name.
+
+    CLASS PROPERTIES:
+        recorder - <LatencyRecorder> the requests are timed by; None
+                   disables timing
+
+    CLASS SPECIAL METHODS:
+        __contains__ -
+        __len__ -
+
+    CLASS PRIVATE METHODS:
+        None
+
+    CLASS PUBLIC METHODS:
+        register -
+        resolve -
+        fail -
+        release -
+        pending -
+    """
+    def __init__(self, recorder = None):
+        """
+        SUMMARY:
+            RequestRegistry initializer. Initializes object properties.
+
+        PARAMETERS:
+            recorder - <LatencyRecorder> timing each request from its
+                       registration to its resolution, failure or release
+        """
+        super(RequestRegistry, self).__init__()
+        self._requests = {}
+        self._recorder = recorder
+        self._lock = threading.Lock()
+
+    """
+    CLASS PROPERTIES
+    """
+    def recorder():
+        doc = "The <LatencyRecorder> the requests are timed by."
+        def fget(self):
+            return self._recorder
+        def fset(self, value):
+            self._recorder = value
+        return locals()
+    recorder = property(**recorder())
+
+    """
+    CLASS SPECIAL METHODS
+    """
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._requests
+
+    def __len__(self):
+        with self._lock:
+            return len(self._requests)
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def register(self, key):
+        """
+        SUMMARY:
+            Registers a pending request under <<key>>. If a request is already
+            pending under the same key its future is shared.
+
+        PARAMETERS:
+            key - reqId or callback name
+
+        RETURNS:
+            future - <RequestFuture>
+        """
+        with self._lock:
+            future = self._requests.get(key)
+            if future is not None and not future.done():
+                return future
+            future = RequestFuture(key = key)
+            self._requests[key] = future
+        if self.recorder is not None:
+            self.recorder.startRequest(key)
+        return future
+
+    def resolve(self, key, result = None):
+        """
+        SUMMARY:
+            Resolves and removes the request pending under <<key>>.
+            Callbacks for requests that were never registered are ignored.
+
+        RETURNS:
+            boolean - True if a pending request was resolved
+        """
+        with self._lock:
+            future = self._requests.pop(key, None)
+        if future is None:
+            return False
+        if self.recorder is not None:
+            self.recorder.endRequest(key, 'resolved')
+        future.resolve(result)
+        return True
+
+    def fail(self, key, error):
+        """
+        SUMMARY:
+            Fails and removes the request pending under <<key>>.
+
+        RETURNS:
+            boolean - True if a pending request was failed
+        """
+        with self._lock:
+            future = self._requests.pop(key, None)
+        if future is None:
+            return False
+        if self.recorder is not None:
+            self.recorder.endRequest(key, 'failed')
+        future.fail(error)
+        return True
+
+    def release(self, key):
+        """
+        SUMMARY:
+            Removes the request pending under <<key>> without resolving it,
+            e.g. after its waiter timed out.
+        """
+        with self._lock:
+            future = self._requests.pop(key, None)
+        if future is not None and self.recorder is not None:
+            self.recorder.endRequest(key, 'timed_out')
+
+    def pending(self):
+        """
+        SUMMARY:
+            Returns a list of the keys of all pending requests.
+        """
+        with self._lock:
+            return list(self._requests.keys())
+
+
+class BufferRegistry(object):
+    """
+    CLASS SUMMARY:
+        Thread safe registry of bounded per-request callback buffers.
+        Buffers are keyed by the name of the <IBWrapper> attribute they
+        replace (e.g. 'tick_Price') and the tickerId/reqId of the request,
+        so concurrent requests never share (or clear) each other's data.
+        The most recently closed keys are remembered, so callbacks arriving
+        after a request ended are dropped instead of accumulating in the
+        shared <IBWrapper> attribute.
+
+    CLASS PROPERTIES:
+        max_length - default maximum number of items held per buffer
+        max_closed - number of closed keys remembered
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        None
+
+    CLASS PUBLIC METHODS:
+        open -
+        route -
+        claims -
+        read -
+        close -
+        keys -
+    """
+    def __init__(self, max_length = 10000, max_closed = 10000):
+        """
+        SUMMARY:
+            BufferRegistry initializer. Initializes object properties.
+
+        PARAMETERS:
+            max_length - default maximum number of items held per buffer;
+                         the oldest items are dropped past this length
+            max_closed - number of closed keys whose late callbacks are
+                         dropped; the oldest are forgotten past this number
+        """
+        super(BufferRegistry, self).__init__()
+        self._max_length = max_length
+        self._max_closed = max_closed
+        self._buffers = {}
+        # (name, key) of recently closed buffers, oldest first
+        self._closed = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    """
+    CLASS PROPERTIES
+    """
+    def max_length():
+        doc = "The default maximum number of items held per buffer."
+        def fget(self):
+            return self._max_length
+        def fset(self, value):
+            self._max_length = value
+        return locals()
+    max_length = property(**max_length())
+
+    def max_closed():
+        doc = "The number of closed keys whose late callbacks are dropped."
+        def fget(self):
+            return self._max_closed
+        return locals()
+    max_closed = property(**max_closed())
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def open(self, name, key, max_length = None):
+        """
+        SUMMARY:
+            Opens an empty buffer for the <<name>> callback of request <<key>>.
+
+        PARAMETERS:
+            name - string name of the callback attribute, e.g. 'tick_Price'
+            key - tickerId or reqId of the request
+            max_length - maximum number of items held; defaults to
+                         <<max_length>>
+
+        RETURNS:
+            None
+        """
+        if max_length is None:
+            max_length = self.max_length
+        with self._lock:
+            self._closed.pop((name, key), None)
+            self._buffers[(name, key)] = collections.deque(maxlen = max_length)
+
+    def route(self, name, key, item):
+        """
+        SUMMARY:
+            Appends <<item>> to the buffer of request <<key>> if one is open;
+            drops it if the buffer of <<key>> was closed.
+
+        RETURNS:
+            boolean - True if the item was routed to a request buffer or
+                      dropped as a late callback of a closed request
+        """
+        with self._lock:
+            buffer = self._buffers.get((name, key))
+            if buffer is None:
+                return (name, key) in self._closed
+            buffer.append(item)
+            return True
+
+    def claims(self, name, key):
+        """
+        SUMMARY:
+            Returns True if the buffer of request <<key>> is open or was
+            closed, i.e. the request belongs to a caller and its other
+            callbacks should not reach the shared <IBWrapper> attributes.
+        """
+        with self._lock:
+            return (name, key) in self._buffers or (name, key) in self._closed
+
+    def read(self, name, key):
+        """
+        SUMMARY:
+            Returns a list copy of the items buffered for request <<key>>.
+        """
+        with self._lock:
+            buffer = self._buffers.get((name, key))
+            if buffer is None:
+                return []
+            return list(buffer)
+
+    def close(self, name, key):
+        """
+        SUMMARY:
+            Closes the buffer of request <<key>>; later callbacks for the
+            request are dropped.
+
+        RETURNS:
+            items - list of the items buffered for the request
+        """
+        with self._lock:
+            buffer = self._buffers.pop((name, key), None)
+            if buffer is not None:
+                self._closed[(name, key)] = True
+                while len(self._closed) > self.max_closed:
+                    self._closed.popitem(last = False)
+        if buffer is None:
+            return []
+        return list(buffer)
+
+    def keys(self, name = None):
+        """
+        SUMMARY:
+            Returns the request keys with an open buffer, optionally only
+            those of the <<name>> callback.
+        """
+        with self._lock:
+            return [key for (buffer_name, key) in self._buffers
+                    if name is None or buffer_name == name]
+
+
+class TickerRegistry(object):
+    """
+    CLASS SUMMARY:
+        Registry of the contracts a broker requests data for, keyed by a
+        stable tickerId and indexed by symbol, conId and canonical contract
+        key so every lookup is a hash lookup. Registering a contract that is
+        already known returns its existing tickerId instead of adding a
+        duplicate entry.
+
+        Behaves like the {tickerId: (symbol, Contract())} dictionary it
+        replaces.
+
+    CLASS PROPERTIES:
+        current_id - tickerId assigned to the next new contract
+
+    CLASS SPECIAL METHODS:
+        __contains__ -
+        __len__ -
+        __iter__ -
+        __getitem__ -
+        __delitem__ -
+
+    CLASS PRIVATE METHODS:
+        None
+
+    CLASS PUBLIC METHODS:
+        add -
+        remove -
+        idsBySymbol -
+        idByConId -
+        idByContract -
+        keys -
+        values -
+        items -
+    """
+    def __init__(self, first_id = 1):
+        """
+        SUMMARY:
+            TickerRegistry initializer. Initializes object properties.
+
+        PARAMETERS:
+            first_id - integer tickerId assigned to the first contract
+        """
+        super(TickerRegistry, self).__init__()
+        self._tickers = {}
+        self._by_symbol = {}
+        self._by_con_id = {}
+        self._con_ids = {}
+        self._by_key = {}
+        self._current_id = first_id
+        self._lock = threading.RLock()
+
+    """
+    CLASS PROPERTIES
+    """
+    def current_id():
+        doc = "The tickerId assigned to the next new contract."
+        def fget(self):
+            return self._current_id
+        def fset(self, value):
+            self._current_id = value
+        return locals()
+    current_id = property(**current_id())
+
+    """
+    CLASS SPECIAL METHODS
+    """
+    def __contains__(self, ticker_id):
+        return ticker_id in self._tickers
+
+    def __len__(self):
+        return len(self._tickers)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __getitem__(self, ticker_id):
+        return self._tickers[ticker_id]
+
+    def __delitem__(self, ticker_id):
+        if self.remove(ticker_id) is None:
+            raise KeyError(ticker_id)
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def add(self, contract):
+        """
+        SUMMARY:
+            Registers <<contract>> under a new tickerId unless it is already
+            registered by conId or contract key.
+
+        PARAMETERS:
+            contract - Contract() object
+
+        RETURNS:
+            ticker_id - integer tickerId of <<contract>>
+        """
+        key = contractKey(contract)
+        with self._lock:
+            ticker_id = self.idByContract(contract)
+            if ticker_id is not None:
+                if contract.m_conId:
+                    self._by_con_id[contract.m_conId] = ticker_id
+                    self._con_ids[ticker_id].add(contract.m_conId)
+                return ticker_id
+
+            while self._current_id in self._tickers:
+                self._current_id += 1
+            ticker_id = self._current_id
+            self._current_id += 1
+
+            self._tickers[ticker_id] = (contract.m_symbol, contract)
+            self._by_symbol.setdefault(contract.m_symbol, []).append(ticker_id)
+            self._by_key[key] = ticker_id
+            self._con_ids[ticker_id] = set()
+            if contract.m_conId:
+                self._by_con_id[contract.m_conId] = ticker_id
+                self._con_ids[ticker_id].add(contract.m_conId)
+            return ticker_id
+
+    def remove(self, ticker_id):
+        """
+        SUMMARY:
+            Removes the contract registered under <<ticker_id>>.
+
+        RETURNS:
+            ticker - (symbol, Contract()) tuple removed; None if
+                     <<ticker_id>> is not registered
+        """
+        with self._lock:
+            ticker = self._tickers.pop(ticker_id, None)
+            if ticker is None:
+                return None
+            symbol, contract = ticker
+            ticker_ids = self._by_symbol.get(symbol, [])
+            if ticker_id in ticker_ids:
+                ticker_ids.remove(ticker_id)
+            if not ticker_ids:
+                self._by_symbol.pop(symbol, None)
+            self._by_key.pop(contractKey(contract), None)
+            for con_id in self._con_ids.pop(ticker_id, ()):
+                self._by_con_id.pop(con_id, None)
+            return ticker
+
+    def idsBySymbol(self, symbol):
+        """
+        SUMMARY:
+            Returns a list of the tickerIds of the contracts of <<symbol>>.
+        """
+        with self._lock:
+            return list(self._by_symbol.get(symbol, []))
+
+    def idByConId(self, con_id):
+        """
+        SUMMARY:
+            Returns the tickerId of the contract with <<con_id>>; None if it
+            is not registered.
+        """
+        return self._by_con_id.get(con_id)
+
+    def idByContract(self, contract):
+        """
+        SUMMARY:
+            Returns the tickerId <<contract>> is registered under, matched by
+            conId if it is set and by contract key otherwise; None if it is
+            not registered.
+        """
+        ticker_id = None
+        if contract.m_conId:
+            ticker_id = self._by_con_id.get(contract.m_conId)
+        if ticker_id is None:
+            ticker_id = self._by_key.get(contractKey(contract))
+        return ticker_id
+
+    def keys(self):
+        """
+        SUMMARY:
+            Returns a list of the registered tickerIds.
+        """
+        with self._lock:
+            return list(self._tickers.keys())
+
+    def values(self):
+        """
+        SUMMARY:
+            Returns a list of the registered (symbol, Contract()) tuples.
+        """
+        with self._lock:
+            return list(self._tickers.values())
+
+    def items(self):
+        """
+        SUMMARY:
+            Returns a list of the registered (tickerId, (symbol, Contract()))
+            tuples.
+        """
+        with self._lock:
+            return list(self._tickers.items())
+
+
+class SingleFlight(object):
+    """
+    CLASS SUMMARY:
+        Coalesces identical concurrent requests. The first caller of a key
+        sends the request; every caller of the same key while it is in
+        flight, or within <<freshness>> seconds after it succeeded, shares
+        its <RequestFuture> instead of sending another. Requests are sent
+        outside the lock, so only callers of the same key wait on a send.
+
+    CLASS PROPERTIES:
+        freshness - seconds a succeeded request is shared after it resolved
+        coalesced - number of calls served by a shared request
+
+    CLASS SPECIAL METHODS:
+        __len__ -
+
+    CLASS PRIVATE METHODS:
+        _isShared -
+        _prune -
+
+    CLASS PUBLIC METHODS:
+        submit -
+        forget -
+        discard -
+        clear -
+    """
+    def __init__(self, freshness = 0, max_entries = 10000):
+        """
+        SUMMARY:
+            SingleFlight initializer. Initializes object properties.
+
+        PARAMETERS:
+            freshness - float number of seconds a succeeded request is shared
+                        after it resolved; 0 shares in flight requests only
+            max_entries - integer number of requests kept before resolved
+                          ones that are no longer fresh are dropped
+        """
+        super(SingleFlight, self).__init__()
+        self._freshness = freshness
+        self._max_entries = max_entries
+        self._futures = {}
+        # key: threading.Event set once the request of the key was sent
+        self._sending = {}
+        self._coalesced = 0
+        self._lock = threading.Lock()
+
+    """
+    CLASS PROPERTIES
+    """
+    def freshness():
+        doc = "The seconds a succeeded request is shared after it resolved."
+        def fget(self):
+            return self._freshness
+        def fset(self, value):
+            self._freshness = value
+        return locals()
+    freshness = property(**freshness())
+
+    def coalesced():
+        doc = "The number of calls served by a shared request."
+        def fget(self):
+            return self._coalesced
+        return locals()
+    coalesced = property(**coalesced())
+
+    """
+    CLASS SPECIAL METHODS
+    """
+    def __len__(self):
+        with self._lock:
+            return len(self._futures)
+
+    """
+    CLASS PRIVATE METHODS
+    """
+    def _isShared(self, future, now):
+        """
+        SUMMARY:
+            Returns True if <<future>> is in flight or succeeded within
+            <<freshness>> seconds.
+        """
+        if not future.done():
+            return True
+        return future.error is None and \
+               now - future.time_resolved <= self.freshness
+
+    def _prune(self, now):
+        """
+        SUMMARY:
+            Drops the requests no longer shared. Must be called holding the
+            lock.
+        """
+        self._futures = dict((key, future) for (key, future)
+                             in self._futures.items()
+                             if self._isShared(future, now))
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def submit(self, key, request):
+        """
+        SUMMARY:
+            Returns the <RequestFuture> shared under <<key>>, calling
+            <<request>> only if no request of <<key>> is shared.
+
+        PARAMETERS:
+            key - hashable identifying identical requests
+            request - function sending the request and returning its
+                      <RequestFuture>; called outside the lock, while other
+                      callers of <<key>> wait for it to return
+
+        RETURNS:
+            future - the <RequestFuture> returned by <<request>>, by this or
+                     an earlier call
+        """
+        while True:
+            with self._lock:
+                future = self._futures.get(key)
+                if future is not None and self._isShared(future, time.time()):
+                    self._coalesced += 1
+                    return future
+                sending = self._sending.get(key)
+                if sending is None:
+                    sending = threading.Event()
+                    self._sending[key] = sending
+                    break
+            sending.wait()
+
+        try:
+            future = request()
+            with self._lock:
+                self._futures[key] = future
+                if len(self._futures) > self._max_entries:
+                    self._prune(time.time())
+        finally:
+            with self._lock:
+                self._sending.pop(key, None)
+            sending.set()
+        return future
+
+    def forget(self, key):
+        """
+        SUMMARY:
+            Stops sharing the request of <<key>>; the next call sends anew.
+        """
+        with self._lock:
+            self._futures.pop(key, None)
+
+    def discard(self, future):
+        """
+        SUMMARY:
+            Stops sharing <<future>> under whichever key it was shared, e.g.
+            because it resolved with partial data.
+        """
+        with self._lock:
+            self._futures = dict((key, shared) for (key, shared)
+                                 in self._futures.items()
+                                 if shared is not future)
+
+    def clear(self):
+        """
+        SUMMARY:
+            Stops sharing every request.
+        """
+        with self._lock:
+            self._futures = {}
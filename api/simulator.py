@@ -0,0 +1,922 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+api/simulator.py
+Created on 2026-10-18T21:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+#imports from stdlib
+import collections
+import datetime as dt
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+# third party imports
+import numpy as np
+from ib.ext.CommissionReport import CommissionReport
+from ib.ext.Contract import Contract
+from ib.ext.ContractDetails import ContractDetails
+from ib.ext.Execution import Execution
+
+# internal/custom imports
+from broker import IBBrokerConnection
+
+# seconds of each unit of a historical data duration string
+DURATION_SECONDS = {'S': 1, 'D': 86400, 'W': 604800, 'M': 2592000,
+                    'Y': 31536000}
+
+# seconds of each unit of a historical data bar size string
+BAR_SIZE_SECONDS = {'sec': 1, 'secs': 1, 'min': 60, 'mins': 60,
+                    'hour': 3600, 'hours': 3600, 'day': 86400, 'days': 86400,
+                    'week': 604800, 'month': 2592000}
+
+# bars sent at most per historical data request
+MAX_BARS = 100000
+
+PACING_VIOLATION = 'Historical Market Data Service error message:' \
+                   'Historical data request pacing violation'
+
+
+class SimulatedMarket(object):
+    """
+    CLASS SUMMARY:
+        Deterministic stand-in for the Interactive Brokers (IB) gateway and
+        the market behind it, shared by the <SimulatedClientSocket> objects
+        connected to it. Holds <<instruments>> stocks named SIM0000,
+        SIM0001, ... with prices drawn from <<seed>>, an account with
+        positions in the first <<positions>> of them, and the executions of
+        the orders it filled. Every callback is delivered <<latency>> plus
+        up to <<jitter>> seconds after its request; historical data requests
+        beyond <<max_historical_requests>> per <<historical_window>> seconds
+        are rejected with a pacing violation, and market data requests
+        beyond <<max_market_data_lines>> open at once with error 101.
+
+    CLASS PROPERTIES:
+        instruments - number of simulated instruments
+        symbols - list of the symbols of the instruments
+        account_name - name of the simulated account
+        latency - seconds every callback is delayed
+        jitter - maximum seconds of random delay added to <<latency>>
+        tick_interval - seconds between streaming ticks; None sends only
+                        the first quote of a subscription
+        max_historical_requests - historical data requests allowed per
+                                  <<historical_window>>
+        historical_window - seconds of the historical data pacing window
+        max_market_data_lines - market data requests allowed open at once;
+                                None allows any number
+        executions - list of (Contract(), Execution()) of the filled orders
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        None
+
+    CLASS PUBLIC METHODS:
+        index -
+        contract -
+        contractDetails -
+        quote -
+        step -
+        bars -
+        allowHistoricalRequest -
+        openLine -
+        closeLine -
+        nextOrderId -
+        positions -
+        fill -
+        accountValues -
+    """
+    def __init__(self, instruments = 1000, positions = 10, seed = 0,
+                 latency = 0.0, jitter = 0.0, tick_interval = None,
+                 max_historical_requests = 60, historical_window = 600,
+                 max_market_data_lines = None, account_name = 'DU603835'):
+        """
+        SUMMARY:
+            SimulatedMarket initializer. Initializes object properties.
+
+        PARAMETERS:
+            instruments - integer number of simulated instruments
+            positions - integer number of instruments held, 100 shares each
+            seed - integer seed of the prices, bars and delays
+            latency - float seconds every callback is delayed
+            jitter - float maximum seconds of random delay added
+            tick_interval - float seconds between streaming ticks; None
+                            sends only the first quote of a subscription
+            max_historical_requests - integer historical data requests
+                                      allowed per <<historical_window>>
+            historical_window - float seconds of the pacing window
+            max_market_data_lines - integer market data requests allowed
+                                    open at once; None allows any number
+            account_name - string name of the simulated account
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates a <SimulatedMarket> object.
+        """
+        super(SimulatedMarket, self).__init__()
+        self._seed = seed
+        self._random = np.random.RandomState(seed)
+        self._symbols = ['SIM%04d' % index for index in range(instruments)]
+        self._indices = dict((symbol, index) for (index, symbol)
+                             in enumerate(self._symbols))
+        self._prices = np.round(self._random.uniform(10, 500, instruments), 2)
+        self._closes = np.round(self._prices * self._random.uniform(
+                                    0.97, 1.03, instruments), 2)
+        self._spreads = np.maximum(np.round(self._prices * 0.0005, 2), 0.01)
+
+        self._account_name = account_name
+        self._positions = dict((index, [100, float(self._closes[index])])
+                               for index in range(min(positions,
+                                                      instruments)))
+        self._executions = []
+        self._next_order_id = 1
+        self._next_execution_id = 1
+
+        self._latency = latency
+        self._jitter = jitter
+        self._tick_interval = tick_interval
+        self._max_historical_requests = max_historical_requests
+        self._historical_window = historical_window
+        self._historical_requests = collections.deque()
+        self._max_market_data_lines = max_market_data_lines
+        # (socket, tickerId) of the open market data requests
+        self._lines = set()
+
+        self._lock = threading.Lock()
+
+    """
+    CLASS PROPERTIES
+    """
+    def instruments():
+        doc = "The number of simulated instruments."
+        def fget(self):
+            return len(self._symbols)
+        return locals()
+    instruments = property(**instruments())
+
+    def symbols():
+        doc = "The list of the symbols of the instruments."
+        def fget(self):
+            return list(self._symbols)
+        return locals()
+    symbols = property(**symbols())
+
+    def account_name():
+        doc = "The name of the simulated account."
+        def fget(self):
+            return self._account_name
+        return locals()
+    account_name = property(**account_name())
+
+    def latency():
+        doc = "The seconds every callback is delayed."
+        def fget(self):
+            return self._latency
+        def fset(self, value):
+            self._latency = value
+        return locals()
+    latency = property(**latency())
+
+    def jitter():
+        doc = "The maximum seconds of random delay added to <<latency>>."
+        def fget(self):
+            return self._jitter
+        def fset(self, value):
+            self._jitter = value
+        return locals()
+    jitter = property(**jitter())
+
+    def tick_interval():
+        doc = "The seconds between streaming ticks."
+        def fget(self):
+            return self._tick_interval
+        def fset(self, value):
+            self._tick_interval = value
+        return locals()
+    tick_interval = property(**tick_interval())
+
+    def max_historical_requests():
+        doc = "The historical data requests allowed per window."
+        def fget(self):
+            return self._max_historical_requests
+        def fset(self, value):
+            self._max_historical_requests = value
+        return locals()
+    max_historical_requests = property(**max_historical_requests())
+
+    def historical_window():
+        doc = "The seconds of the historical data pacing window."
+        def fget(self):
+            return self._historical_window
+        def fset(self, value):
+            self._historical_window = value
+        return locals()
+    historical_window = property(**historical_window())
+
+    def max_market_data_lines():
+        doc = "The market data requests allowed open at once."
+        def fget(self):
+            return self._max_market_data_lines
+        def fset(self, value):
+            self._max_market_data_lines = value
+        return locals()
+    max_market_data_lines = property(**max_market_data_lines())
+
+    def executions():
+        doc = "The list of (Contract(), Execution()) of the filled orders."
+        def fget(self):
+            with self._lock:
+                return list(self._executions)
+        return locals()
+    executions = property(**executions())
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def index(self, contract):
+        """
+        SUMMARY:
+            Returns the instrument index of <<contract>>; None if its symbol
+            is not simulated, or if it is a futures contract expired before
+            today and <<m_includeExpired>> is not set, as IB then finds no
+            security definition.
+        """
+        if contract.m_secType == 'FUT' and not contract.m_includeExpired \
+                and str(contract.m_expiry or '')[:8] < \
+                    dt.date.today().strftime('%Y%m%d'):
+            return None
+        return self._indices.get(contract.m_symbol)
+
+    def contract(self, index):
+        """
+        SUMMARY:
+            Returns the fully qualified Contract() of instrument <<index>>.
+        """
+        contract = Contract()
+        contract.m_conId = 100000 + index
+        contract.m_symbol = self._symbols[index]
+        contract.m_localSymbol = self._symbols[index]
+        contract.m_secType = 'STK'
+        contract.m_exchange = 'SMART'
+        contract.m_primaryExch = 'SIM'
+        contract.m_currency = 'USD'
+        contract.m_expiry = ''
+        contract.m_tradingClass = self._symbols[index]
+        return contract
+
+    def contractDetails(self, index):
+        """
+        SUMMARY:
+            Returns the ContractDetails() of instrument <<index>>.
+        """
+        details = ContractDetails()
+        details.m_summary = self.contract(index)
+        details.m_marketName = self._symbols[index]
+        details.m_contractMonth = ''
+        details.m_minTick = 0.01
+        return details
+
+    def quote(self, index):
+        """
+        SUMMARY:
+            Returns the current quote of instrument <<index>>.
+
+        RETURNS:
+            quote - dictionary of {IB tick type: value} of the bid, ask,
+                    last and close prices and sizes
+        """
+        with self._lock:
+            price = float(self._prices[index])
+            spread = float(self._spreads[index])
+            close = float(self._closes[index])
+        return {1: round(price - spread / 2, 2),
+                2: round(price + spread / 2, 2), 4: price, 9: close,
+                0: 100, 3: 100, 5: 100, 8: 10000}
+
+    def step(self, volatility = 0.001):
+        """
+        SUMMARY:
+            Moves every price one random step.
+        """
+        with self._lock:
+            self._prices = np.round(self._prices * np.exp(
+                                self._random.normal(0, volatility,
+                                                    len(self._prices))), 2)
+
+    def bars(self, index, end, duration, bar_seconds):
+        """
+        SUMMARY:
+            Returns the bars of instrument <<index>> over <<duration>>
+            seconds before <<end>>. The bars of an instrument and bar size
+            are the same on every request.
+
+        RETURNS:
+            bars - list of (datetime.datetime, open, high, low, close,
+                   volume, count, WAP) tuples, oldest first
+        """
+        end_seconds = int(time.mktime(end.timetuple()))
+        end_seconds -= end_seconds % bar_seconds
+        count = int(min(max(duration // bar_seconds, 1), MAX_BARS))
+        starts = end_seconds - bar_seconds * np.arange(count, 0, -1)
+        random = np.random.RandomState((self._seed * 1000003 + index * 7919 +
+                                        bar_seconds) % 2 ** 32)
+        # a walk anchored at the epoch so overlapping requests agree
+        steps = random.normal(0, 0.0005, 4096)
+        phases = (starts // bar_seconds) % len(steps)
+        closes = self._closes[index] * np.exp(np.cumsum(steps)[phases] -
+                                              steps.sum() / 2)
+        opens = closes * (1 - steps[phases])
+        highs = np.maximum(opens, closes) * (1 + np.abs(steps[phases]))
+        lows = np.minimum(opens, closes) * (1 - np.abs(steps[phases]))
+        volumes = (1000 + (phases * 37) % 500).astype(int)
+        return [(dt.datetime.fromtimestamp(start), round(o, 2), round(h, 2),
+                 round(l, 2), round(c, 2), int(v), int(v // 10),
+                 round((o + h + l + c) / 4, 2))
+                for (start, o, h, l, c, v) in zip(starts, opens, highs, lows,
+                                                  closes, volumes)]
+
+    def allowHistoricalRequest(self):
+        """
+        SUMMARY:
+            Records a historical data request and returns False if it
+            violates the pacing window.
+        """
+        now = time.time()
+        with self._lock:
+            requests = self._historical_requests
+            while requests and requests[0] <= now - self.historical_window:
+                requests.popleft()
+            if len(requests) >= self.max_historical_requests:
+                return False
+            requests.append(now)
+            return True
+
+    def openLine(self, key):
+        """
+        SUMMARY:
+            Records the market data request <<key>> as open and returns
+            False if every market data line is in use.
+        """
+        with self._lock:
+            if self.max_market_data_lines is not None and \
+                    len(self._lines) >= self.max_market_data_lines:
+                return False
+            self._lines.add(key)
+            return True
+
+    def closeLine(self, key):
+        """
+        SUMMARY:
+            Frees the market data line of request <<key>>.
+        """
+        with self._lock:
+            self._lines.discard(key)
+
+    def nextOrderId(self):
+        """
+        SUMMARY:
+            Returns the next valid order id of the gateway.
+        """
+        with self._lock:
+            return self._next_order_id
+
+    def positions(self):
+        """
+        SUMMARY:
+            Returns the positions of the account.
+
+        RETURNS:
+            positions - list of (Contract(), position, average cost)
+        """
+        with self._lock:
+            positions = [(index, quantity, cost) for (index, (quantity, cost))
+                         in sorted(self._positions.items()) if quantity != 0]
+        return [(self.contract(index), quantity, cost)
+                for (index, quantity, cost) in positions]
+
+    def fill(self, order_id, index, order, client_id = 0):
+        """
+        SUMMARY:
+            Fills <<order>> on instrument <<index>> if it is marketable.
+
+        RETURNS:
+            fill - (Execution(), CommissionReport()); None if the order
+                   rests
+        """
+        quote = self.quote(index)
+        buy = order.m_action == 'BUY'
+        price = quote[2] if buy else quote[1]
+        if order.m_orderType == 'LMT' and \
+           ((buy and order.m_lmtPrice < price) or
+            (not buy and order.m_lmtPrice > price)):
+            return None
+        quantity = int(order.m_totalQuantity)
+        with self._lock:
+            self._next_order_id = max(self._next_order_id, order_id + 1)
+            execution_id = '%08d.01' % self._next_execution_id
+            self._next_execution_id += 1
+            position = self._positions.setdefault(index, [0, price])
+            signed = quantity if buy else -quantity
+            if position[0] + signed != 0 and \
+               (position[0] == 0 or (position[0] > 0) == buy):
+                position[1] = (position[0] * position[1] + signed * price) / \
+                              (position[0] + signed)
+            position[0] += signed
+
+        execution = Execution()
+        execution.m_orderId = order_id
+        execution.m_clientId = client_id
+        execution.m_execId = execution_id
+        execution.m_time = dt.datetime.now().strftime('%Y%m%d  %H:%M:%S')
+        execution.m_acctNumber = self.account_name
+        execution.m_exchange = 'SIM'
+        execution.m_side = 'BOT' if buy else 'SLD'
+        execution.m_shares = quantity
+        execution.m_price = price
+        execution.m_permId = order_id
+        execution.m_cumQty = quantity
+        execution.m_avgPrice = price
+        execution.m_orderRef = getattr(order, 'm_orderRef', None)
+
+        report = CommissionReport()
+        report.m_execId = execution_id
+        report.m_commission = max(1.0, 0.005 * quantity)
+        report.m_currency = 'USD'
+        report.m_realizedPNL = 0.0
+
+        with self._lock:
+            self._executions.append((self.contract(index), execution))
+        return execution, report
+
+    def accountValues(self):
+        """
+        SUMMARY:
+            Returns the account values of the account.
+
+        RETURNS:
+            values - list of (tag, value, currency)
+        """
+        positions = self.positions()
+        market_value = sum(quantity * self.quote(self.index(contract))[4]
+                           for (contract, quantity, cost) in positions)
+        cash = 1000000.0
+        return [('NetLiquidation', '%.2f' % (cash + market_value), 'USD'),
+                ('TotalCashValue', '%.2f' % cash, 'USD'),
+                ('BuyingPower', '%.2f' % (4 * (cash + market_value)), 'USD'),
+                ('AvailableFunds', '%.2f' % cash, 'USD'),
+                ('GrossPositionValue', '%.2f' % abs(market_value), 'USD'),
+                ('AccountType', 'INDIVIDUAL', '')]
+
+
+class SimulatedClientSocket(object):
+    """
+    CLASS SUMMARY:
+        Stand-in for the EClientSocket used by <IBBroker>. Requests are
+        answered from a <SimulatedMarket> and the callbacks are delivered to
+        the IBWrapper in due time order by one reader thread, as the
+        EReader of a real connection does.
+
+    CLASS PROPERTIES:
+        market - the <SimulatedMarket> answering the requests
+        client_id - client id the socket is connected with
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        _send -
+        _run -
+        _sendQuote -
+        _sendTicks -
+        _sendRealtimeBar -
+        _endSnapshot -
+
+    CLASS PUBLIC METHODS:
+        eConnect -
+        eDisconnect -
+        isConnected -
+        reqIds -
+        reqCurrentTime -
+        reqPositions -
+        cancelPositions -
+        reqAccountUpdates -
+        reqAccountSummary -
+        cancelAccountSummary -
+        reqContractDetails -
+        reqHistoricalData -
+        cancelHistoricalData -
+        reqMktData -
+        cancelMktData -
+        reqMktDepth -
+        cancelMktDepth -
+        reqRealTimeBars -
+        cancelRealTimeBars -
+        reqExecutions -
+        placeOrder -
+        cancelOrder -
+    """
+    def __init__(self, callback, market = None):
+        """
+        SUMMARY:
+            SimulatedClientSocket initializer. Initializes object properties.
+
+        PARAMETERS:
+            callback - IBWrapper() the callbacks are delivered to
+            market - <SimulatedMarket>; a new default one if None
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates a disconnected <SimulatedClientSocket> object. The
+            reader thread is started on <eConnect>.
+        """
+        super(SimulatedClientSocket, self).__init__()
+        self._callback = callback
+        self._market = SimulatedMarket() if market is None else market
+        self._client_id = None
+        self._connected = False
+        self._random = np.random.RandomState(0)
+        self._sequence = itertools.count()
+        self._events = []
+        self._last_due = 0.0
+        self._condition = threading.Condition()
+        self._thread = None
+        # tickerIds of the streaming subscriptions
+        self._streams = set()
+        self._resting_orders = {}
+
+    """
+    CLASS PROPERTIES
+    """
+    def market():
+        doc = "The <SimulatedMarket> answering the requests."
+        def fget(self):
+            return self._market
+        return locals()
+    market = property(**market())
+
+    def client_id():
+        doc = "The client id the socket is connected with."
+        def fget(self):
+            return self._client_id
+        return locals()
+    client_id = property(**client_id())
+
+    """
+    CLASS PRIVATE METHODS
+    """
+    def _send(self, callback, *args, **kwargs):
+        """
+        SUMMARY:
+            Schedules callback(*args) after the latency of the market, or
+            <<delay>> more seconds if given. Callbacks are delivered in the
+            order they are scheduled, unless <<ordered>> is False as for the
+            timers of streaming subscriptions.
+        """
+        delay = kwargs.get('delay', 0.0) + self.market.latency
+        if self.market.jitter:
+            delay += self._random.uniform(0, self.market.jitter)
+        with self._condition:
+            due = time.time() + delay
+            if kwargs.get('ordered', True):
+                # a socket delivers in order, so no message overtakes another
+                due = self._last_due = max(self._last_due, due)
+            heapq.heappush(self._events, (due, next(self._sequence), callback,
+                                          args))
+            self._condition.notify()
+
+    def _run(self):
+        """
+        SUMMARY:
+            Reader loop. Delivers each scheduled callback once it is due.
+        """
+        while True:
+            with self._condition:
+                while self._connected and (not self._events or
+                                           self._events[0][0] > time.time()):
+                    if self._events:
+                        self._condition.wait(self._events[0][0] - time.time())
+                    else:
+                        self._condition.wait()
+                if not self._connected:
+                    return
+                due, _, callback, args = heapq.heappop(self._events)
+            try:
+                callback(*args)
+            except Exception:
+                print("Simulated callback failed:\n", traceback.format_exc())
+
+    def _sendQuote(self, ticker_id, index):
+        """
+        SUMMARY:
+            Schedules the <tickPrice> and <tickSize> of the quote of
+            instrument <<index>>.
+        """
+        quote = self.market.quote(index)
+        for field in (1, 2, 4, 9):
+            self._send(self._callback.tickPrice, ticker_id, field,
+                       quote[field], 0)
+        for field in (0, 3, 5, 8):
+            self._send(self._callback.tickSize, ticker_id, field,
+                       quote[field])
+
+    def _sendTicks(self, ticker_id, index):
+        """
+        SUMMARY:
+            Sends the quote of a streaming subscription and schedules the
+            next one after <<tick_interval>> seconds.
+        """
+        if ticker_id not in self._streams or not self._connected:
+            return
+        quote = self.market.quote(index)
+        for field in (1, 2, 4):
+            self._callback.tickPrice(ticker_id, field, quote[field], 0)
+        self._send(self._sendTicks, ticker_id, index,
+                   delay = self.market.tick_interval, ordered = False)
+
+    def _sendRealtimeBar(self, ticker_id, index):
+        """
+        SUMMARY:
+            Sends the 5 second <realtimeBar> that just closed and schedules
+            the next one.
+        """
+        if ticker_id not in self._streams or not self._connected:
+            return
+        now = int(time.time())
+        price = self.market.quote(index)[4]
+        self._callback.realtimeBar(ticker_id, now - now % 5 - 5, price, price,
+                                   price, price, 100, price, 10)
+        self._send(self._sendRealtimeBar, ticker_id, index,
+                   delay = 5 - time.time() % 5, ordered = False)
+
+    def _endSnapshot(self, ticker_id):
+        """
+        SUMMARY:
+            Frees the market data line of snapshot <<ticker_id>> and sends
+            its <tickSnapshotEnd>.
+        """
+        self.market.closeLine((id(self), ticker_id))
+        self._callback.tickSnapshotEnd(ticker_id)
+
+    """
+    CLASS PUBLIC METHODS
+    """
+    def eConnect(self, host = '', port = 7497, clientId = 0):
+        """
+        SUMMARY:
+            Connects the socket and schedules <nextValidId>.
+        """
+        with self._condition:
+            self._connected = True
+            self._client_id = clientId
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target = self._run)
+                self._thread.daemon = True
+                self._thread.start()
+        self._send(self._callback.managedAccounts, self.market.account_name)
+        self._send(self._callback.nextValidId, self.market.nextOrderId())
+
+    def eDisconnect(self):
+        """
+        SUMMARY:
+            Disconnects the socket, dropping the undelivered callbacks.
+        """
+        with self._condition:
+            self._connected = False
+            self._events = []
+            self._streams.clear()
+            self._condition.notify()
+        if self._thread is not None and \
+           self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def isConnected(self):
+        return self._connected
+
+    def reqIds(self, numIds):
+        self._send(self._callback.nextValidId, self.market.nextOrderId())
+
+    def reqCurrentTime(self):
+        self._send(self._callback.currentTime, int(time.time()))
+
+    def reqPositions(self):
+        for contract, quantity, cost in self.market.positions():
+            self._send(self._callback.position, self.market.account_name,
+                       contract, quantity, cost)
+        self._send(self._callback.positionEnd)
+
+    def cancelPositions(self):
+        pass
+
+    def reqAccountUpdates(self, subscribe, acctCode):
+        if not subscribe:
+            return
+        account = self.market.account_name
+        for tag, value, currency in self.market.accountValues():
+            self._send(self._callback.updateAccountValue, tag, value,
+                       currency, account)
+        for contract, quantity, cost in self.market.positions():
+            price = self.market.quote(self.market.index(contract))[4]
+            self._send(self._callback.updatePortfolio, contract, quantity,
+                       price, quantity * price, cost,
+                       quantity * (price - cost), 0.0, account)
+        self._send(self._callback.accountDownloadEnd, account)
+
+    def reqAccountSummary(self, reqId, group, tags):
+        tags = set(tag for tag in tags.split(',') if tag)
+        for tag, value, currency in self.market.accountValues():
+            if not tags or tag in tags:
+                self._send(self._callback.accountSummary, reqId,
+                           self.market.account_name, tag, value, currency)
+        self._send(self._callback.accountSummaryEnd, reqId)
+
+    def cancelAccountSummary(self, reqId):
+        pass
+
+    def reqContractDetails(self, reqId, contract):
+        index = self.market.index(contract)
+        if index is None:
+            self._send(self._callback.error, reqId, 200,
+                       'No security definition has been found for the '
+                       'request')
+            return
+        self._send(self._callback.contractDetails, reqId,
+                   self.market.contractDetails(index))
+        self._send(self._callback.contractDetailsEnd, reqId)
+
+    def reqHistoricalData(self, tickerId, contract, endDateTime, durationStr,
+                          barSizeSetting, whatToShow, useRTH, formatDate):
+        index = self.market.index(contract)
+        if index is None:
+            self._send(self._callback.error, tickerId, 162,
+                       'Historical Market Data Service error message:'
+                       'No market data permissions')
+            return
+        if not self.market.allowHistoricalRequest():
+            self._send(self._callback.error, tickerId, 162, PACING_VIOLATION)
+            return
+
+        if endDateTime:
+            end = dt.datetime.strptime(endDateTime[:17], '%Y%m%d %H:%M:%S')
+        else:
+            end = dt.datetime.now()
+        number, unit = durationStr.split()
+        duration = int(number) * DURATION_SECONDS[unit]
+        number, unit = barSizeSetting.split()
+        bar_seconds = int(number) * BAR_SIZE_SECONDS[unit]
+        date_format = '%Y%m%d' if bar_seconds >= 86400 else \
+                      '%Y%m%d  %H:%M:%S'
+
+        bars = self.market.bars(index, end, duration, bar_seconds)
+        for (date, open, high, low, close, volume, count, wap) in bars:
+            self._send(self._callback.historicalData, tickerId,
+                       date.strftime(date_format), open, high, low, close,
+                       volume, count, wap, False)
+        start = bars[0][0] if bars else end
+        self._send(self._callback.historicalData, tickerId,
+                   'finished-' + start.strftime('%Y%m%d  %H:%M:%S') + '-' +
+                   end.strftime('%Y%m%d  %H:%M:%S'), -1, -1, -1, -1, -1, -1,
+                   -1, False)
+
+    def cancelHistoricalData(self, tickerId):
+        pass
+
+    def reqMktData(self, tickerId, contract, genericTickList, snapshot):
+        index = self.market.index(contract)
+        if index is None:
+            self._send(self._callback.error, tickerId, 200,
+                       'No security definition has been found for the '
+                       'request')
+            return
+        if not self.market.openLine((id(self), tickerId)):
+            self._send(self._callback.error, tickerId, 101,
+                       'Max number of tickers has been reached')
+            return
+        self._sendQuote(tickerId, index)
+        if snapshot:
+            self._send(self._endSnapshot, tickerId)
+        elif self.market.tick_interval:
+            self._streams.add(tickerId)
+            self._send(self._sendTicks, tickerId, index,
+                       delay = self.market.tick_interval, ordered = False)
+
+    def cancelMktData(self, tickerId):
+        self._streams.discard(tickerId)
+        self.market.closeLine((id(self), tickerId))
+
+    def reqMktDepth(self, tickerId, contract, numRows):
+        index = self.market.index(contract)
+        if index is None:
+            return
+        quote = self.market.quote(index)
+        for position in range(numRows):
+            self._send(self._callback.updateMktDepth, tickerId, position, 0,
+                       1, round(quote[1] - 0.01 * position, 2),
+                       100 * (position + 1))
+            self._send(self._callback.updateMktDepth, tickerId, position, 0,
+                       0, round(quote[2] + 0.01 * position, 2),
+                       100 * (position + 1))
+
+    def cancelMktDepth(self, tickerId):
+        pass
+
+    def reqRealTimeBars(self, tickerId, contract, barSize, whatToShow,
+                        useRTH):
+        index = self.market.index(contract)
+        if index is None:
+            return
+        self._streams.add(tickerId)
+        self._send(self._sendRealtimeBar, tickerId, index,
+                   delay = 5 - time.time() % 5, ordered = False)
+
+    def cancelRealTimeBars(self, tickerId):
+        self._streams.discard(tickerId)
+
+    def reqExecutions(self, reqId, filter):
+        symbol = getattr(filter, 'm_symbol', None)
+        for contract, execution in self.market.executions:
+            if not symbol or contract.m_symbol == symbol:
+                self._send(self._callback.execDetails, reqId, contract,
+                           execution)
+        self._send(self._callback.execDetailsEnd, reqId)
+
+    def placeOrder(self, id, contract, order):
+        index = self.market.index(contract)
+        if index is None:
+            self._send(self._callback.error, id, 200,
+                       'No security definition has been found for the '
+                       'request')
+            return
+        quantity = order.m_totalQuantity
+        self._send(self._callback.orderStatus, id, 'Submitted', 0, quantity,
+                   0.0, id, 0, 0.0, self.client_id, '')
+        fill = self.market.fill(id, index, order, client_id = self.client_id)
+        if fill is None:
+            self._resting_orders[id] = quantity
+            return
+        execution, report = fill
+        self._send(self._callback.execDetails, -1, self.market.contract(index),
+                   execution)
+        self._send(self._callback.commissionReport, report)
+        self._send(self._callback.orderStatus, id, 'Filled', quantity, 0,
+                   execution.m_price, id, 0, execution.m_price,
+                   self.client_id, '')
+
+    def cancelOrder(self, id):
+        quantity = self._resting_orders.pop(id, None)
+        if quantity is None:
+            self._send(self._callback.error, id, 135,
+                       "Can't find order with id = " + str(id))
+            return
+        self._send(self._callback.orderStatus, id, 'Cancelled', 0, quantity,
+                   0.0, id, 0, 0.0, self.client_id, '')
+
+
+class SimulatedConnection(IBBrokerConnection):
+    """
+    CLASS SUMMARY:
+        <IBBrokerConnection> whose interface is a <SimulatedClientSocket>.
+        Passed to a broker as its connection_type; bind a shared
+        <SimulatedMarket> with functools.partial, e.g.
+            connection_type = functools.partial(SimulatedConnection,
+                                                market = market)
+
+    CLASS PROPERTIES:
+        None
+
+    CLASS SPECIAL METHODS:
+        None
+
+    CLASS PRIVATE METHODS:
+        None
+
+    CLASS PUBLIC METHODS:
+        None
+    """
+    def __init__(self, callback, market = None):
+        """
+        SUMMARY:
+            SimulatedConnection initializer. Initializes object properties.
+
+        PARAMETERS:
+            callback - IBWrapper() the callbacks are delivered to
+            market - <SimulatedMarket>; a new default one if None
+
+        RETURNS:
+            None
+
+        RESULTS:
+            Creates a SimulatedConnection object.
+        """
+        # skips the EClientSocket of <IBBrokerConnection>
+        super(IBBrokerConnection, self).__init__()
+        self._interface = SimulatedClientSocket(callback, market = market)
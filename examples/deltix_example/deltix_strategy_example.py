@@ -275,7 +275,6 @@ class deltixStrategy(st.Strategy):
                 print(ticker, prevClosePrice)
 #                prevClose = self.broker.getDailyData(ticker, provider='yahoo', date_start=nysecal[idx-1], date_end=nysecal[idx-1] )
 #                prevClosePrice = prevClose['Adj Close'].values[0]
-                time.sleep(1)
                                                            
                 liveData = self.broker.getLiveMarketData(contract=contract)
                 
@@ -374,6 +373,21 @@ class deltixStrategy(st.Strategy):
         
 
 
+    def getMidPrices(self, symbols, retries = 2):
+        ''' Mid prices of the stocks <<symbols>> from batch snapshots.
+            Snapshots that time out are requested again up to <<retries>>
+            times; prices still missing are NaN. '''
+        prices = np.full( len(symbols), np.nan )
+        missing = np.arange( len(symbols) )
+        for attempt in range( retries + 1 ):
+            if len(missing) == 0:
+                break
+            contracts = [ self.broker.createContract(ticker=symbol, instrument_type='STK') for symbol in np.asarray(symbols)[missing] ]
+            quotes = self.broker.getLiveMarketDataBatch( contracts=contracts )
+            prices[missing] = ( quotes['Ask_Price'].values + quotes['Bid_Price'].values )*0.5 #mid point
+            missing = missing[ np.isnan( prices[missing] ) ]
+        return prices
+
     def hedgePositions(self, data_time):
         ''' data_time would be the time we intend to hedge '''
         pos = self.broker.getPositions()
@@ -387,46 +401,28 @@ class deltixStrategy(st.Strategy):
         shortExp, longExp = 0, 0
 
         ''' Get short exposure '''
-        for row, stk in shorts.iterrows():
-            shortContract = self.broker.createContract(ticker=stk['Symbol'], instrument_type='STK')
-                        
-#            avgPrice = self.broker.getDataAtTime( type_data='MIDPOINT',
-#                                     contract = shortContract,
-#                                     data_time=data_time,
-#                                     bar_size='1 secs'
-#                                     )['close'].iloc[-1]                        
-            liveData = self.broker.getLiveMarketData(contract=shortContract)
-                                
-            askPrice = liveData['price'][ liveData['Type']=='ASK PRICE' ].values[0]
-            bidPrice = liveData['price'][ liveData['Type']=='BID PRICE' ].values[0]
-            avgPrice = ( askPrice +bidPrice )*0.5 #mid point
-            
-            print( "Shorts: ", stk['Number_of_Units'], stk['Symbol'], askPrice, bidPrice, stk['Number_of_Units']*avgPrice)
-                                                 
-            shortExp = shortExp + stk['Number_of_Units']*avgPrice                        
-            time.sleep(1)
+        shortPrices = self.getMidPrices( shorts['Symbol'].values )
+        shortExposures = shorts['Number_of_Units'].values*shortPrices
+
+        for symbol, units, exposure in zip(shorts['Symbol'], shorts['Number_of_Units'], shortExposures):
+            print( "Shorts: ", units, symbol, exposure)
 
         ''' Get long exposure '''
-        for row, stk in longs.iterrows():
-            
-            longContract = self.broker.createContract(ticker=stk['Symbol'], instrument_type='STK')
-            
-            liveData = self.broker.getLiveMarketData( contract=longContract )
-            askPrice = liveData['price'][ liveData['Type']=='ASK PRICE' ].values[0]            
-            bidPrice = liveData['price'][ liveData['Type']=='BID PRICE' ].values[0]         
-            
-            avgPrice = ( askPrice +bidPrice )*0.5 #mid point
-            
-#            avgPrice = self.broker.getDataAtTime( type_data='MIDPOINT',
-#                                     contract = longContract,
-#                                     data_time=data_time,
-#                                     bar_size='1 secs'
-#                                     )['close'].iloc[-1]
-            
-            print( "Longs: ", stk['Number_of_Units'], stk['Symbol'], askPrice, bidPrice,  stk['Number_of_Units']*avgPrice)
+        longPrices = self.getMidPrices( longs['Symbol'].values )
+        longExposures = longs['Number_of_Units'].values*longPrices
+
+        for symbol, units, exposure in zip(longs['Symbol'], longs['Number_of_Units'], longExposures):
+            print( "Longs: ", units, symbol, exposure)
+
+        # a missing price would size the hedge on part of the exposure only
+        missing = np.isnan( np.r_[ shortPrices, longPrices ] )
+        if missing.any():
+            print( "Skipping hedge; no price for: ",
+                   list( np.r_[ shorts['Symbol'].values, longs['Symbol'].values ][ missing ] ) )
+            return
 
-            longExp = longExp + stk['Number_of_Units']*avgPrice
-            time.sleep(1)
+        shortExp = np.sum( shortExposures )
+        longExp = np.sum( longExposures )
 
         ''' target exposure '''
         
@@ -673,7 +669,6 @@ class deltixStrategy(st.Strategy):
                                                                #order_type='MARKET',)
 #                                                               time_in_force='MOC'
 #                                                               )  # default is market order
-                time.sleep(1)
                                 
                 
                 order_id =self.broker.nextOrderId()                
@@ -722,7 +717,6 @@ class deltixStrategy(st.Strategy):
 #                           )
                 print('Long: ', stk, order_id)                
 
-                time.sleep(1)
                 self.broker.callback.order_Status
 #                time.sleep(1)
             except:
@@ -0,0 +1,1028 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+tests/broker_tests.py
+Created on 2026-10-18T18:00:00Z
+"""
+# imports from future
+from __future__ import print_function
+
+#imports from stdlib
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import functools
+import unittest
+import datetime as dt
+
+# third party imports
+import numpy as np
+import pandas as pd
+from ib.ext.Contract import Contract
+from ib.ext.ContractDetails import ContractDetails
+from ib.ext.Order import Order
+
+# the api modules import each other as top level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'api'))
+
+# internal/custom imports
+import broker as br
+import simulator as sm
+import pacing as pc
+import account as ac
+import registry as rg
+import capture as cap
+import orderBook as ob
+import barAggregator as ba
+import orderIds as oi
+import latency as lt
+import asyncBroker as ab
+import marketData as md
+import contractCache as cc
+import executionJournal as ej
+import futuresChain as fc
+import continuousFutures as cf
+
+
+def simulatedBroker(market, **kwargs):
+    """
+    SUMMARY:
+        Returns an <IBBrokerTotal> connected to the simulated <<market>>.
+    """
+    return br.IBBrokerTotal(path_root = tempfile.gettempdir() + os.sep,
+                            connection_type = functools.partial(
+                                                sm.SimulatedConnection,
+                                                market = market),
+                            **kwargs)
+
+
+def futureDetails(local_symbol, expiry, contract = None):
+    """
+    SUMMARY:
+        Returns the ContractDetails() of a futures contract of root 'SIM'
+        expiring on the 'YYYYMMDD' <<expiry>>.
+    """
+    if contract is None:
+        contract = Contract()
+        contract.m_symbol = 'SIM'
+    contract.m_secType = 'FUT'
+    contract.m_exchange = 'SIM'
+    contract.m_currency = 'USD'
+    contract.m_localSymbol = local_symbol
+    contract.m_expiry = expiry
+    details = ContractDetails()
+    details.m_summary = contract
+    details.m_marketName = 'SIM'
+    details.m_contractMonth = expiry[:6]
+    return details
+
+
+class RegistryTest(unittest.TestCase):
+    """
+    Request futures and callback buffers.
+    """
+    def test_request_registry_shares_pending_request(self):
+        requests = rg.RequestRegistry()
+        future = requests.register(7)
+        self.assertIs(requests.register(7), future)
+        self.assertTrue(requests.resolve(7, 'data'))
+        self.assertEqual(future.result, 'data')
+        self.assertFalse(requests.resolve(7, 'late'))
+        self.assertIsNot(requests.register(7), future)
+
+    def test_buffer_registry_drops_late_callbacks(self):
+        buffers = rg.BufferRegistry(max_length = 2)
+        buffers.open('tick_Price', 1)
+        for item in range(3):
+            self.assertTrue(buffers.route('tick_Price', 1, item))
+        self.assertEqual(buffers.close('tick_Price', 1), [1, 2])
+        self.assertTrue(buffers.route('tick_Price', 1, 3))
+        self.assertTrue(buffers.claims('tick_Price', 1))
+        self.assertFalse(buffers.route('tick_Price', 2, 0))
+        self.assertEqual(buffers.close('tick_Price', 1), [])
+
+
+class BatchQuoteTest(unittest.TestCase):
+    """
+    Basket snapshot quotes within the market data lines.
+    """
+    def test_snapshots_queued_beyond_free_lines(self):
+        market = sm.SimulatedMarket(instruments = 40, latency = 0.2,
+                                    max_market_data_lines = 5)
+        broker = simulatedBroker(market, max_market_data_lines = 5)
+        try:
+            broker.subscribeMarketData(contract = market.contract(39))
+            data = broker.getLiveMarketDataBatch(
+                            contracts = [market.contract(index)
+                                         for index in range(30)],
+                            time_out = 10)
+            self.assertEqual(len(data), 30)
+            self.assertFalse(data['Bid_Price'].isnull().any())
+            self.assertEqual(broker.snapshot_lines.in_use, 0)
+            self.assertEqual(broker.snapshot_lines.queue_depth, 0)
+        finally:
+            broker.disconnect()
+
+    def test_rejected_snapshot_fails_at_once(self):
+        market = sm.SimulatedMarket(instruments = 5, latency = 0.01,
+                                    max_market_data_lines = 0)
+        broker = simulatedBroker(market)
+        try:
+            time_start = time.time()
+            data = broker.getLiveMarketDataBatch(
+                            contracts = [market.contract(0)], time_out = 5)
+            self.assertLess(time.time() - time_start, 2)
+            self.assertTrue(data['Bid_Price'].isnull().all())
+        finally:
+            broker.disconnect()
+
+
+class PacingTest(unittest.TestCase):
+    """
+    Historical data pacing and the message governor.
+    """
+    def test_scheduler_gives_up_after_max_retries(self):
+        scheduler = pc.HistoricalScheduler(violation_backoff = 0,
+                                           identical_cooldown = 0,
+                                           max_retries = 2)
+        calls = []
+
+        def request():
+            calls.append(time.time())
+            raise pc.PacingViolation('pacing violation')
+        future = scheduler.submit(request, key = 'bars')
+        self.assertTrue(future.wait(5))
+        self.assertIsInstance(future.error, pc.PacingViolation)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(scheduler.violations, 3)
+
+    def test_scheduler_holds_requests_to_the_window(self):
+        scheduler = pc.HistoricalScheduler(max_requests = 2, window = 0.5,
+                                           identical_cooldown = 0)
+        futures = [scheduler.submit(time.time, key = index)
+                   for index in range(3)]
+        for future in futures:
+            self.assertTrue(future.wait(5))
+        sent = sorted(future.result for future in futures)
+        self.assertGreaterEqual(sent[2] - sent[0], 0.45)
+
+    def test_default_governor_stays_under_message_cap(self):
+        governor = pc.MessageGovernor()
+        time_start = time.time()
+        sent = 0
+        while time.time() - time_start < 1:
+            governor.acquire()
+            sent += 1
+        self.assertLessEqual(sent, pc.MAX_MESSAGE_RATE)
+        self.assertEqual(governor.sent[pc.MARKET_DATA_LANE], sent)
+
+    def test_simulated_pacing_violation_fails_request(self):
+        market = sm.SimulatedMarket(instruments = 5, latency = 0.01,
+                                    max_historical_requests = 1)
+        broker = simulatedBroker(market)
+        broker.historical_scheduler = pc.HistoricalScheduler(
+                                                    identical_cooldown = 0,
+                                                    violation_backoff = 0,
+                                                    max_retries = 1)
+        day = dt.datetime.combine(dt.date.today() - dt.timedelta(days = 4),
+                                  dt.time(11))
+        try:
+            self.assertIsNotNone(broker.getDataAtTime(
+                                    day, contract = market.contract(0),
+                                    type_data = 'TRADES', max_wait = 5))
+            self.assertIsNone(broker.getDataAtTime(
+                                    day, contract = market.contract(1),
+                                    type_data = 'TRADES', max_wait = 5))
+            self.assertEqual(broker.historical_scheduler.violations, 2)
+        finally:
+            broker.disconnect()
+
+
+class BarCacheRangeTest(unittest.TestCase):
+    """
+    Historical bars served from the <BarCache> by covered span.
+    """
+    def setUp(self):
+        self.path_cache = tempfile.mkdtemp()
+        self.market = sm.SimulatedMarket(instruments = 5, latency = 0.01)
+        self.broker = simulatedBroker(self.market,
+                                      path_bar_cache = self.path_cache)
+        self.broker.historical_scheduler = pc.HistoricalScheduler(
+                                                    identical_cooldown = 0)
+        self.contract = self.market.contract(0)
+        self.day = dt.datetime.combine(dt.date.today() -
+                                       dt.timedelta(days = 4), dt.time())
+
+    def tearDown(self):
+        self.broker.disconnect()
+        shutil.rmtree(self.path_cache)
+
+    def test_bar_at_time_does_not_complete_session(self):
+        bar = self.broker.getDataAtTime(self.day.replace(hour = 11),
+                                        contract = self.contract,
+                                        type_data = 'TRADES')
+        self.assertIsNotNone(bar)
+
+        data = self.broker.getDataInRange(self.day,
+                                          self.day + dt.timedelta(days = 1),
+                                          contract = self.contract,
+                                          type_data = 'TRADES')
+        self.assertEqual(len(data), 1440)
+        self.assertNotIn('reqId', data.columns)
+        self.assertEqual(self.broker.bar_cache.missingSpans(
+                                self.contract, 'TRADES', '1 min', 0,
+                                self.day, self.day + dt.timedelta(days = 1)),
+                         [])
+
+    def test_covered_session_served_from_disk(self):
+        date_end = self.day + dt.timedelta(days = 1)
+        data = self.broker.getDataInRange(self.day, date_end,
+                                          contract = self.contract,
+                                          type_data = 'TRADES')
+        self.broker.bar_cache._sessions.clear()
+        requests = len(self.market._historical_requests)
+        cached = self.broker.getDataInRange(self.day, date_end,
+                                            contract = self.contract,
+                                            type_data = 'TRADES')
+        self.assertEqual(len(self.market._historical_requests), requests)
+        pd.util.testing.assert_frame_equal(data, cached,
+                                           check_dtype = False)
+
+    def test_missing_spans_around_covered_span(self):
+        cache = self.broker.bar_cache
+        span = (self.day.replace(hour = 10), self.day.replace(hour = 12))
+        cache.store(self.contract, 'TRADES', '1 min', 0, None, span = span)
+        self.assertEqual(cache.missingSpans(self.contract, 'TRADES', '1 min',
+                                            0, self.day.replace(hour = 9),
+                                            self.day.replace(hour = 13)),
+                         [(self.day.replace(hour = 9), span[0]),
+                          (span[1], self.day.replace(hour = 13))])
+
+
+class SubscriptionTest(unittest.TestCase):
+    """
+    Streaming market data held in per-ticker ring buffers.
+    """
+    def test_ring_keeps_latest_ticks(self):
+        ring = md.TickRing(size = 3)
+        for value in range(5):
+            ring.write(md.LAST_PRICE, float(value), time_received = value)
+        self.assertEqual(len(ring), 3)
+        self.assertEqual(ring.count, 5)
+        self.assertEqual(ring.history()['value'].tolist(), [2.0, 3.0, 4.0])
+        self.assertEqual(ring.latest(md.LAST_PRICE), 4.0)
+        self.assertTrue(np.isnan(ring.latest(md.BID_PRICE)))
+
+    def test_pulled_side_reads_as_absent(self):
+        subscriptions = md.SubscriptionManager(max_lines = 1)
+        contract = sm.SimulatedMarket(instruments = 2).contract(0)
+        self.assertTrue(subscriptions.subscribe(contract, 5))
+        self.assertFalse(subscriptions.subscribe(Contract(), 6))
+        subscriptions.route(5, md.BID_PRICE, 10.0)
+        subscriptions.route(5, md.ASK_PRICE, -37.63)
+        subscriptions.route(5, md.LAST_PRICE, 0.0)
+        subscriptions.route(5, md.BID_PRICE, md.NO_PRICE)
+        quote = subscriptions.quote(subscriptions.tickerId(contract))
+        self.assertTrue(np.isnan(quote['Bid_Price']))
+        self.assertEqual(quote['Ask_Price'], -37.63)
+        self.assertEqual(quote['Last_Price'], 0.0)
+        self.assertFalse(subscriptions.route(6, md.BID_PRICE, 1.0))
+
+    def test_simulated_subscription_streams_quotes(self):
+        market = sm.SimulatedMarket(instruments = 5, latency = 0.01,
+                                    tick_interval = 0.05)
+        broker = simulatedBroker(market)
+        contract = market.contract(0)
+        try:
+            self.assertIsNotNone(broker.subscribeMarketData(
+                                                    contract = contract))
+            time.sleep(0.3)
+            quote = broker.getLatestQuote(contract = contract,
+                                          max_staleness = 0.2)
+            self.assertGreater(quote['Ask_Price'], quote['Bid_Price'])
+            broker.unsubscribeMarketData(contract = contract)
+            self.assertIsNone(broker.getLatestQuote(contract = contract))
+        finally:
+            broker.disconnect()
+
+
+class TickerRegistryTest(unittest.TestCase):
+    """
+    Ticker index by symbol, conId and contract key.
+    """
+    def test_contract_key_normalizes_unset_fields(self):
+        contract = Contract()
+        contract.m_symbol = 'SPY'
+        contract.m_secType = 'OPT'
+        contract.m_right = 'call'
+        contract.m_strike = '250'
+        contract.m_expiry = '20171215 16:00'
+        other = Contract()
+        other.m_symbol = 'SPY'
+        other.m_secType = 'OPT'
+        other.m_right = 'C'
+        other.m_strike = 250.0
+        other.m_expiry = '20171215'
+        self.assertEqual(rg.contractKey(contract), rg.contractKey(other))
+        other.m_exchange = 'CBOE'
+        self.assertNotEqual(rg.contractKey(contract), rg.contractKey(other))
+        self.assertEqual(rg.contractKey(contract, exchange = False),
+                         rg.contractKey(other, exchange = False))
+
+    def test_known_contract_keeps_its_ticker_id(self):
+        market = sm.SimulatedMarket(instruments = 3)
+        tickers = rg.TickerRegistry(first_id = 10)
+        ticker_id = tickers.add(market.contract(0))
+        unqualified = market.contract(0)
+        unqualified.m_conId = 0
+        self.assertEqual(tickers.add(unqualified), ticker_id)
+        other_id = tickers.add(market.contract(1))
+        self.assertEqual((ticker_id, other_id), (10, 11))
+        self.assertEqual(tickers.idByConId(100001), other_id)
+        self.assertEqual(tickers.idsBySymbol(market.symbols[0]), [ticker_id])
+        self.assertEqual(tickers.remove(ticker_id)[0], market.symbols[0])
+        self.assertIsNone(tickers.idByContract(unqualified))
+        self.assertEqual(tickers.keys(), [other_id])
+
+    def test_simulated_broker_searches_tickers(self):
+        market = sm.SimulatedMarket(instruments = 3, latency = 0.01)
+        broker = simulatedBroker(market)
+        try:
+            for index in range(3):
+                broker.tickers = market.contract(index)
+            symbol = market.symbols[1]
+            self.assertEqual(broker.tickerSearch(symbol, type_data = 'TUPLE')
+                             [0][0], symbol)
+            contract = broker.contractSearch(market.contract(1),
+                                             type_data = 'CONTRACT')[0]
+            self.assertEqual(contract.m_conId, 100001)
+            broker.removeFromTickers(symbol, 'TICKER')
+            self.assertEqual(broker.tickerSearch(symbol, type_data = 'ID'),
+                             [])
+            self.assertEqual(len(broker.tickers), 2)
+        finally:
+            broker.disconnect()
+
+
+class TickCaptureTest(unittest.TestCase):
+    """
+    Columnar capture of unclaimed tick and historical callbacks.
+    """
+    def test_buffer_grows_and_keeps_rows(self):
+        capture = cap.TickCapture(capacity = 2)
+        for price in range(5):
+            self.assertTrue(capture.append('tick_Price',
+                                           (7, 1, float(price), 0)))
+        self.assertFalse(capture.append('tick_Unknown', (7, 1)))
+        frame = capture.frame('tick_Price', key = 7)
+        self.assertEqual(len(capture.array('tick_Price')), 5)
+        self.assertEqual(frame.iloc[:, 2].tolist(), [0.0, 1.0, 2.0, 3.0, 4.0])
+        capture.clear()
+        self.assertEqual(len(capture.array('tick_Price')), 0)
+        self.assertEqual(len(frame), 5)
+
+    def test_simulated_stream_captured_instead_of_listed(self):
+        market = sm.SimulatedMarket(instruments = 3, latency = 0.01,
+                                    tick_interval = 0.05)
+        broker = simulatedBroker(market)
+        try:
+            broker.startTickCapture()
+            listed = len(broker.callback.tick_Price)
+            broker.tws.reqMktData(tickerId = 9001,
+                                  contract = market.contract(0),
+                                  genericTickList = '', snapshot = False)
+            time.sleep(0.3)
+            broker.tws.cancelMktData(9001)
+            data = broker.getCapturedData('tick_Price', key = 9001)
+            self.assertGreater(len(data), 0)
+            self.assertEqual(len(broker.callback.tick_Price), listed)
+            capture = broker.stopTickCapture()
+            self.assertIsNotNone(capture)
+            self.assertTrue(broker.getCapturedData('tick_Price').empty)
+        finally:
+            broker.disconnect()
+
+
+class OrderBookTest(unittest.TestCase):
+    """
+    Level 2 order books built from market depth events.
+    """
+    def test_insert_update_delete(self):
+        book = ob.OrderBook(max_depth = 3)
+        book.apply(0, ob.INSERT, ob.BID, 10.0, 100)
+        book.apply(0, ob.INSERT, ob.BID, 10.1, 200)
+        book.apply(5, ob.UPDATE, ob.BID, 9.9, 300)
+        book.apply(2, ob.UPDATE, ob.BID, 9.8, 400)
+        prices, sizes = book.ladder('BID')
+        self.assertEqual(prices.tolist(), [10.1, 10.0, 9.8])
+        self.assertEqual(sizes.tolist(), [200, 100, 400])
+        book.apply(0, ob.DELETE, ob.BID, 0.0, 0)
+        self.assertEqual(book.bid_levels, 2)
+        self.assertEqual(book.cumulativeSize(ob.BID, 5), 500)
+        self.assertTrue(np.isnan(book.depthWeightedMid()))
+        book.apply(0, ob.INSERT, ob.ASK, 10.2, 100)
+        self.assertAlmostEqual(book.depthWeightedMid(),
+                               (10.0 * 100 + 10.2 * 100) / 200)
+
+    def test_simulated_depth_subscription(self):
+        market = sm.SimulatedMarket(instruments = 3, latency = 0.01)
+        broker = simulatedBroker(market)
+        contract = market.contract(0)
+        try:
+            broker.subscribeMarketDepth(contract = contract, depth = 5)
+            time.sleep(0.3)
+            book = broker.getOrderBook(contract = contract)
+            self.assertEqual((book.bid_levels, book.ask_levels), (5, 5))
+            top = book.topOfBook()
+            self.assertEqual(top['Bid_Price'], market.quote(0)[1])
+            self.assertLess(top['Bid_Price'], top['Ask_Price'])
+            self.assertEqual(book.cumulativeSize(ob.BID, 3), 600)
+            broker.unsubscribeMarketDepth(contract = contract)
+            self.assertIsNone(broker.getOrderBook(contract = contract))
+        finally:
+            broker.disconnect()
+
+
+class BarAggregatorTest(unittest.TestCase):
+    """
+    Multi-resolution bars built from realtime bars and trades.
+    """
+    def test_trades_roll_into_bars(self):
+        bars = ba.BarAggregator(bar_sizes = ['1 min', '5 mins'])
+        bars.subscribe(sm.SimulatedMarket(instruments = 1).contract(0), 3)
+        closed = []
+        bars.addCallback(lambda ticker_id, bar_size, bar:
+                         closed.append((ticker_id, bar_size)))
+        for trade_time, price in [(0, 10.0), (30, 12.0), (59, 11.0)]:
+            self.assertTrue(bars.addTrade(3, trade_time, price, 100))
+        self.assertTrue(bars.addRTVolume(3, '9.0;200;61000;500;10.5;true'))
+        self.assertFalse(bars.addTrade(4, 0, 1.0, 1))
+        data = bars.bars(3, '1 min')
+        self.assertEqual(data[['open', 'high', 'low', 'close', 'volume']]
+                         .values.tolist(), [[10.0, 12.0, 10.0, 11.0, 300]])
+        self.assertAlmostEqual(data['VWAP'].iloc[0], 11.0)
+        self.assertEqual(bars.currentBar(3, '5 mins')['low'], 9.0)
+        bars.closeBars(now = 300)
+        self.assertEqual(len(bars.bars(3, '5 mins')), 1)
+        self.assertEqual(sorted(closed),
+                         [(3, '1 min'), (3, '1 min'), (3, '5 mins')])
+
+    def test_simulated_realtime_bars(self):
+        market = sm.SimulatedMarket(instruments = 3, latency = 0.01)
+        broker = simulatedBroker(market)
+        contract = market.contract(0)
+        try:
+            ticker_id = broker.subscribeBars(contract = contract)
+            self.assertIsNotNone(ticker_id)
+            time_end = time.time() + 7
+            while broker.bar_aggregator.currentBar(ticker_id, '1 min') \
+                    is None and time.time() < time_end:
+                time.sleep(0.1)
+            bar = broker.bar_aggregator.currentBar(ticker_id, '1 min')
+            self.assertGreater(bar['close'], 0)
+            self.assertGreaterEqual(bar['high'], bar['low'])
+            broker.unsubscribeBars(contract = contract)
+            self.assertTrue(broker.getBars(contract = contract).empty)
+        finally:
+            broker.disconnect()
+
+
+class OrderIdAllocatorTest(unittest.TestCase):
+    """
+    Order ids persisted across restarts.
+    """
+    def setUp(self):
+        self.path_root = tempfile.mkdtemp()
+        self.path_file = os.path.join(self.path_root, 'order_id.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.path_root)
+
+    def test_resumes_after_reserved_block(self):
+        allocator = oi.OrderIdAllocator(path_file = self.path_file,
+                                        block_size = 10)
+        issued = [allocator.next() for _ in range(3)]
+        self.assertEqual(issued, [1, 2, 3])
+        self.assertEqual(allocator.sync(2), 4)
+        resumed = oi.OrderIdAllocator(path_file = self.path_file,
+                                      block_size = 10)
+        self.assertEqual(resumed.next(), 11)
+        self.assertEqual(resumed.sync(50), 50)
+        self.assertEqual(resumed.next(), 50)
+
+    def test_simulated_restart_never_reuses_ids(self):
+        market = sm.SimulatedMarket(instruments = 3, latency = 0.01)
+        order = Order()
+        order.m_action = 'BUY'
+        order.m_totalQuantity = 10
+        order.m_orderType = 'LMT'
+        order.m_lmtPrice = 0.01
+        broker = simulatedBroker(market, path_order_id = self.path_file)
+        try:
+            order_id = broker.nextOrderId()
+            broker.placeOrder(order_id = order_id,
+                              contract = market.contract(0), order = order)
+        finally:
+            broker.disconnect()
+        # the resting order leaves the gateway's next valid id behind
+        self.assertLessEqual(market.nextOrderId(), order_id)
+        broker = simulatedBroker(market, path_order_id = self.path_file)
+        try:
+            self.assertGreater(broker.nextOrderId(), order_id)
+        finally:
+            broker.disconnect()
+
+
+class SubmitOrdersTest(unittest.TestCase):
+    """
+    Orders submitted at once and acknowledged together.
+    """
+    def test_simulated_orders_acknowledged_or_rejected(self):
+        market = sm.SimulatedMarket(instruments = 5, latency = 0.01)
+        broker = simulatedBroker(market)
+        unknown = Contract()
+        unknown.m_symbol = 'NONE'
+        unknown.m_secType = 'STK'
+        contracts = [market.contract(0), market.contract(1), unknown]
+        orders = [broker.createOrder(trade_type = 'BUY', amount_units = 10,
+                                     order_type = 'MARKET')
+                  for _ in contracts]
+        try:
+            status = broker.submitOrders(contracts = contracts,
+                                         orders = orders, time_out = 5)
+            self.assertEqual(status['Status'].tolist(),
+                             ['Submitted', 'Submitted', 'Error'])
+            self.assertTrue(status['Message'].iloc[2].startswith('200'))
+            self.assertEqual(len(set(status.index)), 3)
+            self.assertEqual(market.positions()[0][1], 110)
+        finally:
+            broker.disconnect()
+
+    def test_simulated_close_all_positions(self):
+        market = sm.SimulatedMarket(instruments = 5, positions = 3,
+                                    latency = 0.01)
+        broker = simulatedBroker(market)
+        try:
+            status = broker.closeAllPositions(order_type = 'MARKET')
+            self.assertEqual(len(status), 3)
+            self.assertTrue((status['Action'] == 'SELL').all())
+            time.sleep(0.2)
+            self.assertEqual(market.positions(), [])
+        finally:
+            broker.disconnect()
+
+
+class ContractCacheTest(unittest.TestCase):
+    """
+    Qualified contracts cached across sessions.
+    """
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.path_file = os.path.join(self.path, 'contracts.pkl')
+        self.contract = sm.SimulatedMarket(instruments = 1).contract(0)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_find_by_alias_and_exchange(self):
+        cache = cc.ContractCache()
+        alias = Contract()
+        alias.m_symbol = self.contract.m_symbol
+        alias.m_secType = 'STK'
+        self.assertTrue(cache.add(self.contract, alias = alias))
+        self.assertEqual(cache.find(alias).m_conId, self.contract.m_conId)
+        routed = Contract()
+        routed.m_symbol = self.contract.m_symbol
+        routed.m_secType = 'STK'
+        routed.m_exchange = 'ARCA'
+        routed.m_currency = 'USD'
+        found = cache.find(routed)
+        self.assertEqual(found.m_conId, self.contract.m_conId)
+        self.assertEqual(found.m_exchange, 'ARCA')
+        self.assertFalse(cache.add(Contract()))
+
+    def test_saved_only_when_changed(self):
+        cache = cc.ContractCache(self.path_file)
+        cache.add(self.contract)
+        cache.save()
+        loaded = cc.ContractCache(self.path_file)
+        self.assertIn(self.contract, loaded)
+        self.assertFalse(loaded.changed)
+        loaded.add(self.contract)
+        self.assertFalse(loaded.changed)
+        os.remove(self.path_file)
+        loaded.save()
+        self.assertFalse(os.path.isfile(self.path_file))
+
+
+class ExecutionJournalTest(unittest.TestCase):
+    """
+    Executions journaled apart from the CSV logs.
+    """
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.path_csv = os.path.join(self.path, 'execs.csv')
+        with open(self.path_csv, 'w') as f:
+            f.write('Server_Time,Ticker\n1,SIM0000\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_refuses_other_files(self):
+        self.assertRaises(ValueError, ej.ExecutionJournal, self.path_csv)
+        self.assertEqual(ej.journalPath(self.path_csv),
+                         os.path.join(self.path, 'execs.journal'))
+
+    def test_simulated_order_is_journaled_and_annotated(self):
+        market = sm.SimulatedMarket(instruments = 5, latency = 0.01)
+        broker = simulatedBroker(market, exec_path = self.path_csv)
+        try:
+            order = Order()
+            order.m_action = 'BUY'
+            order.m_totalQuantity = 5
+            order.m_orderType = 'MKT'
+            order_id = broker.nextOrderId()
+            broker.placeRecordedOrder(order_id, market.contract(0), order,
+                                      path = broker.exec_path,
+                                      additional_values = {'Tag': 'entry'})
+            time_end = time.time() + 5
+            while time.time() < time_end and \
+                    broker.getTransactions(order_id = order_id).empty:
+                time.sleep(0.1)
+            broker.execution_journal.compact()
+            data = broker.getTransactions(order_id = order_id)
+            self.assertEqual(len(data), 1)
+            self.assertEqual(data['Tag'].tolist(), ['entry'])
+            with open(self.path_csv) as f:
+                self.assertEqual(f.read(), 'Server_Time,Ticker\n1,SIM0000\n')
+        finally:
+            broker.disconnect()
+
+
+class AccountStateTest(unittest.TestCase):
+    """
+    Account values cached with their receive time.
+    """
+    def test_values_age_unless_streaming(self):
+        state = ac.AccountState()
+        state.updateValue('DU1', 'NetLiquidation', '100.5', 'USD')
+        time.sleep(0.05)
+        self.assertIsNone(state.value('NetLiquidation',
+                                      max_staleness = 0.01))
+        self.assertEqual(state.value('NetLiquidation'), 100.5)
+        state.setStreaming('DU1')
+        self.assertEqual(state.value('NetLiquidation', max_staleness = 0.01),
+                         100.5)
+        self.assertEqual(len(state.values(max_staleness = 0.01)), 1)
+        state.setStreaming('DU1', streaming = False)
+        self.assertTrue(state.values(max_staleness = 0.01).empty)
+
+    def test_simulated_streaming_values_served_without_request(self):
+        market = sm.SimulatedMarket(instruments = 5, latency = 0.01)
+        broker = simulatedBroker(market)
+        try:
+            self.assertTrue(broker.startAccountUpdates())
+            time.sleep(0.1)
+
+            def request(*args, **kwargs):
+                raise AssertionError("requested a streamed value")
+            broker.getAccountInformation = request
+            self.assertGreater(broker.getAccountValue('NetLiquidation',
+                                                      max_staleness = 0.01),
+                               0)
+            self.assertEqual(len(broker.getPortfolio(max_staleness = 0.01)),
+                             len(market.positions()))
+        finally:
+            broker.disconnect()
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    """
+    Data requests spread over the connections of a pool.
+    """
+    def test_simulated_requests_spread_over_data_connections(self):
+        market = sm.SimulatedMarket(instruments = 10, latency = 0.01)
+        broker = simulatedBroker(market, data_connections = 2)
+        sent = {}
+        try:
+            interfaces = broker.connection.interfaces
+            self.assertEqual([interface.client_id
+                              for interface in interfaces],
+                             [broker.client_id + index
+                              for index in range(3)])
+            for interface in interfaces:
+                def reqMktData(tickerId, contract, genericTickList, snapshot,
+                               interface = interface,
+                               send = interface.reqMktData):
+                    sent[interface] = sent.get(interface, 0) + 1
+                    send(tickerId, contract, genericTickList, snapshot)
+                interface.reqMktData = reqMktData
+            data = broker.getLiveMarketDataBatch(
+                            contracts = [market.contract(index)
+                                         for index in range(6)],
+                            time_out = 5)
+            self.assertFalse(data['Bid_Price'].isnull().any())
+            self.assertNotIn(broker.connection.interface, sent)
+            self.assertEqual([sent.get(interface, 0) for interface
+                              in broker.connection.data_interfaces], [3, 3])
+            self.assertEqual(len(broker.getPositions()),
+                             len(market.positions()))
+        finally:
+            broker.disconnect()
+
+
+class LatencyRecorderTest(unittest.TestCase):
+    """
+    Request round trips and method durations.
+    """
+    def test_request_round_trip_and_timeout(self):
+        recorder = lt.LatencyRecorder()
+        recorder.startRequest(1, name = 'quote')
+        recorder.recordMessage(1, 'tickPrice')
+        recorder.recordMessage(1, 'tickPrice')
+        recorder.recordMessage(1, 'tickSnapshotEnd')
+        recorder.endRequest(1)
+        recorder.startRequest(2, name = 'quote')
+        recorder.endRequest(2, outcome = 'timed_out')
+        recorder.recordRetry(name = 'quote')
+        summary = recorder.summary(lt.REQUEST).set_index('Name')
+        self.assertEqual(summary.loc['quote', ['Count', 'Timeouts',
+                                               'Retries']].tolist(),
+                         [2, 1, 1])
+        self.assertEqual(len(recorder.summary(lt.MESSAGE)), 2)
+        self.assertEqual(recorder.histogram(lt.REQUEST, 'quote').sum(), 1)
+        recorder.reset()
+        self.assertTrue(recorder.summary().empty)
+
+    def test_simulated_methods_timed(self):
+        market = sm.SimulatedMarket(instruments = 3, latency = 0.05)
+        broker = simulatedBroker(market)
+        try:
+            broker.latency_recorder.reset()
+            broker.getPositions()
+            broker.getPositions()
+            methods = broker.latency_recorder.summary(lt.METHOD) \
+                                             .set_index('Name')
+            self.assertEqual(methods.loc['getPositions', 'Count'], 2)
+            self.assertGreaterEqual(methods.loc['getPositions', 'P50'], 0.05)
+            requests = broker.latency_recorder.summary(lt.REQUEST)
+            self.assertIn('getPositions', requests['Name'].tolist())
+        finally:
+            broker.disconnect()
+
+
+@unittest.skipIf(ab.asyncio is None, "AsyncBroker requires trollius.")
+class AsyncBrokerTest(unittest.TestCase):
+    """
+    Event loop facade over a simulated broker.
+    """
+    def setUp(self):
+        self.loop = ab.asyncio.new_event_loop()
+        self.market = sm.SimulatedMarket(instruments = 10, latency = 0.05)
+        self.broker = simulatedBroker(self.market)
+        self.facade = ab.AsyncBroker(self.broker, loop = self.loop)
+
+    def tearDown(self):
+        self.broker.disconnect()
+        self.loop.close()
+
+    def test_gathers_quotes_and_positions(self):
+        futures = [self.facade.getLiveMarketData(self.market.contract(index))
+                   for index in range(5)]
+        futures.append(self.facade.getPositions())
+        results = self.loop.run_until_complete(
+                        ab.asyncio.gather(*futures, loop = self.loop))
+        self.assertTrue(all(not quote.empty for quote in results[:5]))
+        self.assertEqual(len(results[5]), len(self.market.positions()))
+
+    def test_order_placed_and_cancelled(self):
+        order = Order()
+        order.m_action = 'BUY'
+        order.m_totalQuantity = 10
+        order.m_orderType = 'LMT'
+        order.m_lmtPrice = 0.01
+        order_id = self.broker.nextOrderId()
+        self.assertEqual(self.loop.run_until_complete(
+                            self.facade.placeOrder(order_id,
+                                                   self.market.contract(0),
+                                                   order)),
+                         'Submitted')
+        self.assertEqual(self.loop.run_until_complete(
+                            self.facade.cancelOrder(order_id)),
+                         'Cancelled')
+        self.assertEqual(self.loop.run_until_complete(
+                            self.facade.cancelOrder(order_id)),
+                         'Error')
+
+
+class SingleFlightTest(unittest.TestCase):
+    """
+    Identical requests coalesced into one.
+    """
+    def test_concurrent_submits_send_once(self):
+        flights = rg.SingleFlight()
+        sent = []
+
+        def request():
+            time.sleep(0.1)
+            sent.append(1)
+            return rg.RequestFuture()
+        futures = []
+        threads = [threading.Thread(
+                        target = lambda: futures.append(
+                                            flights.submit('quote', request)))
+                   for index in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(len(set(id(future) for future in futures)), 1)
+        self.assertEqual(flights.coalesced, 4)
+
+    def test_failed_and_discarded_requests_are_not_shared(self):
+        flights = rg.SingleFlight(freshness = 60)
+        failed = flights.submit('quote', rg.RequestFuture)
+        failed.fail('error')
+        resolved = flights.submit('quote', rg.RequestFuture)
+        self.assertIsNot(resolved, failed)
+        resolved.resolve([])
+        self.assertIs(flights.submit('quote', rg.RequestFuture), resolved)
+        flights.discard(resolved)
+        self.assertIsNot(flights.submit('quote', rg.RequestFuture), resolved)
+
+    def test_simulated_snapshots_shared_only_when_ended(self):
+        market = sm.SimulatedMarket(instruments = 5, latency = 0.5)
+        broker = simulatedBroker(market, quote_freshness = 60)
+        contract = market.contract(0)
+        try:
+            self.assertTrue(broker.getLiveMarketData(contract = contract,
+                                                     time_out = 0.1).empty)
+            quote = broker._submitQuote(contract)
+            self.assertFalse(quote.done())
+            self.assertFalse(broker.getLiveMarketData(contract = contract,
+                                                      time_out = 5).empty)
+            self.assertIs(broker._submitQuote(contract), quote)
+        finally:
+            broker.disconnect()
+
+
+class DollarOrdersTest(unittest.TestCase):
+    """
+    Dollar amounts sized into orders from one round of quotes.
+    """
+    def test_simulated_basket_sized_in_lots(self):
+        market = sm.SimulatedMarket(instruments = 5, latency = 0.01)
+        broker = simulatedBroker(market)
+        basket = pd.DataFrame({'Contract_Object': [market.contract(index)
+                                                   for index in range(4)],
+                               'Amount_Dollars': [10000.0, 5000.0, 1.0,
+                                                  20000.0],
+                               'Trade_Type': ['BUY', 'SELL', 'BUY', 'BUY'],
+                               'Lot_Size': [10, 1, 1, 100]})
+        try:
+            orders = broker.createDollarOrders(basket, time_out = 5)
+            self.assertNotIn(2, orders.index)
+            self.assertTrue((orders['Notional'] <=
+                             basket.loc[orders.index, 'Amount_Dollars'])
+                            .all())
+            self.assertTrue((orders['Number_of_Units'] %
+                             basket.loc[orders.index, 'Lot_Size'] == 0)
+                            .all())
+            self.assertEqual(orders.loc[1, 'Order_Object'].m_action, 'SELL')
+            status = broker.submitOrders(
+                            contracts = list(orders['Contract_Object']),
+                            orders = list(orders['Order_Object']))
+            self.assertTrue((status['Status'] != 'Error').all())
+        finally:
+            broker.disconnect()
+
+
+class FuturesChainCacheTest(unittest.TestCase):
+    """
+    Futures chains sorted by expiry and their roll dates.
+    """
+    def setUp(self):
+        self.chains = fc.FuturesChainCache()
+        self.key = fc.chainKey('SIM', 'SIM')
+        self.details = [futureDetails('SIMM7', '20170616 13:30'),
+                        futureDetails('SIMH7', '20170317'),
+                        futureDetails('SIMU7', '20170915'),
+                        futureDetails('SIMZ7', '')]
+        self.chains.update(self.key, self.details)
+
+    def test_chain_sorted_by_expiry(self):
+        self.assertEqual(self.chains.chain(self.key)['Local_Symbol'].tolist(),
+                         ['SIMH7', 'SIMM7', 'SIMU7'])
+        self.assertEqual(self.chains.chain(self.key, as_of = dt.date(
+                                            2017, 4, 1))['Local_Symbol']
+                         .tolist(), ['SIMM7', 'SIMU7'])
+        self.assertNotIn(fc.chainKey('SIM', 'SIM', 'EUR'), self.chains)
+
+    def test_roll_days_before_expiry(self):
+        front = self.chains.frontContract(self.key, dt.date(2017, 3, 8),
+                                          days = 8)
+        self.assertEqual(front.m_localSymbol, 'SIMH7')
+        front = self.chains.frontContract(self.key, dt.date(2017, 3, 9),
+                                          days = 8)
+        self.assertEqual(front.m_localSymbol, 'SIMM7')
+        self.assertIsNone(self.chains.frontContract(self.key,
+                                                    dt.date(2018, 1, 1)))
+
+    def test_volume_rolls_kept_across_update(self):
+        volumes = pd.DataFrame({'SIMH7': [100, 90, 50],
+                                'SIMM7': [10, 95, 60],
+                                'SIMU7': [0, 0, 1]},
+                               index = pd.to_datetime(['2017-03-01',
+                                                       '2017-03-02',
+                                                       '2017-03-03']))
+        self.chains.setVolumeRolls(self.key, volumes)
+        self.chains.update(self.key, self.details +
+                                     [futureDetails('SIMH8', '20180316')])
+        roll_dates = self.chains.rollDates(self.key, rule = fc.ROLL_VOLUME)
+        self.assertEqual(str(roll_dates[0]), '2017-03-02')
+        self.assertEqual(str(roll_dates[-1]), '2018-03-16')
+        front = self.chains.frontContract(self.key, dt.date(2017, 3, 2),
+                                          rule = fc.ROLL_VOLUME)
+        self.assertEqual(front.m_localSymbol, 'SIMM7')
+
+
+class ContinuousFuturesTest(unittest.TestCase):
+    """
+    Continuous series stitched from expired futures contracts.
+    """
+    def test_ratio_adjustment(self):
+        schedule = pd.DataFrame({'Local_Symbol': ['SIMH7', 'SIMM7'],
+                                 'Roll_Date': pd.to_datetime(['2017-03-03',
+                                                              '2017-06-16'])})
+        days = pd.to_datetime(['2017-03-01', '2017-03-02', '2017-03-03',
+                               '2017-03-06'])
+        bars = {'SIMH7': pd.DataFrame({'close': [100.0, 100.0]},
+                                      index = days[:2]),
+                'SIMM7': pd.DataFrame({'close': [110.0, 110.0, 111.0]},
+                                      index = days[1:])}
+        series = cf.ContinuousFutures(schedule, adjustment = cf.RATIO)
+        data = series.build(bars)
+        self.assertEqual(data['Local_Symbol'].tolist(),
+                         ['SIMH7', 'SIMH7', 'SIMM7', 'SIMM7'])
+        np.testing.assert_allclose(data['close'].values,
+                                   [110.0, 110.0, 110.0, 111.0])
+        self.assertAlmostEqual(series.rolls['Gap'].values[0], 1.1)
+
+    def setUp(self):
+        self.path_cache = tempfile.mkdtemp()
+        self.market = sm.SimulatedMarket(instruments = 5, latency = 0.01)
+        self.broker = simulatedBroker(self.market,
+                                      path_bar_cache = self.path_cache)
+        self.broker.historical_scheduler = pc.HistoricalScheduler(
+                                                    identical_cooldown = 0)
+        self.today = dt.datetime.combine(dt.date.today(), dt.time())
+
+        # the simulator has no futures; each contract is a stock relabelled
+        self.details = []
+        for (index, local_symbol, days) in [(1, 'SIMH6', 40),
+                                            (2, 'SIMM6', 10)]:
+            contract = self.market.contract(index)
+            contract.m_secType = 'FUT'
+            contract.m_exchange = 'SIM'
+            contract.m_localSymbol = local_symbol
+            contract.m_expiry = (self.today - dt.timedelta(days = days)) \
+                                .strftime('%Y%m%d')
+            details = ContractDetails()
+            details.m_summary = contract
+            details.m_marketName = 'SIM'
+            details.m_contractMonth = contract.m_expiry[:6]
+            self.details.append(details)
+        self.broker.futures_chains.update(fc.chainKey('SIM', 'SIM'),
+                                          self.details)
+
+    def tearDown(self):
+        self.broker.disconnect()
+        shutil.rmtree(self.path_cache)
+
+    def test_expired_contract_needs_include_expired(self):
+        data = self.broker.getDataInRange(
+                            self.today - dt.timedelta(days = 60),
+                            self.today - dt.timedelta(days = 50),
+                            contract = self.details[0].m_summary,
+                            type_data = 'TRADES', bar_size = '1 day')
+        self.assertTrue(data.empty)
+
+    def test_stitches_expired_contracts(self):
+        series = self.broker.getContinuousFutures(
+                            'SIM', 'SIM', self.today - dt.timedelta(days = 70),
+                            date_end = self.today - dt.timedelta(days = 12))
+        self.assertEqual(set(series.data['Local_Symbol']),
+                         set(['SIMH6', 'SIMM6']))
+        self.assertEqual(series.rolls[['From_Symbol', 'To_Symbol']]
+                         .values.tolist(), [['SIMH6', 'SIMM6']])
+        self.assertTrue(series.data.index.is_monotonic_increasing)
+        self.assertTrue((series.data['close'] > 0).all())
+
+
+if __name__ == '__main__':
+    unittest.main()